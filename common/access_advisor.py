@@ -0,0 +1,238 @@
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+from common import config
+
+# list_policies_granting_service_access accepts at most this many namespaces
+_NAMESPACES_PER_CALL = 10
+_MAX_POLL_SECONDS = 15.0
+
+
+class JobResult(NamedTuple):
+    user_id: str
+    arn: str
+    status: str  # COMPLETED, FAILED or TIMED_OUT
+    services: Dict[str, datetime | None]  # namespace -> LastAuthenticated
+    error: str | None = None
+
+
+class UsageRow(NamedTuple):
+    user_id: str
+    role_id: str
+    last_used_at: str | None
+    last_used_service: str | None
+    services_granted: int
+    services_used: int
+    checked_at: str
+
+
+def _job_services(client, job_id: str, first: Dict[str, Any]) -> Dict[str, datetime | None]:
+    services = {}
+    page = first
+    while True:
+        for item in page.get("ServicesLastAccessed", []):
+            services[item["ServiceNamespace"]] = item.get("LastAuthenticated")
+        if not page.get("IsTruncated"):
+            return services
+        page = client.get_service_last_accessed_details(JobId=job_id, Marker=page["Marker"])
+
+
+def run_jobs(
+    client,
+    principals: Iterable[Tuple[str, str] | Tuple[str, str, Any]],
+    max_in_flight: int | None = None,
+    poll_seconds: float | None = None,
+    timeout_seconds: float | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+    should_stop: Callable[[], bool] | None = None,
+) -> Iterator[JobResult]:
+    """
+    Run one Access Advisor job per (user_id, arn) with a single scheduler:
+    keep up to max_in_flight jobs submitted, poll all of them each round,
+    and top the window back up as jobs finish. The poll interval backs off
+    (up to 15s) while nothing completes and resets when something does.
+    Results are yielded as jobs finish, in completion order.
+    A principal may carry its own client as (user_id, arn, client), so
+    several accounts share one window. Once should_stop() returns true no
+    more jobs are submitted; those already running are still collected and
+    the rest of principals is left unread.
+    """
+    max_in_flight = max(1, max_in_flight or config.ACCESS_ADVISOR_MAX_JOBS)
+    base_interval = poll_seconds if poll_seconds is not None else config.ACCESS_ADVISOR_POLL_SECONDS
+    timeout_seconds = timeout_seconds or config.ACCESS_ADVISOR_JOB_TIMEOUT_SECONDS
+    queue = iter(principals)
+    in_flight: Dict[Tuple[int, str], Tuple[str, str, Any, float]] = {}
+    exhausted = False
+    interval = base_interval
+
+    while True:
+        while not exhausted and len(in_flight) < max_in_flight:
+            principal = None if should_stop and should_stop() else next(queue, None)
+            if principal is None:
+                exhausted = True
+                break
+            user_id, arn, job_client = principal if len(principal) == 3 else (*principal, client)
+            try:
+                job_id = job_client.generate_service_last_accessed_details(
+                    Arn=arn, Granularity="SERVICE_LEVEL"
+                )["JobId"]
+            except Exception as e:
+                yield JobResult(user_id, arn, "FAILED", {}, f"submit: {e}")
+                continue
+            # Job ids are only unique within an account
+            in_flight[(id(job_client), job_id)] = (user_id, arn, job_client, clock())
+        if not in_flight:
+            return
+
+        sleep(interval)
+        finished = 0
+        for key, (user_id, arn, job_client, submitted) in list(in_flight.items()):
+            job_id = key[1]
+            try:
+                page = job_client.get_service_last_accessed_details(JobId=job_id)
+                status = page["JobStatus"]
+                if status == "IN_PROGRESS":
+                    if clock() - submitted < timeout_seconds:
+                        continue
+                    result = JobResult(user_id, arn, "TIMED_OUT", {}, f"job {job_id} still running")
+                elif status == "COMPLETED":
+                    result = JobResult(user_id, arn, "COMPLETED", _job_services(job_client, job_id, page))
+                else:
+                    error = (page.get("Error") or {}).get("Message", status)
+                    result = JobResult(user_id, arn, "FAILED", {}, error)
+            except Exception as e:
+                result = JobResult(user_id, arn, "FAILED", {}, f"poll: {e}")
+            del in_flight[key]
+            finished += 1
+            yield result
+        interval = base_interval if finished else min(max(interval, 0.1) * 1.5, _MAX_POLL_SECONDS)
+
+
+def policies_granting(client, arn: str, namespaces: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """namespace -> policies (PolicyName, PolicyType, PolicyArn, EntityType, EntityName) granting it to arn."""
+    grants: Dict[str, List[Dict[str, Any]]] = {}
+    namespaces = sorted(namespaces)
+    for i in range(0, len(namespaces), _NAMESPACES_PER_CALL):
+        params = {"Arn": arn, "ServiceNamespaces": namespaces[i:i + _NAMESPACES_PER_CALL]}
+        while True:
+            page = client.list_policies_granting_service_access(**params)
+            for item in page.get("PoliciesGrantingServiceAccess", []):
+                grants.setdefault(item["ServiceNamespace"], []).extend(item.get("Policies", []))
+            if not page.get("IsTruncated"):
+                break
+            params["Marker"] = page["Marker"]
+    return grants
+
+
+def _policy_role_id(policy: Dict[str, Any], user_arn: str, role_ids: Iterable[str]) -> str | None:
+    """Match a granting policy to the role_id discovery stored for it."""
+    if policy.get("PolicyType") == "MANAGED":
+        return policy.get("PolicyArn")
+    suffix = f"#inline/{policy.get('PolicyName')}"
+    if policy.get("EntityType") == "USER":
+        return f"{user_arn}{suffix}"
+    if policy.get("EntityType") == "GROUP":
+        # Group paths are not in the response; match on the name
+        tail = f"/{policy.get('EntityName')}{suffix}"
+        return next((r for r in role_ids if r.endswith(tail) and ":group/" in r), None)
+    return None
+
+
+def _utc_text(value: datetime | None) -> str | None:
+    """Naive UTC ISO text, so TIMESTAMP columns store the same instant on both engines."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def usage_rows(
+    user_id: str,
+    user_arn: str,
+    role_ids: Sequence[str],
+    services: Dict[str, datetime | None],
+    grants: Dict[str, List[Dict[str, Any]]],
+    checked_at: str,
+) -> List[UsageRow]:
+    """
+    One row per entitlement of the user: last_used_at is the latest
+    authentication to any service the policy grants. Entitlements no
+    service maps to are recorded as checked with nothing granted.
+    """
+    known = set(role_ids)
+    per_role: Dict[str, Dict[str, datetime | None]] = {role_id: {} for role_id in role_ids}
+    for namespace, policies in grants.items():
+        for policy in policies:
+            role_id = _policy_role_id(policy, user_arn, role_ids)
+            if role_id in known:
+                per_role[role_id][namespace] = services.get(namespace)
+
+    rows = []
+    for role_id, granted in per_role.items():
+        used = {ns: ts for ns, ts in granted.items() if ts is not None}
+        latest = max(used, key=lambda ns: used[ns]) if used else None
+        rows.append(UsageRow(
+            user_id,
+            role_id,
+            _utc_text(used[latest]) if latest else None,
+            latest,
+            len(granted),
+            len(used),
+            checked_at,
+        ))
+    return rows
+
+
+class StubAccessAdvisorClient:
+    """
+    In-memory stand-in for the three IAM calls used here (mock mode and
+    tests). usage maps user ARN -> {namespace: (LastAuthenticated or None,
+    [granting policy dicts])}; each job reports IN_PROGRESS for
+    polls_to_complete - 1 polls. Tracks calls and the peak number of
+    concurrently running jobs.
+    """
+
+    def __init__(self, usage: Dict[str, Dict[str, Tuple[datetime | None, List[Dict[str, Any]]]]], polls_to_complete: int = 2):
+        self.usage = usage
+        self.polls_to_complete = polls_to_complete
+        self.jobs: Dict[str, List[Any]] = {}  # job_id -> [arn, polls, done]
+        self.calls: Dict[str, int] = {}
+        self.peak_running = 0
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def generate_service_last_accessed_details(self, Arn: str, Granularity: str = "SERVICE_LEVEL"):
+        self._count("generate_service_last_accessed_details")
+        job_id = f"job-{len(self.jobs) + 1}"
+        self.jobs[job_id] = [Arn, 0, False]
+        self.peak_running = max(self.peak_running, sum(1 for j in self.jobs.values() if not j[2]))
+        return {"JobId": job_id}
+
+    def get_service_last_accessed_details(self, JobId: str, Marker: str | None = None):
+        self._count("get_service_last_accessed_details")
+        job = self.jobs[JobId]
+        job[1] += 1
+        if job[1] < self.polls_to_complete:
+            return {"JobStatus": "IN_PROGRESS"}
+        job[2] = True
+        if job[0] not in self.usage:
+            return {"JobStatus": "FAILED", "Error": {"Message": f"No such entity {job[0]}"}}
+        services = [
+            {"ServiceNamespace": ns, **({"LastAuthenticated": ts} if ts else {})}
+            for ns, (ts, _) in sorted(self.usage[job[0]].items())
+        ]
+        return {"JobStatus": "COMPLETED", "ServicesLastAccessed": services, "IsTruncated": False}
+
+    def list_policies_granting_service_access(self, Arn: str, ServiceNamespaces: List[str], Marker: str | None = None):
+        self._count("list_policies_granting_service_access")
+        user = self.usage.get(Arn, {})
+        return {
+            "PoliciesGrantingServiceAccess": [
+                {"ServiceNamespace": ns, "Policies": user[ns][1]} for ns in ServiceNamespaces if ns in user
+            ],
+            "IsTruncated": False,
+        }
@@ -0,0 +1,272 @@
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from common import config
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+FORMAT = "iam-governance/chunked-jsonl/1"
+STAR_FORMAT = "iam-governance/star-jsonl/1"
+MANIFEST_NAME = "manifest.json"
+COMPRESSIONS = {"gzip": "gz", "zstd": "zst"}
+# RFC 6962-style domain separation so a leaf can never be passed off as a node
+_LEAF = b"\x00"
+_NODE = b"\x01"
+
+
+def jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def canonical_json(value: Any) -> bytes:
+    """Deterministic encoding (sorted keys, no whitespace) used for records and the manifest."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=jsonable).encode("utf-8")
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        # mtime=0 keeps identical chunks byte-identical across runs
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("AUDIT_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    raise ValueError(f"Unsupported compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd artifacts requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported compression {compression!r}")
+
+
+def merkle_root(digests: Sequence[str]) -> str:
+    """
+    Root over hex SHA-256 chunk digests: leaves are H(0x00 || digest), nodes
+    H(0x01 || left || right), and an odd node is promoted unchanged.
+    """
+    level = [hashlib.sha256(_LEAF + bytes.fromhex(d)).digest() for d in digests]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(_NODE + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+def _write_chunk(out_dir: str, index: int, first_record: int, records: int, raw: bytes, compression: str) -> dict:
+    data = compress(raw, compression)
+    name = f"part-{index:05d}.jsonl.{COMPRESSIONS[compression]}"
+    with open(os.path.join(out_dir, name), "wb") as f:
+        f.write(data)
+    return {
+        "index": index,
+        "path": name,
+        "first_record": first_record,
+        "records": records,
+        "bytes": len(data),
+        "raw_bytes": len(raw),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "raw_sha256": hashlib.sha256(raw).hexdigest(),
+    }
+
+
+def write_chunked(
+    records: Iterable[Dict[str, Any]],
+    out_dir: str,
+    compression: str | None = None,
+    chunk_bytes: int | None = None,
+    workers: int | None = None,
+    metadata: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    Write records as canonical JSON lines into compressed chunks of about
+    chunk_bytes (uncompressed; chunks end on a record boundary so each one
+    decodes on its own), then write manifest.json. Chunks are compressed and
+    hashed on a thread pool while the next one fills. Returns the manifest.
+    """
+    compression = compression or config.AUDIT_COMPRESSION
+    chunk_bytes = chunk_bytes or config.AUDIT_CHUNK_BYTES
+    workers = max(1, workers or config.AUDIT_WORKERS)
+    compress(b"", compression)  # fail before writing anything if unavailable
+    os.makedirs(out_dir, exist_ok=True)
+    # A rerun into the same directory must not leave chunks from the last one
+    for name in os.listdir(out_dir):
+        if name == MANIFEST_NAME or (name.startswith("part-") and ".jsonl." in name):
+            os.remove(os.path.join(out_dir, name))
+
+    futures = []
+    buf: List[bytes] = []
+    size = first = count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def flush():
+            nonlocal buf, size, first
+            # Bound memory: at most ~2 chunks per worker in flight
+            if len(futures) >= 2 * workers:
+                futures[len(futures) - 2 * workers].result()
+            futures.append(pool.submit(_write_chunk, out_dir, len(futures), first, count - first, b"".join(buf), compression))
+            buf, size, first = [], 0, count
+
+        for record in records:
+            line = canonical_json(record) + b"\n"
+            buf.append(line)
+            size += len(line)
+            count += 1
+            if size >= chunk_bytes:
+                flush()
+        if buf:
+            flush()
+        chunks = [f.result() for f in futures]
+
+    manifest = dict(metadata or {})
+    manifest.update({
+        "format": FORMAT,
+        "compression": compression,
+        "chunk_bytes": chunk_bytes,
+        "record_count": count,
+        "bytes": sum(c["bytes"] for c in chunks),
+        "raw_bytes": sum(c["raw_bytes"] for c in chunks),
+        "hash_algorithm": "sha256",
+        "merkle_root": merkle_root([c["sha256"] for c in chunks]),
+        "chunks": chunks,
+    })
+    with open(os.path.join(out_dir, MANIFEST_NAME), "wb") as f:
+        f.write(canonical_json(manifest))
+    return manifest
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Accepts the artifact directory or the manifest file itself."""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def manifest_digest(manifest_path: str) -> str:
+    """SHA-256 of the manifest bytes as written: the value to sign or pin."""
+    with open(manifest_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def iter_chunk_records(path: str, compression: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        raw = decompress(f.read(), compression)
+    for line in raw.splitlines():
+        if line:
+            yield json.loads(line)
+
+
+def iter_chunked_records(chunk_dir: str) -> Iterator[Any]:
+    """Every record of a chunked artifact directory, in manifest order."""
+    manifest = load_manifest(chunk_dir)
+    for chunk in manifest["chunks"]:
+        yield from iter_chunk_records(os.path.join(chunk_dir, chunk["path"]), manifest["compression"])
+
+
+def check_chunks(chunk_dir: str, manifest: Dict[str, Any]) -> List[str]:
+    """Problems found re-hashing every chunk of a chunked artifact against its manifest."""
+    problems = []
+    for chunk in manifest["chunks"]:
+        try:
+            with open(os.path.join(chunk_dir, chunk["path"]), "rb") as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+                problems.append(f"{chunk['path']}: sha256 mismatch")
+            elif hashlib.sha256(decompress(data, manifest["compression"])).hexdigest() != chunk["raw_sha256"]:
+                problems.append(f"{chunk['path']}: raw_sha256 mismatch")
+        except Exception as exc:
+            problems.append(f"{chunk['path']}: unreadable: {exc}")
+    if merkle_root([c["sha256"] for c in manifest["chunks"]]) != manifest["merkle_root"]:
+        problems.append("merkle_root does not match the chunk hashes")
+    return problems
+
+
+def write_star(
+    tables: Sequence[Tuple[str, Sequence[str], Iterable[Sequence[Any]]]],
+    out_dir: str,
+    compression: str | None = None,
+    chunk_bytes: int | None = None,
+    workers: int | None = None,
+    metadata: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    Write a set of related tables, (name, fields, rows) with rows as value
+    lists in fields order, each as a chunked artifact in out_dir/<name>/.
+    Tables are written in the order given, so a later table's rows may be
+    built while an earlier one streams (dimensions keyed during the fact
+    pass). The top-level manifest.json records each table's manifest
+    SHA-256 and a Merkle root over them, so pinning or signing it covers
+    every chunk of every table. Returns the top-level manifest.
+    """
+    compression = compression or config.AUDIT_COMPRESSION
+    os.makedirs(out_dir, exist_ok=True)
+    entries = []
+    for name, fields, rows in tables:
+        table_dir = os.path.join(out_dir, name)
+        table_manifest = write_chunked(
+            rows, table_dir, compression, chunk_bytes, workers, metadata={"table": name, "fields": list(fields)}
+        )
+        entries.append({
+            "name": name,
+            "path": name,
+            "fields": list(fields),
+            "record_count": table_manifest["record_count"],
+            "chunks": len(table_manifest["chunks"]),
+            "bytes": table_manifest["bytes"],
+            "raw_bytes": table_manifest["raw_bytes"],
+            "merkle_root": table_manifest["merkle_root"],
+            "manifest_sha256": manifest_digest(os.path.join(table_dir, MANIFEST_NAME)),
+        })
+
+    manifest = dict(metadata or {})
+    manifest.update({
+        "format": STAR_FORMAT,
+        "compression": compression,
+        "bytes": sum(t["bytes"] for t in entries),
+        "raw_bytes": sum(t["raw_bytes"] for t in entries),
+        "hash_algorithm": "sha256",
+        "merkle_root": merkle_root([t["manifest_sha256"] for t in entries]),
+        "tables": entries,
+    })
+    with open(os.path.join(out_dir, MANIFEST_NAME), "wb") as f:
+        f.write(canonical_json(manifest))
+    return manifest
+
+
+def check_star(out_dir: str, manifest: Dict[str, Any], skip: Sequence[str] = ()) -> List[str]:
+    """
+    Problems found checking a star artifact: each table manifest against the
+    digest the top-level manifest pins, the top-level Merkle root, and (for
+    tables not in skip) every chunk.
+    """
+    problems = []
+    for table in manifest["tables"]:
+        table_dir = os.path.join(out_dir, table["path"])
+        try:
+            if manifest_digest(os.path.join(table_dir, MANIFEST_NAME)) != table["manifest_sha256"]:
+                problems.append(f"{table['name']}: manifest sha256 mismatch")
+                continue
+            if table["name"] not in skip:
+                problems.extend(f"{table['name']}: {p}" for p in check_chunks(table_dir, load_manifest(table_dir)))
+        except OSError as exc:
+            problems.append(f"{table['name']}: unreadable: {exc}")
+    if merkle_root([t["manifest_sha256"] for t in manifest["tables"]]) != manifest["merkle_root"]:
+        problems.append("merkle_root does not match the table manifests")
+    return problems
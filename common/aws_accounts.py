@@ -0,0 +1,43 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import boto3
+
+from common import config
+
+# Per-process cache of assumed-role sessions: role ARN -> (session, expiry)
+_SESSIONS: dict = {}
+_SESSION_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def arn_account(arn: str) -> str | None:
+    """Account field of an ARN ('aws' for AWS-managed policies)."""
+    parts = arn.split(":")
+    return parts[4] if len(parts) > 4 and parts[4] else None
+
+
+def resolve_target(target: str) -> tuple[str, str]:
+    """Accept an account id or an assume-role ARN; return (account_id, role_arn)."""
+    if re.fullmatch(r"\d{12}", target):
+        return target, f"arn:aws:iam::{target}:role/{config.DISCOVERY_ROLE_NAME}"
+    account_id = arn_account(target)
+    if not account_id:
+        raise ValueError(f"Not an account id or role ARN: {target}")
+    return account_id, target
+
+
+def account_session(role_arn: str):
+    """Session for role_arn, assumed once per process and refreshed before it expires."""
+    cached = _SESSIONS.get(role_arn)
+    if cached and cached[1] - datetime.now(timezone.utc) > _SESSION_REFRESH_MARGIN:
+        return cached[0]
+    creds = boto3.client("sts").assume_role(
+        RoleArn=role_arn, RoleSessionName="iam-access-certification"
+    )["Credentials"]
+    session = boto3.Session(
+        aws_access_key_id=creds["AccessKeyId"],
+        aws_secret_access_key=creds["SecretAccessKey"],
+        aws_session_token=creds["SessionToken"],
+    )
+    _SESSIONS[role_arn] = (session, creds["Expiration"])
+    return session
@@ -12,6 +12,9 @@ AWS_REGION = os.getenv("AWS_REGION", os.getenv("AWS_DEFAULT_REGION", "us-east-1"
 MOCK_IAM = _get_bool("MOCK_IAM", False)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
+# Bulk loading: row count at which writes switch to COPY (Postgres)
+BULK_LOAD_THRESHOLD = int(os.getenv("BULK_LOAD_THRESHOLD", "5000"))
+
 # Remediation safety
 DRY_RUN = _get_bool("DRY_RUN", True)
 ENABLE_REMEDIATION = _get_bool("ENABLE_REMEDIATION", False)
@@ -28,13 +31,95 @@ DENYLIST = {
 if not DENYLIST:
     DENYLIST.update({"administratoraccess", "breakglass", "break-glass"})
 
+# Discovery checkpointing: IAM page size and the Lambda time reserve at
+# which a run checkpoints and returns for the next invocation to resume.
+DISCOVERY_PAGE_SIZE = int(os.getenv("DISCOVERY_PAGE_SIZE", "500"))
+DISCOVERY_MIN_REMAINING_MS = int(os.getenv("DISCOVERY_MIN_REMAINING_MS", "60000"))
+
+# Resolve group memberships and inline policies (not just direct attachments)
+DISCOVERY_EXPAND_GROUPS = _get_bool("DISCOVERY_EXPAND_GROUPS", True)
+
+# Multi-account discovery: account ids or assume-role ARNs (comma-separated)
+DISCOVERY_ACCOUNTS = [
+    item.strip() for item in os.getenv("DISCOVERY_ACCOUNTS", "").split(",") if item.strip()
+]
+DISCOVERY_ROLE_NAME = os.getenv("DISCOVERY_ROLE_NAME", "OrganizationAccountAccessRole")
+DISCOVERY_WORKERS = int(os.getenv("DISCOVERY_WORKERS", "8"))
+DISCOVERY_MAX_ATTEMPTS = int(os.getenv("DISCOVERY_MAX_ATTEMPTS", "10"))
+
+# Access Advisor enrichment: concurrent service-last-accessed jobs, the
+# base poll interval, per-job timeout, how long a user's results stay
+# fresh, the Lambda time reserve at which no new jobs are started, and
+# how long HIGH-risk access may go unused before it is stale
+ACCESS_ADVISOR_ENABLED = _get_bool("ACCESS_ADVISOR_ENABLED", True)
+ACCESS_ADVISOR_MAX_JOBS = int(os.getenv("ACCESS_ADVISOR_MAX_JOBS", "10"))
+ACCESS_ADVISOR_POLL_SECONDS = float(os.getenv("ACCESS_ADVISOR_POLL_SECONDS", "2"))
+ACCESS_ADVISOR_JOB_TIMEOUT_SECONDS = float(os.getenv("ACCESS_ADVISOR_JOB_TIMEOUT_SECONDS", "300"))
+ACCESS_ADVISOR_REFRESH_HOURS = int(os.getenv("ACCESS_ADVISOR_REFRESH_HOURS", "24"))
+ACCESS_ADVISOR_MIN_REMAINING_MS = int(os.getenv("ACCESS_ADVISOR_MIN_REMAINING_MS", "60000"))
+STALE_ACCESS_DAYS = int(os.getenv("STALE_ACCESS_DAYS", "90"))
+
+# Entitlement graph index (memory-mappable snapshot of user_roles)
+ENTITLEMENT_GRAPH_PATH = os.getenv("ENTITLEMENT_GRAPH_PATH", "entitlement_graph.bin")
+
+# IAM response cache around discovery's read-only calls: off, cache
+# (serve fresh entries, fetch misses), record (always fetch, store) or
+# replay (stored responses only, no AWS access)
+IAM_CACHE_MODE = os.getenv("IAM_CACHE_MODE", "off").lower()
+IAM_CACHE_PATH = os.getenv("IAM_CACHE_PATH", ".iam_cache/responses.sqlite3")
+IAM_CACHE_TTL_SECONDS = int(os.getenv("IAM_CACHE_TTL_SECONDS", "3600"))
+IAM_CACHE_MAX_BYTES = int(os.getenv("IAM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Separation of duties: optional JSON rules file (defaults in common/sod.py)
+SOD_RULES_PATH = os.getenv("SOD_RULES_PATH")
+
+# Risk classification: optional JSON rules file (defaults in common/risk.py)
+RISK_RULES_PATH = os.getenv("RISK_RULES_PATH")
+
+# Carry-forward certification: LOW-risk entitlements approved while LOW
+# within this many days are certified by reference to that approval
+# instead of getting a new review (0 = off)
+CARRY_FORWARD_DAYS = int(os.getenv("CARRY_FORWARD_DAYS", "0"))
+
+# Archiving: closed campaigns older than this move to cold storage
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+# AI explanations: reviews packed per GenAI request in batch mode (1 = one
+# request per review) and the estimated token budget per request
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "10"))
+AI_BATCH_TOKEN_BUDGET = int(os.getenv("AI_BATCH_TOKEN_BUDGET", "8000"))
+
+# Rows fetched per round trip by the repo.iter_* streams (server-side
+# cursors on Postgres)
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "10000"))
+
+# Primary keys for campaigns, reviews and audit logs: uuid7 (time-ordered)
+# or uuid4 (random)
+ID_SCHEME = os.getenv("ID_SCHEME", "uuid7").lower()
+
+# Outbox relay: events per claim/publish/ack batch, and how long relayed
+# events are kept before --purge removes them
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "1000"))
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", "outbox")
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+# Reviewer decision ingestion: rows applied per transaction
+DECISION_CHUNK_SIZE = int(os.getenv("DECISION_CHUNK_SIZE", "5000"))
+
 # Audit export
 AUDIT_S3_BUCKET = os.getenv("AUDIT_S3_BUCKET")
 AUDIT_S3_PREFIX = os.getenv("AUDIT_S3_PREFIX", "")
 LOCAL_ONLY = _get_bool("LOCAL_ONLY", False)
-
-# Schema/versioning
-SCHEMA_VERSION = "2026-01-phase2"
+# Artifact layout: "files" (CSV + JSON), "chunked" (compressed chunks with a
+# Merkle manifest, see common/artifacts.py), "both", or "star" (chunked
+# users / roles / summaries dimensions plus a compact reviews fact table)
+AUDIT_ARTIFACT_FORMAT = os.getenv("AUDIT_ARTIFACT_FORMAT", "files").lower()
+AUDIT_COMPRESSION = os.getenv("AUDIT_COMPRESSION", "gzip").lower()
+AUDIT_CHUNK_BYTES = int(os.getenv("AUDIT_CHUNK_BYTES", str(8 * 1024 * 1024)))
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", "4"))
+
+# Migrations (scripts/migrate.py): Postgres lock_timeout for schema changes
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "10000"))
 
 
 def _parsed_db_url():
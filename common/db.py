@@ -1,6 +1,7 @@
 import contextlib
+import itertools
 import sqlite3
-from typing import Any, Iterable, Tuple
+from typing import Any, Iterable, Iterator, Sequence, Tuple
 
 from common import config
 
@@ -10,6 +11,45 @@ except ImportError:  # pragma: no cover
     psycopg2 = None  # type: ignore
 
 
+class _CopyStream:
+    """
+    File-like adapter that renders rows as COPY CSV lazily, so COPY FROM STDIN
+    streams rows without building the whole payload in memory.
+    None becomes an unquoted empty field (NULL); every other value is quoted.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows: Iterator[Sequence[Any]] = iter(rows)
+        self._pending = ""
+
+    @staticmethod
+    def _format_row(row: Sequence[Any]) -> str:
+        fields = []
+        for value in row:
+            if value is None:
+                fields.append("")
+            else:
+                fields.append('"' + str(value).replace('"', '""') + '"')
+        return ",".join(fields) + "\n"
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = self._format_row(row)
+            chunks.append(line)
+            length += len(line)
+        data = "".join(chunks)
+        if size < 0:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
 class Database:
     """
     Lightweight DB helper that supports SQLite and Postgres based on DB_URL.
@@ -19,6 +59,8 @@ class Database:
 
     def __init__(self):
         self.is_sqlite = config.db_is_sqlite()
+        self._shared = None
+        self._stream_ids = itertools.count()
 
     def _connect_sqlite(self):
         path = config.require_sqlite_path()
@@ -33,6 +75,17 @@ class Database:
 
     @contextlib.contextmanager
     def get_connection(self):
+        if self._shared is not None:
+            # Pinned by shared_connection(): reuse, commit, but leave it open.
+            # A failed block rolls back, so its partial writes are neither
+            # committed by the next block nor left in an aborted transaction.
+            try:
+                yield self._shared
+            except Exception:
+                self._shared.rollback()
+                raise
+            self._shared.commit()
+            return
         conn = self._connect_sqlite() if self.is_sqlite else self._connect_postgres()
         try:
             yield conn
@@ -41,6 +94,25 @@ class Database:
         finally:
             conn.close()
 
+    @contextlib.contextmanager
+    def shared_connection(self):
+        """
+        Pin a single connection for the duration of the block so that every
+        get_connection() inside it (e.g. several handlers run in one process)
+        reuses it instead of reconnecting.
+        """
+        if self._shared is not None:
+            yield self._shared
+            return
+        conn = self._connect_sqlite() if self.is_sqlite else self._connect_postgres()
+        self._shared = conn
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            self._shared = None
+            conn.close()
+
     def prepare_sql(self, sql: str) -> str:
         """
         Convert SQLite-style ? placeholders to %s for Postgres.
@@ -60,6 +132,41 @@ class Database:
     def executemany(self, cursor, sql: str, seq_of_params: Iterable[Tuple[Any, ...]]):
         cursor.executemany(self.prepare_sql(sql), seq_of_params)
 
+    def stream(
+        self, conn, sql: str, params: Iterable[Any] = (), batch_size: int | None = None
+    ) -> Iterator[Tuple[Any, ...]]:
+        """
+        Yield result rows while fetching batch_size (default
+        STREAM_BATCH_SIZE) at a time. On Postgres a named (server-side)
+        cursor keeps the result set on the server, so memory stays bounded
+        however many rows match. The cursor is WITH HOLD, so callers may
+        write and commit on the same connection while iterating.
+        """
+        batch_size = batch_size or config.STREAM_BATCH_SIZE
+        if self.is_sqlite:
+            cursor = conn.cursor()
+        else:
+            cursor = conn.cursor(name=f"stream_{next(self._stream_ids)}", withhold=True)
+            cursor.itersize = batch_size
+        try:
+            self.execute(cursor, sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def copy_rows(self, cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]):
+        """
+        Stream rows into a Postgres table via COPY FROM STDIN (CSV).
+        """
+        if self.is_sqlite:
+            raise RuntimeError("COPY is only available on Postgres")
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        cursor.copy_expert(sql, _CopyStream(rows))
+
 
 db = Database()
 
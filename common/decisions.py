@@ -0,0 +1,182 @@
+import csv
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+from common import config, logger, repo
+
+DECISION_STATUSES = ("APPROVED", "REVOKED")
+_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+
+
+class Decision(NamedTuple):
+    line: int
+    review_id: str
+    status: str
+    comment: str | None
+    reviewer: str
+    reviewed_at: str
+
+
+class Reject(NamedTuple):
+    line: int
+    review_id: str | None
+    reason: str
+
+
+def detect_format(path: str) -> str:
+    for suffix, fmt in _FORMATS.items():
+        if path.lower().endswith(suffix):
+            return fmt
+    raise ValueError(f"Cannot infer decision file format from {path}; pass csv or jsonl")
+
+
+def _records(path: str, fmt: str) -> Iterator[Tuple[int, dict | None, str | None]]:
+    """Yield (line, record, parse_error) one row at a time."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            missing = {"review_id", "status", "reviewer"} - set(reader.fieldnames or [])
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+        for line_no, raw in enumerate(f, start=1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as exc:
+                yield line_no, None, f"invalid JSON: {exc}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, record, None
+
+
+def _text(record: dict, key: str) -> str | None:
+    value = record.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate(line: int, record: dict, default_ts: str) -> Decision | Reject:
+    """
+    Field checks mirror the access_reviews constraints so rows fail here,
+    with a line number, rather than inside a batch UPDATE.
+    """
+    review_id = _text(record, "review_id")
+    if not review_id:
+        return Reject(line, None, "missing review_id")
+    status = (_text(record, "status") or "").upper()
+    if status not in DECISION_STATUSES:
+        return Reject(line, review_id, f"status must be one of {', '.join(DECISION_STATUSES)}")
+    comment = _text(record, "comment")
+    if status == "REVOKED" and not comment:
+        return Reject(line, review_id, "REVOKED decisions require a comment")
+    reviewer = _text(record, "reviewer")
+    if not reviewer:
+        return Reject(line, review_id, "missing reviewer")
+    timestamp = _text(record, "timestamp")
+    if timestamp:
+        try:
+            reviewed_at = datetime.fromisoformat(timestamp).isoformat()
+        except ValueError:
+            return Reject(line, review_id, f"invalid timestamp {timestamp!r}")
+    else:
+        reviewed_at = default_ts
+    return Decision(line, review_id, status, comment, reviewer, reviewed_at)
+
+
+def iter_decisions(path: str, fmt: str | None = None) -> Iterator[Decision | Reject]:
+    """Stream validated decisions; later duplicates of a review_id are rejected."""
+    fmt = fmt or detect_format(path)
+    default_ts = datetime.now(timezone.utc).isoformat()
+    first_seen: Dict[str, int] = {}
+    for line, record, error in _records(path, fmt):
+        if error:
+            yield Reject(line, None, error)
+            continue
+        result = validate(line, record, default_ts)
+        if isinstance(result, Decision):
+            earlier = first_seen.setdefault(result.review_id, line)
+            if earlier != line:
+                result = Reject(line, result.review_id, f"duplicate of line {earlier}")
+        yield result
+
+
+def _apply_chunk(conn, chunk: List[Decision], rejects: List[Reject]) -> int:
+    states = repo.get_review_states(conn, [d.review_id for d in chunk])
+    ready = []
+    for decision in chunk:
+        state = states.get(decision.review_id)
+        if state is None:
+            rejects.append(Reject(decision.line, decision.review_id, "unknown review_id"))
+        elif state[1] is not None:
+            rejects.append(Reject(decision.line, decision.review_id, "review already remediated"))
+        else:
+            ready.append(decision)
+
+    def as_row(d: Decision):
+        return (d.review_id, states[d.review_id][2], d.status, d.comment, d.reviewer, d.reviewed_at)
+
+    try:
+        repo.apply_review_decisions(conn, [as_row(d) for d in ready])
+        conn.commit()
+        return len(ready)
+    except Exception:
+        conn.rollback()
+    # The batch failed as a whole: retry row by row to isolate the bad lines
+    applied = 0
+    for decision in ready:
+        try:
+            repo.apply_review_decisions(conn, [as_row(decision)])
+            conn.commit()
+            applied += 1
+        except Exception as exc:
+            conn.rollback()
+            rejects.append(Reject(decision.line, decision.review_id, f"rejected by database: {exc}"))
+    return applied
+
+
+def ingest(conn, path: str, fmt: str | None = None, chunk_size: int | None = None) -> Tuple[dict, List[Reject]]:
+    """
+    Validate a CSV/JSON-lines decision file in one streaming pass and apply
+    it in chunks of chunk_size, one transaction per chunk. A failing chunk
+    does not undo earlier ones. Returns (summary, rejects).
+    """
+    chunk_size = chunk_size or config.DECISION_CHUNK_SIZE
+    t0 = time.perf_counter()
+    rejects: List[Reject] = []
+    chunk: List[Decision] = []
+    lines = applied = chunks = 0
+    for item in iter_decisions(path, fmt):
+        lines += 1
+        if isinstance(item, Reject):
+            rejects.append(item)
+            continue
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            applied += _apply_chunk(conn, chunk, rejects)
+            chunks += 1
+            chunk = []
+    if chunk:
+        applied += _apply_chunk(conn, chunk, rejects)
+        chunks += 1
+
+    rejects.sort(key=lambda r: r.line)
+    summary = {
+        "path": path,
+        "rows": lines,
+        "applied": applied,
+        "rejected": len(rejects),
+        "chunks": chunks,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    logger.log("ingest_decisions", "success", "Decision file ingested", details=summary)
+    return summary, rejects
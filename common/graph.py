@@ -0,0 +1,278 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from common import repo
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+_RISK_CODE = {level: code for code, level in enumerate(RISK_LEVELS)}
+
+_MAGIC = b"IAMGRAPH"
+_FORMAT_VERSION = 1
+# magic, version, little-endian flag, users, roles, edges
+_HEADER = struct.Struct("<8sIIIII")
+
+
+def _bits_to_indices(bits: int) -> List[int]:
+    """Decode an int bitset into the sorted list of set bit positions."""
+    indices = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_pos, byte in enumerate(data):
+        base = byte_pos * 8
+        while byte:
+            low = byte & -byte
+            indices.append(base + low.bit_length() - 1)
+            byte ^= low
+    return indices
+
+
+def _u32(values: Iterable[int] = ()) -> array:
+    return array("I", values)
+
+
+class EntitlementGraph:
+    """
+    Integer-interned user<->role adjacency index over user_roles.
+
+    Users and roles are mapped to dense indices; both directions are stored in
+    CSR form (offset + target arrays of uint32), and role risk as one byte per
+    role. Risk filters are evaluated as int-bitset unions over role->users, so
+    "who holds any HIGH role" is a handful of big-int ORs rather than a join.
+    The index can be saved to a flat file and re-opened via mmap without
+    copying the arrays.
+    """
+
+    def __init__(
+        self,
+        user_ids: Sequence[str],
+        role_ids: Sequence[str],
+        role_risk: Sequence[int],
+        user_offsets: Sequence[int],
+        user_roles: Sequence[int],
+        role_offsets: Sequence[int],
+        role_users: Sequence[int],
+    ):
+        self.user_ids = user_ids
+        self.role_ids = role_ids
+        self.role_risk = role_risk
+        self.user_offsets = user_offsets
+        self.user_roles = user_roles
+        self.role_offsets = role_offsets
+        self.role_users = role_users
+        self._user_index: Dict[str, int] | None = None
+        self._role_index: Dict[str, int] | None = None
+        self._role_bits: Dict[int, int] = {}
+        self._mmap = None
+
+    # --- construction -------------------------------------------------
+    @classmethod
+    def from_rows(
+        cls,
+        roles: Iterable[Tuple[str, str, str]],
+        entitlements: Iterable[Tuple[str, str, str]],
+    ) -> "EntitlementGraph":
+        """
+        roles: (role_id, role_name, risk_level) as from repo.iter_roles
+        entitlements: (user_id, role_id, risk_level) as from repo.iter_entitlements
+        """
+        role_index: Dict[str, int] = {}
+        role_ids: List[str] = []
+        role_risk = bytearray()
+        for role_id, _, risk in roles:
+            if role_id not in role_index:
+                role_index[role_id] = len(role_ids)
+                role_ids.append(role_id)
+                role_risk.append(_RISK_CODE.get(risk, 0))
+
+        user_index: Dict[str, int] = {}
+        user_ids: List[str] = []
+        edge_users = _u32()
+        edge_roles = _u32()
+        for user_id, role_id, risk in entitlements:
+            u = user_index.get(user_id)
+            if u is None:
+                u = user_index[user_id] = len(user_ids)
+                user_ids.append(user_id)
+            r = role_index.get(role_id)
+            if r is None:
+                r = role_index[role_id] = len(role_ids)
+                role_ids.append(role_id)
+                role_risk.append(_RISK_CODE.get(risk, 0))
+            edge_users.append(u)
+            edge_roles.append(r)
+
+        user_offsets, user_roles = cls._csr(len(user_ids), edge_users, edge_roles)
+        role_offsets, role_users = cls._csr(len(role_ids), edge_roles, edge_users)
+        graph = cls(user_ids, role_ids, role_risk, user_offsets, user_roles, role_offsets, role_users)
+        graph._user_index = user_index
+        graph._role_index = role_index
+        return graph
+
+    @classmethod
+    def load_from_db(cls, conn) -> "EntitlementGraph":
+        return cls.from_rows(repo.iter_roles(conn), repo.iter_entitlements(conn))
+
+    @staticmethod
+    def _csr(size: int, sources: array, targets: array) -> Tuple[array, array]:
+        """Counting sort of (source, target) edges into offsets + targets."""
+        counts = [0] * (size + 1)
+        for s in sources:
+            counts[s + 1] += 1
+        for i in range(size):
+            counts[i + 1] += counts[i]
+        offsets = _u32(counts)
+        cursor = counts[:-1]
+        out = _u32([0]) * len(targets)
+        for s, t in zip(sources, targets):
+            out[cursor[s]] = t
+            cursor[s] += 1
+        return offsets, out
+
+    # --- lookups ------------------------------------------------------
+    @property
+    def user_count(self) -> int:
+        return len(self.user_offsets) - 1
+
+    @property
+    def role_count(self) -> int:
+        return len(self.role_offsets) - 1
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.user_roles)
+
+    def user_index(self, user_id: str) -> int | None:
+        if self._user_index is None:
+            self._user_index = {uid: i for i, uid in enumerate(self.user_ids)}
+        return self._user_index.get(user_id)
+
+    def role_index(self, role_id: str) -> int | None:
+        if self._role_index is None:
+            self._role_index = {rid: i for i, rid in enumerate(self.role_ids)}
+        return self._role_index.get(role_id)
+
+    def roles_of(self, user_id: str) -> List[str]:
+        u = self.user_index(user_id)
+        if u is None:
+            return []
+        start, end = self.user_offsets[u], self.user_offsets[u + 1]
+        return [self.role_ids[r] for r in self.user_roles[start:end]]
+
+    def users_with_role(self, role_id: str) -> List[str]:
+        """Everyone who shares role_id."""
+        r = self.role_index(role_id)
+        if r is None:
+            return []
+        start, end = self.role_offsets[r], self.role_offsets[r + 1]
+        return [self.user_ids[u] for u in self.role_users[start:end]]
+
+    def role_bits(self, r: int) -> int:
+        """Bitset of user indices holding role index r (cached)."""
+        bits = self._role_bits.get(r)
+        if bits is None:
+            start, end = self.role_offsets[r], self.role_offsets[r + 1]
+            mask = bytearray((self.user_count + 7) // 8)
+            for u in self.role_users[start:end]:
+                mask[u >> 3] |= 1 << (u & 7)
+            bits = self._role_bits[r] = int.from_bytes(mask, "little")
+        return bits
+
+    def roles_with_risk(self, *levels: str) -> List[int]:
+        codes = {_RISK_CODE[level] for level in levels}
+        return [r for r, code in enumerate(self.role_risk) if code in codes]
+
+    def users_bits_with_risk(self, *levels: str) -> int:
+        bits = 0
+        for r in self.roles_with_risk(*levels):
+            bits |= self.role_bits(r)
+        return bits
+
+    def users_with_risk(self, *levels: str) -> List[str]:
+        """Users holding at least one role at any of the given risk levels."""
+        return [self.user_ids[u] for u in _bits_to_indices(self.users_bits_with_risk(*levels))]
+
+    def nbytes(self) -> int:
+        """Approximate size of the adjacency arrays (excludes id strings)."""
+        return sum(
+            len(a) * (a.itemsize if hasattr(a, "itemsize") else 1)
+            for a in (
+                self.user_offsets,
+                self.user_roles,
+                self.role_offsets,
+                self.role_users,
+                self.role_risk,
+            )
+        )
+
+    # --- persistence --------------------------------------------------
+    def save(self, path: str):
+        """
+        Layout: header, uint32 sections (user_offsets, user_roles,
+        role_offsets, role_users), role_risk bytes padded to 4, then the
+        newline-joined user and role id tables. Native little-endian only.
+        """
+        user_blob = "\n".join(self.user_ids).encode("utf-8")
+        role_blob = "\n".join(self.role_ids).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    _MAGIC,
+                    _FORMAT_VERSION,
+                    1 if sys.byteorder == "little" else 0,
+                    self.user_count,
+                    self.role_count,
+                    self.edge_count,
+                )
+            )
+            for section in (self.user_offsets, self.user_roles, self.role_offsets, self.role_users):
+                f.write(_u32(section).tobytes())
+            risk = bytes(self.role_risk)
+            f.write(risk + b"\0" * (-len(risk) % 4))
+            f.write(struct.pack("<II", len(user_blob), len(role_blob)))
+            f.write(user_blob)
+            f.write(role_blob)
+
+    @classmethod
+    def open(cls, path: str) -> "EntitlementGraph":
+        """Map a saved index; adjacency arrays are zero-copy views over the file."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        magic, version, little, users, roles, edges = _HEADER.unpack_from(view, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"{path} is not an entitlement graph (v{_FORMAT_VERSION})")
+        if bool(little) != (sys.byteorder == "little"):
+            raise ValueError("Entitlement graph was written on a different byte order")
+
+        offset = _HEADER.size
+
+        def take_u32(count: int):
+            nonlocal offset
+            section = view[offset:offset + 4 * count].cast("I")
+            offset += 4 * count
+            return section
+
+        user_offsets = take_u32(users + 1)
+        user_roles = take_u32(edges)
+        role_offsets = take_u32(roles + 1)
+        role_users = take_u32(edges)
+        role_risk = view[offset:offset + roles]
+        offset += roles + (-roles % 4)
+        user_len, role_len = struct.unpack_from("<II", view, offset)
+        offset += 8
+        user_blob = bytes(view[offset:offset + user_len]).decode("utf-8")
+        role_blob = bytes(view[offset + user_len:offset + user_len + role_len]).decode("utf-8")
+
+        graph = cls(
+            user_blob.split("\n") if users else [],
+            role_blob.split("\n") if roles else [],
+            role_risk,
+            user_offsets,
+            user_roles,
+            role_offsets,
+            role_users,
+        )
+        graph._mmap = mm
+        return graph
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator
+
+from common import config
+
+CACHE_MODES = ("off", "cache", "record", "replay")
+# Read-only IAM calls made by discovery; anything else passes straight through
+CACHED_OPERATIONS = frozenset({
+    "list_users",
+    "list_attached_user_policies",
+    "list_user_policies",
+    "list_groups_for_user",
+    "list_attached_group_policies",
+    "list_group_policies",
+})
+_TOUCH_INTERVAL = 60.0
+
+
+class IAMCacheMiss(LookupError):
+    """Replay mode found no recorded response for a call."""
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot cache {type(value).__name__}")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _strip(response: Dict[str, Any]) -> Dict[str, Any]:
+    # Request ids and retry counts differ per call and are not worth storing
+    return {k: v for k, v in response.items() if k != "ResponseMetadata"}
+
+
+class ResponseStore:
+    """
+    SQLite file of compressed responses keyed by sha256(scope, operation,
+    params). Entries past ttl_seconds are ignored (and purged when the
+    store opens in cache mode); once the file holds more than max_bytes of
+    responses, the least recently read ones are evicted.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        # Autocommit + WAL: discovery worker processes share one store
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                operation TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(scope: str, operation: str, params: Dict[str, Any]) -> str:
+        raw = json.dumps([scope, operation, params], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, honor_ttl: bool = True) -> Any:
+        """Stored value, or None if absent (or expired when honor_ttl)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, accessed_at, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            stored_at, accessed_at, body = row
+            if honor_ttl and now - stored_at > self.ttl_seconds:
+                return None
+            # LRU bookkeeping without a write on every hit
+            if now - accessed_at > _TOUCH_INTERVAL:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(body), object_hook=_decode)
+
+    def put(self, key: str, operation: str, value: Any):
+        body = zlib.compress(json.dumps(value, separators=(",", ":"), default=_encode).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, operation, stored_at, accessed_at, size, body) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, operation, now, now, len(body), body),
+            )
+            self._total += len(body) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently read entries until the store is at 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self._total - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._total -= freed
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+            self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            return cur.rowcount
+
+    def clear(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM responses")
+            self._total = 0
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT operation, COUNT(*), SUM(size), MIN(stored_at), MAX(stored_at) FROM responses GROUP BY operation"
+            ).fetchall()
+        now = time.time()
+        return {
+            "path": self.path,
+            "entries": sum(r[1] for r in rows),
+            "bytes": sum(r[2] for r in rows),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "operations": {
+                op: {"entries": n, "bytes": size, "oldest_age_s": round(now - oldest), "newest_age_s": round(now - newest)}
+                for op, n, size, oldest, newest in rows
+            },
+        }
+
+
+class _CachingPaginator:
+    def __init__(self, client: "CachingIAMClient", operation: str):
+        self._client = client
+        self._operation = operation
+
+    def paginate(self, **params) -> Iterator[Dict[str, Any]]:
+        # Every page of a listing is stored under one key
+        pages = self._client._lookup(f"paginate:{self._operation}", params)
+        if pages is None:
+            pages = [_strip(p) for p in self._client._live().get_paginator(self._operation).paginate(**params)]
+            self._client._save(f"paginate:{self._operation}", params, pages)
+        return iter(pages)
+
+
+class CachingIAMClient:
+    """
+    Stand-in for a boto3 IAM client that serves the read-only discovery
+    calls from a ResponseStore:
+    - cache: fresh entries are served locally; misses go to IAM and are stored
+    - record: every call goes to IAM and overwrites the stored response
+    - replay: only stored responses are used (TTL ignored); a miss raises
+      IAMCacheMiss, so no client or credentials are needed
+    scope separates accounts that share a store.
+    """
+
+    def __init__(self, client, store: ResponseStore, mode: str, scope: str = "default"):
+        if mode not in CACHE_MODES[1:]:
+            raise ValueError(f"IAM cache mode must be one of {', '.join(CACHE_MODES[1:])}")
+        if client is None and mode != "replay":
+            raise ValueError(f"IAM cache mode {mode} needs a live IAM client")
+        self._client = client
+        self._store = store
+        self._mode = mode
+        self._scope = scope
+        self.hits = 0
+        self.misses = 0
+
+    def _live(self):
+        if self._client is None:
+            raise IAMCacheMiss("replay mode has no live IAM client")
+        return self._client
+
+    def _lookup(self, operation: str, params: Dict[str, Any]) -> Any:
+        if self._mode == "record":
+            return None
+        value = self._store.get(self._store.key(self._scope, operation, params), honor_ttl=self._mode == "cache")
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        if self._mode == "replay":
+            raise IAMCacheMiss(f"No recorded {operation} response for {self._scope} {params}")
+        return None
+
+    def _save(self, operation: str, params: Dict[str, Any], value: Any):
+        self._store.put(self._store.key(self._scope, operation, params), operation, value)
+
+    def _call(self, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = self._lookup(operation, params)
+        if response is None:
+            response = _strip(getattr(self._live(), operation)(**params))
+            self._save(operation, params, response)
+        return response
+
+    def get_paginator(self, operation: str):
+        if operation in CACHED_OPERATIONS:
+            return _CachingPaginator(self, operation)
+        return self._live().get_paginator(operation)
+
+    def __getattr__(self, name: str):
+        if name in CACHED_OPERATIONS:
+            return lambda **params: self._call(name, params)
+        return getattr(self._live(), name)
+
+
+_STORES: Dict[tuple, ResponseStore] = {}
+
+
+def get_store(path: str | None = None) -> ResponseStore:
+    """One ResponseStore per path per process (connections are not shared across fork)."""
+    path = path or config.IAM_CACHE_PATH
+    store = _STORES.get((path, os.getpid()))
+    if store is None:
+        store = ResponseStore(path, config.IAM_CACHE_TTL_SECONDS, config.IAM_CACHE_MAX_BYTES)
+        if config.IAM_CACHE_MODE == "cache":
+            store.purge_expired()
+        _STORES[(path, os.getpid())] = store
+    return store
+
+
+def wrap(client, scope: str = "default", mode: str | None = None):
+    """Return client unchanged when IAM_CACHE_MODE is off, else a CachingIAMClient."""
+    mode = (mode or config.IAM_CACHE_MODE).lower()
+    if mode == "off":
+        return client
+    return CachingIAMClient(client, get_store(), mode, scope)
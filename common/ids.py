@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from common import config
+
+ID_SCHEMES = ("uuid7", "uuid4")
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> str:
+    """
+    RFC 9562 UUIDv7: 48-bit Unix milliseconds, then a 12-bit counter, then 62
+    random bits. Ids from one process sort (as text too) in creation order,
+    so new keys land at the right edge of a B-tree instead of splitting
+    pages all over it. The counter starts at a random value each
+    millisecond; if it overflows, the timestamp is borrowed forward by 1 ms.
+    """
+    global _last_ms, _counter
+    rand = int.from_bytes(os.urandom(8), "big")
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms, _counter = ms, rand >> 53  # 11 random bits leave room to count up
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms, _counter = _last_ms + 1, 0
+        ms, counter = _last_ms, _counter
+    value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+    h = f"{value:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def new_id(scheme: str | None = None) -> str:
+    """New primary key for campaigns, reviews and audit logs (ID_SCHEME, default uuid7)."""
+    scheme = scheme or config.ID_SCHEME
+    if scheme == "uuid7":
+        return uuid7()
+    if scheme == "uuid4":
+        return str(uuid.uuid4())
+    raise ValueError(f"Unsupported ID scheme {scheme!r}; expected one of {', '.join(ID_SCHEMES)}")
+
+
+def id_timestamp(value: str) -> datetime | None:
+    """Creation time embedded in a UUIDv7, or None for other ids."""
+    try:
+        parsed = uuid.UUID(value)
+    except (ValueError, AttributeError, TypeError):
+        return None
+    if parsed.version != 7:
+        return None
+    return datetime.fromtimestamp((parsed.int >> 80) / 1000, tz=timezone.utc)
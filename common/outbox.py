@@ -0,0 +1,80 @@
+import json
+import os
+import queue
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from common import config, logger, repo
+
+
+def event_message(event: repo.OutboxEvent) -> Dict[str, Any]:
+    """Wire form of an outbox row; consumers dedupe on seq."""
+    created_at = event.created_at
+    return {
+        "seq": event.seq,
+        "type": event.event_type,
+        "entity_id": event.entity_id,
+        "payload": json.loads(event.payload) if event.payload else None,
+        "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else created_at,
+    }
+
+
+class JsonlSink:
+    """Append events to <directory>/events-YYYY-MM-DD.jsonl, fsync'd per batch."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def publish(self, messages: List[Dict[str, Any]]):
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        path = os.path.join(self.directory, f"events-{day}.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(m, separators=(",", ":"), default=str) + "\n" for m in messages)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class QueueSink:
+    """In-process stand-in for a message queue (tests, local runs)."""
+
+    def __init__(self, target: queue.Queue | None = None):
+        self.queue = target if target is not None else queue.Queue()
+
+    def publish(self, messages: List[Dict[str, Any]]):
+        for message in messages:
+            self.queue.put(message)
+
+
+def relay(conn, sink, batch_size: int | None = None, max_batches: int | None = None) -> Dict[str, Any]:
+    """
+    Drain unrelayed events: claim a batch in seq order, publish it, mark it
+    relayed and commit, until the outbox is empty (or max_batches).
+    Delivery is at-least-once: a crash between publish and commit
+    republishes that batch on the next run. seq is increasing but not
+    gap-free, and under concurrent writers a lower seq can commit after a
+    higher one has been relayed, so consumers should key on seq rather than
+    expect a contiguous sequence.
+    """
+    batch_size = batch_size or config.OUTBOX_BATCH_SIZE
+    relayed = batches = 0
+    last_seq = None
+    while max_batches is None or batches < max_batches:
+        events = repo.claim_outbox_batch(conn, batch_size)
+        if not events:
+            break
+        sink.publish([event_message(e) for e in events])
+        repo.ack_outbox(conn, [e.seq for e in events], datetime.now(timezone.utc).isoformat())
+        conn.commit()
+        relayed += len(events)
+        batches += 1
+        last_seq = events[-1].seq
+        logger.log(
+            "outbox_relay",
+            "batch",
+            f"Relayed {len(events)} events",
+            level="DEBUG",
+            details={"first_seq": events[0].seq, "last_seq": last_seq},
+        )
+    remaining, _ = repo.outbox_backlog(conn)
+    return {"relayed": relayed, "batches": batches, "last_seq": last_seq, "remaining": remaining}
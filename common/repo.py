@@ -1,8 +1,176 @@
 from datetime import datetime
+import base64
+import itertools
 import json
-from typing import Any, Iterable, List, Tuple
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Set, Tuple
 
+from common import config, ids
 from common.db import db
+from common.sharding import ShardSpec
+
+
+# Bulk loading
+def bulk_insert(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple[Any, ...]],
+    conflict_columns: Sequence[str],
+) -> int:
+    """
+    Insert rows, ignoring conflicts on conflict_columns.
+    - Postgres at/above BULK_LOAD_THRESHOLD: COPY into a temp staging table,
+      then INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    - Otherwise: executemany with ON CONFLICT DO NOTHING.
+    An empty conflict_columns ignores conflicts on any unique constraint
+    (needed for partitioned tables whose keys include the partition column).
+    Returns the number of rows submitted.
+    """
+    if not rows:
+        return 0
+    col_list = ", ".join(columns)
+    conflict = f"({', '.join(conflict_columns)})" if conflict_columns else ""
+
+    if db.is_sqlite or len(rows) < config.BULK_LOAD_THRESHOLD:
+        placeholders = ", ".join("?" for _ in columns)
+        db.executemany(
+            conn.cursor(),
+            f"""
+            INSERT INTO {table} ({col_list})
+            VALUES ({placeholders})
+            ON CONFLICT{conflict} DO NOTHING
+            """,
+            rows,
+        )
+        return len(rows)
+
+    staging = f"_stage_{table}"
+    cur = conn.cursor()
+    db.execute(cur, f"DROP TABLE IF EXISTS {staging}")
+    db.execute(
+        cur,
+        f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP",
+    )
+    db.copy_rows(cur, staging, columns, rows)
+    db.execute(
+        cur,
+        f"""
+        INSERT INTO {table} ({col_list})
+        SELECT {col_list} FROM {staging}
+        ON CONFLICT{conflict} DO NOTHING
+        """,
+    )
+    db.execute(cur, f"DROP TABLE {staging}")
+    return len(rows)
+
+
+def bulk_insert_users(conn, rows: Sequence[Tuple[str, str, str, str, str | None]]) -> int:
+    """rows: (user_id, user_name, arn, created_at, account_id)"""
+    return bulk_insert(
+        conn, "users", ("user_id", "user_name", "arn", "created_at", "account_id"), rows, ("user_id",)
+    )
+
+
+def bulk_insert_roles(conn, rows: Sequence[Tuple[str, str, str, str | None]]) -> int:
+    """rows: (role_id, role_name, risk_level, account_id)"""
+    return bulk_insert(
+        conn, "roles", ("role_id", "role_name", "risk_level", "account_id"), rows, ("role_id",)
+    )
+
+
+def bulk_link_user_roles(conn, rows: Sequence[Tuple[str, str]]) -> int:
+    """rows: (user_id, role_id)"""
+    return bulk_insert(conn, "user_roles", ("user_id", "role_id"), rows, ("user_id", "role_id"))
+
+
+def bulk_insert_user_role_sources(conn, rows: Sequence[Tuple[str, str, str, str]]) -> int:
+    """rows: (user_id, role_id, source, source_ref); source is DIRECT, INLINE or GROUP."""
+    return bulk_insert(
+        conn,
+        "user_role_sources",
+        ("user_id", "role_id", "source", "source_ref"),
+        rows,
+        ("user_id", "role_id", "source", "source_ref"),
+    )
+
+
+def bulk_create_reviews(conn, rows: Sequence[Tuple[str, str, str, str, str, str, str | None]]) -> int:
+    """
+    rows: (review_id, campaign_id, user_id, role_id, created_at, priority,
+    risk_snapshot); status defaults to PENDING. Rows whose key already
+    exists are skipped, so only inserted rows count toward the PENDING
+    rollups:
+    - Postgres at/above BULK_LOAD_THRESHOLD: COPY into a staging table,
+      then one statement inserts the reviews and bumps the rollups from
+      the RETURNING rows.
+    - Otherwise: executemany per (campaign, risk) bucket; the bucket's
+      rowcount is its delta.
+    Returns the number of rows inserted.
+    """
+    if not rows:
+        return 0
+    columns = ("review_id", "campaign_id", "user_id", "role_id", "created_at", "priority", "risk_snapshot")
+    col_list = ", ".join(columns)
+    cur = conn.cursor()
+    # No conflict target: on Postgres the key is (review_id, campaign_id)
+    if db.is_sqlite or len(rows) < config.BULK_LOAD_THRESHOLD:
+        buckets: Dict[Tuple[str, str], List[Tuple[Any, ...]]] = {}
+        for row in rows:
+            buckets.setdefault((row[1], row[6] or UNKNOWN_RISK), []).append(row)
+        deltas = []
+        for (campaign_id, risk_level), bucket in buckets.items():
+            db.executemany(
+                cur,
+                f"""
+                INSERT INTO access_reviews ({col_list})
+                VALUES ({", ".join("?" for _ in columns)})
+                ON CONFLICT DO NOTHING
+                """,
+                bucket,
+            )
+            if cur.rowcount:
+                deltas.append((campaign_id, risk_level, "PENDING", cur.rowcount, 0))
+        _bump_review_rollups(conn, deltas)
+        return sum(delta[3] for delta in deltas)
+
+    cur.execute("DROP TABLE IF EXISTS _stage_access_reviews")
+    cur.execute("CREATE TEMP TABLE _stage_access_reviews (LIKE access_reviews INCLUDING DEFAULTS) ON COMMIT DROP")
+    db.copy_rows(cur, "_stage_access_reviews", columns, rows)
+    rollups = _upsert_rollups_sql(
+        f"""
+        SELECT campaign_id, {_ROLLUP_RISK}, 'PENDING', COUNT(*), 0
+        FROM inserted
+        GROUP BY campaign_id, {_ROLLUP_RISK}
+        """
+    )
+    cur.execute(
+        f"""
+        WITH inserted AS (
+            INSERT INTO access_reviews ({col_list})
+            SELECT {col_list} FROM _stage_access_reviews
+            ON CONFLICT DO NOTHING
+            RETURNING campaign_id, risk_snapshot
+        ), bumped AS (
+            {rollups}
+        )
+        SELECT COUNT(*) FROM inserted
+        """
+    )
+    created = cur.fetchone()[0]
+    cur.execute("DROP TABLE _stage_access_reviews")
+    return created
+
+
+def bulk_insert_carry_forwards(conn, rows: Sequence[Tuple[str, str, str, str, str]]) -> int:
+    """rows: (campaign_id, user_id, role_id, carried_from_review_id, certified_at)"""
+    return bulk_insert(
+        conn,
+        "review_carry_forwards",
+        ("campaign_id", "user_id", "role_id", "carried_from_review_id", "certified_at"),
+        rows,
+        ("campaign_id", "user_id", "role_id"),
+    )
 
 
 # Users / roles / user_roles
@@ -42,6 +210,48 @@ def link_user_role(conn, user_id: str, role_id: str):
     )
 
 
+# Discovery checkpoints
+def get_discovery_state(conn, state_id: str) -> Tuple[str | None, int, str, str] | None:
+    """Returns (marker, users_processed, status, started_at) or None."""
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        """
+        SELECT marker, users_processed, status, started_at
+        FROM discovery_state
+        WHERE state_id = ?
+        """,
+        (state_id,),
+    )
+    return cur.fetchone()
+
+
+def save_discovery_state(
+    conn,
+    state_id: str,
+    marker: str | None,
+    users_processed: int,
+    status: str,
+    started_at: str,
+    updated_at: str,
+):
+    db.execute(
+        conn.cursor(),
+        """
+        INSERT INTO discovery_state
+            (state_id, marker, users_processed, status, started_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(state_id) DO UPDATE SET
+            marker = excluded.marker,
+            users_processed = excluded.users_processed,
+            status = excluded.status,
+            started_at = excluded.started_at,
+            updated_at = excluded.updated_at
+        """,
+        (state_id, marker, users_processed, status, started_at, updated_at),
+    )
+
+
 # Campaigns / reviews
 def create_campaign(conn, campaign_id: str, name: str, created_at: str):
     db.execute(
@@ -52,19 +262,245 @@ def create_campaign(conn, campaign_id: str, name: str, created_at: str):
         """,
         (campaign_id, name, created_at),
     )
+    _ensure_review_partition(conn, campaign_id)
+
+
+def _ensure_review_partition(conn, campaign_id: str):
+    """Postgres: access_reviews is list-partitioned per campaign."""
+    if not db.is_sqlite:
+        db.execute(conn.cursor(), "SELECT ensure_review_partition(?)", (campaign_id,))
+
+
+def ensure_campaign(conn, campaign_id: str, name: str, created_at: str):
+    """
+    Create the campaign unless it exists (shards of one campaign share it).
+    The Postgres partition is attached before the campaigns row is written:
+    ATTACH needs a lock on campaigns (FK) that conflicts with another
+    shard's pending INSERT. Callers commit before inserting reviews so the
+    partition's advisory lock is not held across the campaign.
+    """
+    _ensure_review_partition(conn, campaign_id)
+    db.execute(
+        conn.cursor(),
+        """
+        INSERT INTO campaigns (campaign_id, name, created_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(campaign_id) DO NOTHING
+        """,
+        (campaign_id, name, created_at),
+    )
+
+
+def close_completed_campaigns(conn, closed_at: str) -> int:
+    """
+    Close open campaigns with no PENDING reviews and no unremediated
+    revocations. Returns how many were closed.
+    """
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        """
+        UPDATE campaigns
+        SET closed_at = ?
+        WHERE closed_at IS NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM access_reviews r
+              WHERE r.campaign_id = campaigns.campaign_id
+                AND (r.status = 'PENDING' OR (r.status = 'REVOKED' AND r.remediated_at IS NULL))
+          )
+        """,
+        (closed_at,),
+    )
+    return cur.rowcount
+
+
+def list_archivable_campaigns(conn, closed_before: str) -> List[str]:
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        """
+        SELECT campaign_id FROM campaigns
+        WHERE closed_at IS NOT NULL
+          AND closed_at < ?
+          AND archived_at IS NULL
+        ORDER BY closed_at
+        """,
+        (closed_before,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def _sqlite_columns(conn, table: str) -> List[Tuple[str, str]]:
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table})")
+    return [(row[1], row[2]) for row in cur.fetchall()]
 
 
-def list_entitlements(conn) -> List[Tuple[str, str, str]]:
+def list_default_partition_campaigns(conn) -> List[str]:
+    """
+    Postgres: campaigns with reviews still in access_reviews_default, i.e.
+    rows from before 0002_partitioning. Always empty on SQLite.
+    """
+    if db.is_sqlite:
+        return []
     cur = conn.cursor()
+    cur.execute("SELECT DISTINCT campaign_id FROM access_reviews_default ORDER BY campaign_id")
+    return [row[0] for row in cur.fetchall()]
+
+
+def partition_campaign_reviews(conn, campaign_id: str):
+    """Postgres: move a campaign's rows out of the default partition into its own."""
+    _ensure_review_partition(conn, campaign_id)
+
+
+def archive_campaign(conn, campaign_id: str, archived_at: str) -> int | str | None:
+    """
+    Move a closed campaign's reviews out of the hot access_reviews table.
+    - Postgres: detach the campaign partition and rename it
+      access_reviews_archived_<hash> (returns the cold table name).
+    - SQLite: copy rows into access_reviews_archive, delete them from
+      access_reviews (returns rows moved). The archive table tracks any
+      columns added to access_reviews since it was created.
+    """
+    cur = conn.cursor()
+    if not db.is_sqlite:
+        # A campaign still in the default partition gets its own one first
+        _ensure_review_partition(conn, campaign_id)
+        db.execute(cur, "SELECT archive_review_partition(?)", (campaign_id,))
+        moved = cur.fetchone()[0]
+    else:
+        columns = _sqlite_columns(conn, "access_reviews")
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS access_reviews_archive "
+            "(review_id TEXT PRIMARY KEY, archived_at TIMESTAMP)"
+        )
+        existing = {name for name, _ in _sqlite_columns(conn, "access_reviews_archive")}
+        for name, col_type in columns:
+            if name not in existing:
+                cur.execute(f"ALTER TABLE access_reviews_archive ADD COLUMN {name} {col_type}")
+        col_list = ", ".join(name for name, _ in columns)
+        db.execute(
+            cur,
+            f"""
+            INSERT OR REPLACE INTO access_reviews_archive ({col_list}, archived_at)
+            SELECT {col_list}, ? FROM access_reviews WHERE campaign_id = ?
+            """,
+            (archived_at, campaign_id),
+        )
+        db.execute(cur, "DELETE FROM access_reviews WHERE campaign_id = ?", (campaign_id,))
+        moved = cur.rowcount
+    # The rollup covers the hot table only
+    db.execute(cur, "DELETE FROM review_rollups WHERE campaign_id = ?", (campaign_id,))
     db.execute(
         cur,
+        "UPDATE campaigns SET archived_at = ? WHERE campaign_id = ?",
+        (archived_at, campaign_id),
+    )
+    return moved
+
+
+def ensure_audit_log_partitions(conn, months_ahead: int = 3):
+    """Postgres: pre-create monthly audit_logs partitions (no-op on SQLite)."""
+    if not db.is_sqlite:
+        db.execute(
+            conn.cursor(),
+            "SELECT ensure_audit_log_partitions(CURRENT_DATE, ?)",
+            (months_ahead + 1,),
+        )
+
+
+# Streaming reads: the iter_* functions yield compact NamedTuple rows from
+# db.stream (server-side cursors on Postgres); list_* materialize them.
+class Entitlement(NamedTuple):
+    user_id: str
+    role_id: str
+    risk_level: str
+
+
+class Role(NamedTuple):
+    role_id: str
+    role_name: str
+    risk_level: str
+
+
+class User(NamedTuple):
+    user_id: str
+    user_name: str
+    arn: str
+
+
+class Revocation(NamedTuple):
+    review_id: str
+    user_name: str
+    role_name: str
+    role_id: str
+    user_id: str
+    campaign_id: str
+    # (source, source_ref) of every path still granting the role, as in
+    # user_role_sources; DIRECT when discovery recorded none
+    sources: Tuple[Tuple[str, str], ...]
+
+
+class ReviewContext(NamedTuple):
+    review_id: str
+    user_id: str
+    role_id: str
+    user_name: str
+    role_name: str
+    risk_level: str
+    campaign_id: str
+
+
+def _shard_clauses(shard: ShardSpec | None, column: str) -> Tuple[List[str], List[Any]]:
+    """WHERE conditions (and params) for a key-range shard on column; a hash shard has none."""
+    clauses, params = [], []
+    if shard and shard.start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(shard.start)
+    if shard and shard.end is not None:
+        clauses.append(f"{column} < ?")
+        params.append(shard.end)
+    return clauses, params
+
+
+def _hash_filter(rows: Iterable[Tuple[Any, ...]], shard: ShardSpec | None, key: int = 0) -> Iterable[Tuple[Any, ...]]:
+    """Apply a hash shard to streamed rows by row[key]; key ranges were applied in SQL."""
+    if shard and shard.count:
+        return (row for row in rows if shard.contains(row[key]))
+    return rows
+
+
+def iter_entitlements(conn, batch_size: int | None = None, shard: ShardSpec | None = None) -> Iterator[Entitlement]:
+    """All entitlements, optionally only those whose user_id falls in shard."""
+    clauses, params = _shard_clauses(shard, "ur.user_id")
+    rows = db.stream(
+        conn,
         """
         SELECT ur.user_id, ur.role_id, r.risk_level
         FROM user_roles ur
         JOIN roles r ON ur.role_id = r.role_id
+        """
+        + (f"WHERE {' AND '.join(clauses)}" if clauses else ""),
+        params,
+        batch_size,
+    )
+    return map(Entitlement._make, _hash_filter(rows, shard))
+
+
+def list_entitlements(conn) -> List[Entitlement]:
+    return list(iter_entitlements(conn))
+
+
+def list_pending_review_keys(conn) -> Set[Tuple[str, str]]:
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        """
+        SELECT user_id, role_id FROM access_reviews
+        WHERE status = 'PENDING'
         """,
     )
-    return cur.fetchall()
+    return {(row[0], row[1]) for row in cur.fetchall()}
 
 
 def pending_review_exists(conn, user_id: str, role_id: str) -> bool:
@@ -80,28 +516,99 @@ def pending_review_exists(conn, user_id: str, role_id: str) -> bool:
     return cur.fetchone() is not None
 
 
-def create_review(conn, review_id: str, campaign_id: str, user_id: str, role_id: str, created_at: str):
+def create_review(
+    conn, review_id: str, campaign_id: str, user_id: str, role_id: str, created_at: str, risk_snapshot: str | None = None
+):
     db.execute(
         conn.cursor(),
         """
         INSERT INTO access_reviews
-        (review_id, campaign_id, user_id, role_id, status, created_at)
-        VALUES (?, ?, ?, ?, 'PENDING', ?)
+        (review_id, campaign_id, user_id, role_id, status, created_at, risk_snapshot)
+        VALUES (?, ?, ?, ?, 'PENDING', ?, ?)
         """,
-        (review_id, campaign_id, user_id, role_id, created_at),
+        (review_id, campaign_id, user_id, role_id, created_at, risk_snapshot),
     )
+    _bump_review_rollups(conn, [(campaign_id, risk_snapshot or UNKNOWN_RISK, "PENDING", 1, 0)])
 
 
-def list_roles(conn) -> List[Tuple[str, str, str]]:
-    cur = conn.cursor()
-    db.execute(
-        cur,
+def latest_low_risk_approvals(conn, approved_since: str) -> Dict[Tuple[str, str], str]:
+    """
+    (user_id, role_id) -> review_id for grants whose latest decision since
+    approved_since was an APPROVED review created while the role was LOW
+    risk. A later REVOKED decision, or a later review at another risk
+    level, supersedes the approval. One range scan over
+    idx_reviews_decided; the caller hash-joins it with the entitlement
+    stream.
+    """
+    rows = db.stream(
+        conn,
         """
-        SELECT role_id, role_name, risk_level
-        FROM roles
+        SELECT user_id, role_id, review_id
+        FROM (
+            SELECT user_id, role_id, review_id, status, risk_snapshot,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, role_id ORDER BY reviewed_at DESC, review_id DESC) AS rn
+            FROM access_reviews
+            WHERE status <> 'PENDING' AND reviewed_at >= ?
+        ) latest
+        WHERE rn = 1 AND status = 'APPROVED' AND risk_snapshot = 'LOW'
         """,
+        (approved_since,),
     )
-    return cur.fetchall()
+    return {(user_id, role_id): review_id for user_id, role_id, review_id in rows}
+
+
+def count_carry_forwards(conn) -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM review_carry_forwards")
+    return cur.fetchone()[0]
+
+
+def iter_roles(conn, batch_size: int | None = None, shard: ShardSpec | None = None) -> Iterator[Role]:
+    clauses, params = _shard_clauses(shard, "role_id")
+    sql = "SELECT role_id, role_name, risk_level FROM roles " + (f"WHERE {' AND '.join(clauses)}" if clauses else "")
+    return map(Role._make, _hash_filter(db.stream(conn, sql, params, batch_size), shard))
+
+
+def iter_users(conn, batch_size: int | None = None) -> Iterator[User]:
+    return map(User._make, db.stream(conn, "SELECT user_id, user_name, arn FROM users", (), batch_size))
+
+
+def list_roles(conn) -> List[Role]:
+    return list(iter_roles(conn))
+
+
+def iter_roles_to_evaluate(
+    conn, ruleset: str, batch_size: int | None = None, shard: ShardSpec | None = None
+) -> Iterator[Role]:
+    """Roles never classified, or classified under a ruleset other than `ruleset`."""
+    clauses, params = _shard_clauses(shard, "role_id")
+    rows = db.stream(
+        conn,
+        f"""
+        SELECT role_id, role_name, risk_level FROM roles
+        WHERE (risk_ruleset IS NULL OR risk_ruleset <> ?){''.join(' AND ' + c for c in clauses)}
+        ORDER BY role_id
+        """,
+        [ruleset, *params],
+        batch_size,
+    )
+    return map(Role._make, _hash_filter(rows, shard))
+
+
+def record_role_evaluations(conn, rows: Sequence[Tuple[str, str, str, str]]) -> int:
+    """
+    rows: (risk_level, ruleset, evaluated_at, role_id). Stamps every
+    evaluated role, changed or not; the outbox trigger only fires for
+    roles whose risk_level actually changed.
+    """
+    if not rows:
+        return 0
+    db.executemany(
+        conn.cursor(),
+        "UPDATE roles SET risk_level = ?, risk_ruleset = ?, risk_evaluated_at = ? WHERE role_id = ?",
+        rows,
+    )
+    return len(rows)
 
 
 def update_role_risk(conn, role_id: str, new_risk: str):
@@ -116,44 +623,100 @@ def update_role_risk(conn, role_id: str, new_risk: str):
     )
 
 
-def list_revocations(conn) -> List[Tuple[str, str, str, str]]:
+# Separation of duties
+def replace_sod_violations(conn, rows: Sequence[Tuple[str, str, str]], detected_at: str) -> int:
+    """
+    Replace the current violation set with rows of (rule_id, user_id, role_id).
+    Detection is a full evaluation, so stale violations are cleared first.
+    """
+    db.execute(conn.cursor(), "DELETE FROM sod_violations")
+    return bulk_insert(
+        conn,
+        "sod_violations",
+        ("rule_id", "user_id", "role_id", "detected_at"),
+        [(rule_id, user_id, role_id, detected_at) for rule_id, user_id, role_id in rows],
+        ("rule_id", "user_id", "role_id"),
+    )
+
+
+def list_sod_violation_keys(conn) -> Set[Tuple[str, str]]:
     cur = conn.cursor()
     db.execute(
         cur,
         """
-        SELECT r.review_id, u.user_name, rol.role_name, rol.role_id
+        SELECT DISTINCT user_id, role_id FROM sod_violations
+        """,
+    )
+    return {(row[0], row[1]) for row in cur.fetchall()}
+
+
+def iter_revocations(conn, batch_size: int | None = None, shard: ShardSpec | None = None) -> Iterator[Revocation]:
+    """Unremediated revocations with the sources granting each; one row per source, grouped by review."""
+    clauses, params = _shard_clauses(shard, "r.review_id")
+    rows = db.stream(
+        conn,
+        f"""
+        SELECT r.review_id, u.user_name, rol.role_name, rol.role_id, r.user_id, r.campaign_id,
+               COALESCE(s.source, 'DIRECT'), COALESCE(s.source_ref, '')
         FROM access_reviews r
         JOIN users u ON r.user_id = u.user_id
         JOIN roles rol ON r.role_id = rol.role_id
-        WHERE r.status = 'REVOKED' 
-        AND r.remediated_at IS NULL
+        LEFT JOIN user_role_sources s ON s.user_id = r.user_id AND s.role_id = r.role_id
+        WHERE r.status = 'REVOKED'
+        AND r.remediated_at IS NULL{''.join(' AND ' + c for c in clauses)}
+        ORDER BY r.review_id
         """,
+        params,
+        batch_size,
     )
-    return cur.fetchall()
+    for _, group in itertools.groupby(_hash_filter(rows, shard), key=lambda row: row[0]):
+        group = list(group)
+        yield Revocation(*group[0][:6], tuple((row[6], row[7]) for row in group))
 
 
-def list_high_risk_reviews_missing_ai(conn) -> List[Tuple[str, str, str, str, str, str]]:
-    cur = conn.cursor()
+def delete_user_role_source(conn, user_id: str, role_id: str, source: str, source_ref: str):
+    """Forget one grant path after remediation removed it in IAM."""
     db.execute(
-        cur,
-        """
-        SELECT r.review_id, r.user_id, r.role_id, u.user_name, rol.role_name, rol.risk_level
+        conn.cursor(),
+        "DELETE FROM user_role_sources WHERE user_id = ? AND role_id = ? AND source = ? AND source_ref = ?",
+        (user_id, role_id, source, source_ref),
+    )
+
+
+def list_revocations(conn) -> List[Revocation]:
+    return list(iter_revocations(conn))
+
+
+def iter_high_risk_reviews_missing_ai(
+    conn, batch_size: int | None = None, shard: ShardSpec | None = None
+) -> Iterator[ReviewContext]:
+    clauses, params = _shard_clauses(shard, "r.review_id")
+    rows = db.stream(
+        conn,
+        f"""
+        SELECT r.review_id, r.user_id, r.role_id, u.user_name, rol.role_name, rol.risk_level, r.campaign_id
         FROM access_reviews r
         JOIN users u ON r.user_id = u.user_id
         JOIN roles rol ON r.role_id = rol.role_id
         WHERE rol.risk_level = 'HIGH'
-          AND (r.ai_risk_summary IS NULL OR r.ai_risk_summary = '')
+          AND (r.ai_risk_summary IS NULL OR r.ai_risk_summary = ''){''.join(' AND ' + c for c in clauses)}
         """,
+        params,
+        batch_size,
     )
-    return cur.fetchall()
+    return map(ReviewContext._make, _hash_filter(rows, shard))
+
 
+def list_high_risk_reviews_missing_ai(conn) -> List[ReviewContext]:
+    return list(iter_high_risk_reviews_missing_ai(conn))
 
-def fetch_review_context(conn, review_id: str) -> Tuple[str, str, str, str, str, str] | None:
+
+def fetch_review_context(conn, review_id: str) -> ReviewContext | None:
     cur = conn.cursor()
     db.execute(
         cur,
         """
-        SELECT r.review_id, r.user_id, r.role_id, u.user_name, rol.role_name, rol.risk_level
+        SELECT r.review_id, r.user_id, r.role_id, u.user_name, rol.role_name, rol.risk_level, r.campaign_id
         FROM access_reviews r
         JOIN users u ON r.user_id = u.user_id
         JOIN roles rol ON r.role_id = rol.role_id
@@ -161,65 +724,709 @@ def fetch_review_context(conn, review_id: str) -> Tuple[str, str, str, str, str,
         """,
         (review_id,),
     )
-    return cur.fetchone()
+    row = cur.fetchone()
+    return ReviewContext._make(row) if row else None
 
 
-def mark_remediated(conn, review_id: str, ts: str):
+def mark_remediated(conn, review_id: str, campaign_id: str, ts: str):
+    """
+    Stamp remediated_at once; the first stamp counts toward the rollups.
+    campaign_id keeps the update to one Postgres partition.
+    """
+    cur = conn.cursor()
     db.execute(
-        conn.cursor(),
+        cur,
         """
         UPDATE access_reviews
         SET remediated_at = ?
-        WHERE review_id = ?
+        WHERE review_id = ? AND campaign_id = ? AND remediated_at IS NULL
         """,
-        (ts, review_id),
+        (ts, review_id, campaign_id),
     )
+    if cur.rowcount:
+        db.execute(
+            cur,
+            _upsert_rollups_sql(
+                f"""
+                SELECT campaign_id, {_ROLLUP_RISK}, status, 0, 1
+                FROM access_reviews
+                WHERE review_id = ? AND campaign_id = ?
+                """
+            ),
+            (review_id, campaign_id),
+        )
+
+
+# Campaign progress rollups (review_rollups, see 0008_review_rollups.sql):
+# kept current by the create / decide / remediate / archive functions above
+# and below, in the caller's transaction.
+UNKNOWN_RISK = "UNKNOWN"
+_ROLLUP_RISK = f"COALESCE(risk_snapshot, '{UNKNOWN_RISK}')"
+
+
+class RollupRow(NamedTuple):
+    campaign_id: str
+    risk_level: str
+    status: str
+    review_count: int
+    remediated_count: int
+
+
+def _upsert_rollups_sql(select_sql: str) -> str:
+    """INSERT ... SELECT of (campaign_id, risk_level, status, review delta, remediated delta)."""
+    return f"""
+        INSERT INTO review_rollups (campaign_id, risk_level, status, review_count, remediated_count)
+        {select_sql}
+        ON CONFLICT (campaign_id, risk_level, status) DO UPDATE SET
+            review_count = review_rollups.review_count + excluded.review_count,
+            remediated_count = review_rollups.remediated_count + excluded.remediated_count,
+            updated_at = CURRENT_TIMESTAMP
+    """
+
+
+def _bump_review_rollups(conn, rows: Sequence[Tuple[str, str, str, int, int]]):
+    """rows: (campaign_id, risk_level, status, review delta, remediated delta)"""
+    if rows:
+        db.executemany(conn.cursor(), _upsert_rollups_sql("VALUES (?, ?, ?, ?, ?)"), rows)
+
+
+def _lock_staged_reviews(cur):
+    """Postgres: row-lock the reviews named in _stage_decisions until commit."""
+    cur.execute(
+        """
+        SELECT r.review_id FROM access_reviews r
+        JOIN _stage_decisions s ON s.review_id = r.review_id AND s.campaign_id = r.campaign_id
+        FOR UPDATE OF r
+        """
+    )
+
+
+def list_review_rollups(conn, campaign_id: str | None = None) -> List[RollupRow]:
+    cur = conn.cursor()
+    where = "WHERE campaign_id = ?" if campaign_id else ""
+    db.execute(
+        cur,
+        f"""
+        SELECT campaign_id, risk_level, status, review_count, remediated_count
+        FROM review_rollups
+        {where}
+        ORDER BY campaign_id, risk_level, status
+        """,
+        (campaign_id,) if campaign_id else (),
+    )
+    return [RollupRow._make(row) for row in cur.fetchall()]
+
+
+def rollup_status_counts(conn) -> Dict[str, int]:
+    """Per-status review counts across hot campaigns, from the rollup."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT status, SUM(review_count) FROM review_rollups
+        GROUP BY status
+        HAVING SUM(review_count) > 0
+        """
+    )
+    return {status: int(count) for status, count in cur.fetchall()}
+
+
+def _actual_rollups(conn, campaign_id: str | None = None) -> Dict[Tuple[str, str, str], Tuple[int, int]]:
+    cur = conn.cursor()
+    where = "WHERE campaign_id = ?" if campaign_id else ""
+    db.execute(
+        cur,
+        f"""
+        SELECT campaign_id, {_ROLLUP_RISK}, status, COUNT(*), COUNT(remediated_at)
+        FROM access_reviews
+        {where}
+        GROUP BY campaign_id, {_ROLLUP_RISK}, status
+        """,
+        (campaign_id,) if campaign_id else (),
+    )
+    return {(c, risk, status): (n, remediated) for c, risk, status, n, remediated in cur.fetchall()}
+
+
+def diff_review_rollups(conn, campaign_id: str | None = None) -> List[Tuple[RollupRow, RollupRow]]:
+    """
+    (stored, actual) pairs for every bucket where the rollup disagrees with
+    a GROUP BY over access_reviews. Empty buckets compare as zero.
+    """
+    actual = _actual_rollups(conn, campaign_id)
+    stored = {(r.campaign_id, r.risk_level, r.status): (r.review_count, r.remediated_count)
+              for r in list_review_rollups(conn, campaign_id)}
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        have, want = stored.get(key, (0, 0)), actual.get(key, (0, 0))
+        if have != want:
+            drift.append((RollupRow(*key, *have), RollupRow(*key, *want)))
+    return drift
+
+
+def rebuild_review_rollups(conn, campaign_id: str | None = None) -> List[Tuple[RollupRow, RollupRow]]:
+    """
+    Replace the rollup (for one campaign, or all) with a fresh GROUP BY over
+    access_reviews and return the drift that was corrected. On Postgres the
+    rollup table is locked first, so decisions committing meanwhile wait
+    and then apply their deltas on top of the rebuilt counts.
+    """
+    cur = conn.cursor()
+    if not db.is_sqlite:
+        cur.execute("LOCK TABLE review_rollups IN EXCLUSIVE MODE")
+    drift = diff_review_rollups(conn, campaign_id)
+    where = "WHERE campaign_id = ?" if campaign_id else ""
+    params = (campaign_id,) if campaign_id else ()
+    db.execute(cur, f"DELETE FROM review_rollups {where}", params)
+    db.execute(
+        cur,
+        f"""
+        INSERT INTO review_rollups (campaign_id, risk_level, status, review_count, remediated_count)
+        SELECT campaign_id, {_ROLLUP_RISK}, status, COUNT(*), COUNT(remediated_at)
+        FROM access_reviews
+        {where or "WHERE true"}
+        GROUP BY campaign_id, {_ROLLUP_RISK}, status
+        """,
+        params,
+    )
+    return drift
+
+
+# Reviewer decisions
+def get_review_states(conn, review_ids: Sequence[str]) -> Dict[str, Tuple[str, Any, str]]:
+    """review_id -> (status, remediated_at, campaign_id) for the ids that exist."""
+    if not review_ids:
+        return {}
+    cur = conn.cursor()
+    placeholders = ", ".join("?" for _ in review_ids)
+    db.execute(
+        cur,
+        f"SELECT review_id, status, remediated_at, campaign_id FROM access_reviews WHERE review_id IN ({placeholders})",
+        tuple(review_ids),
+    )
+    return {row[0]: (row[1], row[2], row[3]) for row in cur.fetchall()}
+
+
+# Rollup deltas for staged decisions: each review whose status changes
+# leaves its old (campaign, risk, status) bucket and joins the new one.
+# Read and written in one statement, before the UPDATE, so the old status
+# is the one being replaced.
+_DECISION_ROLLUP_DELTAS = f"""
+    SELECT campaign_id, risk_level, status, SUM(delta), 0
+    FROM (
+        SELECT r.campaign_id, COALESCE(r.risk_snapshot, '{UNKNOWN_RISK}') AS risk_level, r.status, -1 AS delta
+        FROM access_reviews r
+        JOIN _stage_decisions s ON s.review_id = r.review_id AND s.campaign_id = r.campaign_id
+        WHERE r.remediated_at IS NULL AND r.status <> s.status
+        UNION ALL
+        SELECT r.campaign_id, COALESCE(r.risk_snapshot, '{UNKNOWN_RISK}'), s.status, 1
+        FROM access_reviews r
+        JOIN _stage_decisions s ON s.review_id = r.review_id AND s.campaign_id = r.campaign_id
+        WHERE r.remediated_at IS NULL AND r.status <> s.status
+    ) d
+    WHERE true
+    GROUP BY campaign_id, risk_level, status
+"""
+
+
+def apply_review_decisions(conn, rows: Sequence[Tuple[str, str, str | None, str, str]]) -> int:
+    """
+    rows: (review_id, campaign_id, status, reviewer_comment, reviewer, reviewed_at).
+    Reviews that were already remediated are left untouched. Every match is
+    on the full (review_id, campaign_id) key so Postgres only touches the
+    campaigns' partitions.
+    - Postgres: COPY into a staging table, lock the staged reviews, then
+      one UPDATE ... FROM (executemany is a round trip per row there).
+    - SQLite: stage (review_id, campaign_id, status) in a temp table, then executemany
+      UPDATE by primary key.
+    The rollup deltas are computed from the staging table in SQL before
+    the UPDATE; the Postgres row locks keep a concurrent decision on the
+    same review from being counted twice.
+    Returns the number of rows submitted.
+    """
+    if not rows:
+        return 0
+    cur = conn.cursor()
+    if db.is_sqlite:
+        cur.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _stage_decisions "
+            "(review_id TEXT PRIMARY KEY, campaign_id TEXT, status TEXT)"
+        )
+        cur.execute("DELETE FROM _stage_decisions")
+        db.executemany(
+            cur,
+            "INSERT OR REPLACE INTO _stage_decisions (review_id, campaign_id, status) VALUES (?, ?, ?)",
+            [(review_id, campaign_id, status) for review_id, campaign_id, status, _, _, _ in rows],
+        )
+        db.execute(cur, _upsert_rollups_sql(_DECISION_ROLLUP_DELTAS))
+        db.executemany(
+            cur,
+            """
+            UPDATE access_reviews
+            SET status = ?, reviewer_comment = ?, reviewer = ?, reviewed_at = ?
+            WHERE review_id = ? AND campaign_id = ? AND remediated_at IS NULL
+            """,
+            [(status, comment, reviewer, reviewed_at, review_id, campaign_id)
+             for review_id, campaign_id, status, comment, reviewer, reviewed_at in rows],
+        )
+        cur.execute("DELETE FROM _stage_decisions")
+        return len(rows)
+
+    cur.execute("DROP TABLE IF EXISTS _stage_decisions")
+    cur.execute(
+        """
+        CREATE TEMP TABLE _stage_decisions (
+            review_id TEXT PRIMARY KEY,
+            campaign_id TEXT,
+            status TEXT,
+            reviewer_comment TEXT,
+            reviewer TEXT,
+            reviewed_at TIMESTAMPTZ
+        ) ON COMMIT DROP
+        """
+    )
+    columns = ("review_id", "campaign_id", "status", "reviewer_comment", "reviewer", "reviewed_at")
+    db.copy_rows(cur, "_stage_decisions", columns, rows)
+    _lock_staged_reviews(cur)
+    db.execute(cur, _upsert_rollups_sql(_DECISION_ROLLUP_DELTAS))
+    cur.execute(
+        """
+        UPDATE access_reviews r
+        SET status = s.status,
+            reviewer_comment = s.reviewer_comment,
+            reviewer = s.reviewer,
+            reviewed_at = s.reviewed_at
+        FROM _stage_decisions s
+        WHERE r.review_id = s.review_id AND r.campaign_id = s.campaign_id AND r.remediated_at IS NULL
+        """
+    )
+    cur.execute("DROP TABLE IF EXISTS _stage_decisions")
+    return len(rows)
+
+
+_EXPORT_SELECT = """
+    SELECT
+        r.review_id,
+        r.campaign_id,
+        u.user_name,
+        rol.role_name,
+        rol.risk_level,
+        r.status,
+        r.reviewer_comment,
+        r.created_at,
+        r.reviewed_at,
+        r.remediated_at,
+        r.ai_risk_summary
+    FROM access_reviews r
+    JOIN users u ON r.user_id = u.user_id
+    JOIN roles rol ON r.role_id = rol.role_id
+"""
 
 
 def fetch_reviews_for_export(conn) -> List[Tuple[Any, ...]]:
+    cur = conn.cursor()
+    db.execute(cur, _EXPORT_SELECT + "ORDER BY r.created_at DESC")
+    return cur.fetchall()
+
+
+def iter_reviews_for_export(conn, batch_size: int | None = None, shard: ShardSpec | None = None) -> Iterable[Tuple[Any, ...]]:
+    """
+    Same rows as fetch_reviews_for_export, streamed and unordered. A
+    review_id key-range shard is applied in SQL; a hash shard is filtered
+    as rows arrive.
+    """
+    clauses, params = _shard_clauses(shard, "r.review_id")
+    sql = _EXPORT_SELECT + (f"WHERE {' AND '.join(clauses)}" if clauses else "")
+    return _hash_filter(db.stream(conn, sql, params, batch_size), shard)
+
+
+def iter_review_facts(conn, batch_size: int | None = None) -> Iterable[Tuple[Any, ...]]:
+    """
+    The export's reviews with ids in place of user and role names:
+    (review_id, campaign_id, user_id, role_id, status, reviewer_comment,
+    ai_risk_summary, created_at, reviewed_at, remediated_at). Same rows and
+    order as fetch_reviews_for_export (review_id breaks created_at ties).
+    """
+    return db.stream(
+        conn,
+        """
+        SELECT r.review_id, r.campaign_id, r.user_id, r.role_id, r.status, r.reviewer_comment,
+               r.ai_risk_summary, r.created_at, r.reviewed_at, r.remediated_at
+        FROM access_reviews r
+        JOIN users u ON r.user_id = u.user_id
+        JOIN roles rol ON r.role_id = rol.role_id
+        ORDER BY r.created_at DESC, r.review_id
+        """,
+        (),
+        batch_size,
+    )
+
+
+def _histogram_split_points(conn, table: str, column: str, parts: int) -> List[str]:
+    """Split points from the Postgres planner histogram; empty before the table has been analyzed."""
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        """
+        SELECT histogram_bounds::text::text[]
+        FROM pg_stats
+        WHERE schemaname = current_schema() AND tablename = ? AND attname = ?
+        ORDER BY inherited DESC
+        LIMIT 1
+        """,
+        (table, column),
+    )
+    row = cur.fetchone()
+    bounds = row[0] if row and row[0] else []
+    if len(bounds) < parts:
+        return []
+    return sorted({bounds[len(bounds) * i // parts] for i in range(1, parts)})
+
+
+def review_id_split_points(conn, parts: int) -> List[str]:
+    """
+    Up to parts - 1 review_ids cutting access_reviews into roughly equal
+    key ranges, read from the Postgres planner histogram. Empty on SQLite
+    or before the table has been analyzed.
+    """
+    if db.is_sqlite or parts < 2:
+        return []
+    return _histogram_split_points(conn, "access_reviews", "review_id", parts)
+
+
+def key_split_points(conn, table: str, column: str, parts: int) -> List[str]:
+    """
+    Up to parts - 1 values of column (a leading key column of table)
+    cutting it into roughly equal key ranges, for key-range shards. Uses
+    the planner histogram on Postgres when there is one, otherwise walks
+    the key index at evenly spaced offsets.
+    """
+    if parts < 2:
+        return []
+    if not db.is_sqlite:
+        splits = _histogram_split_points(conn, table, column, parts)
+        if splits:
+            return splits
+    cur = conn.cursor()
+    db.execute(cur, f"SELECT COUNT(*) FROM {table}")
+    total = cur.fetchone()[0]
+    splits = set()
+    for i in range(1, parts):
+        db.execute(cur, f"SELECT {column} FROM {table} ORDER BY {column} LIMIT 1 OFFSET ?", (total * i // parts,))
+        row = cur.fetchone()
+        if row:
+            splits.add(row[0])
+    return sorted(splits)
+
+
+def count_reviews_by_status(conn) -> Dict[str, int]:
+    """Per-status counts over the same join the export reads."""
     cur = conn.cursor()
     db.execute(
         cur,
         """
-        SELECT 
-            r.review_id,
-            r.campaign_id,
-            u.user_name,
-            rol.role_name,
-            rol.risk_level,
-            r.status,
-            r.reviewer_comment,
-            r.created_at,
-            r.reviewed_at,
-            r.remediated_at,
-            r.ai_risk_summary
+        SELECT r.status, COUNT(*)
         FROM access_reviews r
         JOIN users u ON r.user_id = u.user_id
         JOIN roles rol ON r.role_id = rol.role_id
-        ORDER BY r.created_at DESC
+        GROUP BY r.status
         """,
     )
-    return cur.fetchall()
+    return {status: count for status, count in cur.fetchall()}
 
 
-def list_high_risk_reviews_missing_ai(conn) -> List[Tuple[str]]:
+# Entitlement usage (Access Advisor)
+def list_users_needing_usage(conn, checked_before: str) -> List[Tuple[str, str]]:
+    """(user_id, arn) of users with an entitlement never checked, or last checked before checked_before."""
     cur = conn.cursor()
     db.execute(
         cur,
         """
-        SELECT r.review_id
+        SELECT u.user_id, u.arn
+        FROM users u
+        WHERE u.arn IS NOT NULL
+          AND EXISTS (
+              SELECT 1 FROM user_roles ur
+              LEFT JOIN entitlement_usage eu ON eu.user_id = ur.user_id AND eu.role_id = ur.role_id
+              WHERE ur.user_id = u.user_id
+                AND (eu.checked_at IS NULL OR eu.checked_at < ?)
+          )
+        ORDER BY u.user_id
+        """,
+        (checked_before,),
+    )
+    return [(row[0], row[1]) for row in cur.fetchall()]
+
+
+def list_user_role_ids(conn, user_id: str) -> List[str]:
+    cur = conn.cursor()
+    db.execute(cur, "SELECT role_id FROM user_roles WHERE user_id = ? ORDER BY role_id", (user_id,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def upsert_entitlement_usage(conn, rows: Sequence[Tuple[str, str, str | None, str | None, int, int, str]]) -> int:
+    """rows: (user_id, role_id, last_used_at, last_used_service, services_granted, services_used, checked_at)"""
+    if not rows:
+        return 0
+    db.executemany(
+        conn.cursor(),
+        """
+        INSERT INTO entitlement_usage
+            (user_id, role_id, last_used_at, last_used_service, services_granted, services_used, checked_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, role_id) DO UPDATE SET
+            last_used_at = excluded.last_used_at,
+            last_used_service = excluded.last_used_service,
+            services_granted = excluded.services_granted,
+            services_used = excluded.services_used,
+            checked_at = excluded.checked_at
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def iter_usage_staleness(
+    conn, unused_since: str, shard: ShardSpec | None = None
+) -> Iterator[Tuple[str, str, int, int]]:
+    """
+    (user_id, role_id, stale now, stale as stored) for every checked
+    entitlement: stale means a HIGH-risk role that grants services the
+    user has not used since unused_since (or never used). Entitlements
+    Access Advisor maps no service to are never stale. shard slices by
+    role_id.
+    """
+    clauses, params = _shard_clauses(shard, "eu.role_id")
+    rows = db.stream(
+        conn,
+        """
+        SELECT eu.user_id, eu.role_id,
+               CASE WHEN r.risk_level = 'HIGH' AND eu.services_granted > 0
+                     AND (eu.last_used_at IS NULL OR eu.last_used_at < ?)
+                    THEN 1 ELSE 0 END,
+               eu.stale
+        FROM entitlement_usage eu
+        JOIN roles r ON r.role_id = eu.role_id
+        """
+        + (f"WHERE {' AND '.join(clauses)}" if clauses else ""),
+        [unused_since, *params],
+    )
+    return _hash_filter(rows, shard, key=1)
+
+
+def set_usage_stale(conn, rows: Sequence[Tuple[int, str, str]]) -> int:
+    """rows: (stale, user_id, role_id)"""
+    if not rows:
+        return 0
+    db.executemany(
+        conn.cursor(),
+        "UPDATE entitlement_usage SET stale = ? WHERE user_id = ? AND role_id = ?",
+        rows,
+    )
+    return len(rows)
+
+
+def list_stale_entitlement_keys(conn) -> Set[Tuple[str, str]]:
+    cur = conn.cursor()
+    cur.execute("SELECT user_id, role_id FROM entitlement_usage WHERE stale = 1")
+    return {(row[0], row[1]) for row in cur.fetchall()}
+
+
+# Outbox: change events are written by triggers (sql/migrations/0004_outbox.*)
+class OutboxEvent(NamedTuple):
+    seq: int
+    event_type: str
+    entity_id: str
+    payload: str | None
+    created_at: Any
+
+
+def claim_outbox_batch(conn, limit: int) -> List[OutboxEvent]:
+    """
+    Oldest unrelayed events in seq order. On Postgres the rows stay locked
+    (SKIP LOCKED) until the caller commits, so concurrent relays take
+    disjoint batches.
+    """
+    lock = "" if db.is_sqlite else " FOR UPDATE SKIP LOCKED"
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        f"""
+        SELECT seq, event_type, entity_id, payload, created_at
+        FROM outbox_events
+        WHERE relayed_at IS NULL
+        ORDER BY seq
+        LIMIT ?{lock}
+        """,
+        (limit,),
+    )
+    return [OutboxEvent._make(row) for row in cur.fetchall()]
+
+
+def ack_outbox(conn, seqs: Sequence[int], relayed_at: str) -> int:
+    if not seqs:
+        return 0
+    placeholders = ", ".join("?" for _ in seqs)
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        f"UPDATE outbox_events SET relayed_at = ? WHERE seq IN ({placeholders}) AND relayed_at IS NULL",
+        (relayed_at, *seqs),
+    )
+    return cur.rowcount
+
+
+def purge_relayed_outbox(conn, relayed_before: str) -> int:
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        "DELETE FROM outbox_events WHERE relayed_at IS NOT NULL AND relayed_at < ?",
+        (relayed_before,),
+    )
+    return cur.rowcount
+
+
+def outbox_backlog(conn) -> Tuple[int, int | None]:
+    """(unrelayed events, oldest unrelayed seq)."""
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*), MIN(seq) FROM outbox_events WHERE relayed_at IS NULL")
+    count, oldest = cur.fetchone()
+    return count, oldest
+
+
+# Reviewer UI paging
+class ReviewPage(NamedTuple):
+    rows: List[Tuple[Any, ...]]
+    next_cursor: str | None
+    estimated_total: int | None
+
+
+_REVIEW_FILTERS = {
+    "campaign_id": "r.campaign_id = ?",
+    "status": "r.status = ?",
+    "risk_level": "rol.risk_level = ?",
+    "reviewer": "r.reviewer = ?",
+}
+_REVIEW_PAGE_MAX = 1000
+# SQLite has no planner estimate; count at most this many matching rows
+_COUNT_ESTIMATE_CAP = 10000
+
+
+def _filters_tag(filters: dict) -> str:
+    return format(zlib.crc32(json.dumps(filters, sort_keys=True).encode("utf-8")), "08x")
+
+
+def _encode_review_cursor(created_at: Any, review_id: str, filters: dict) -> str:
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps([_filters_tag(filters), created_at, review_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_review_cursor(cursor: str, filters: dict) -> Tuple[str, str]:
+    try:
+        tag, created_at, review_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid review cursor") from exc
+    if tag != _filters_tag(filters):
+        raise ValueError("Review cursor was issued for different filters")
+    return created_at, review_id
+
+
+def _estimate_count(conn, from_where: str, params: Sequence[Any]) -> int:
+    """
+    Postgres: planner row estimate (no scan). SQLite: exact count capped
+    at _COUNT_ESTIMATE_CAP.
+    """
+    cur = conn.cursor()
+    if db.is_sqlite:
+        db.execute(
+            cur,
+            f"SELECT COUNT(*) FROM (SELECT 1 {from_where} LIMIT ?)",
+            (*params, _COUNT_ESTIMATE_CAP),
+        )
+        return cur.fetchone()[0]
+    db.execute(cur, f"EXPLAIN (FORMAT JSON) SELECT 1 {from_where}", params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def query_reviews(
+    conn,
+    campaign_id: str | None = None,
+    status: str | None = None,
+    risk_level: str | None = None,
+    reviewer: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> ReviewPage:
+    """
+    One page of reviews ordered by (created_at, review_id), filtered by any
+    of campaign, status, role risk level and reviewer.
+
+    Pages are keyset-based: pass the previous page's next_cursor (None when
+    there are no more rows) to continue, so every page is an index range scan
+    regardless of depth. Cursors are opaque and bound to the filters they
+    were issued for. estimated_total is only computed for the first page.
+
+    Rows: (review_id, campaign_id, user_id, user_name, role_id, role_name,
+    risk_level, status, priority, reviewer, created_at, reviewed_at)
+    """
+    if not 1 <= limit <= _REVIEW_PAGE_MAX:
+        raise ValueError(f"limit must be between 1 and {_REVIEW_PAGE_MAX}")
+    filters = {
+        key: value
+        for key, value in (
+            ("campaign_id", campaign_id),
+            ("status", status),
+            ("risk_level", risk_level),
+            ("reviewer", reviewer),
+        )
+        if value is not None
+    }
+    clauses = [_REVIEW_FILTERS[key] for key in filters]
+    params: List[Any] = list(filters.values())
+    from_clause = """
         FROM access_reviews r
+        JOIN users u ON r.user_id = u.user_id
         JOIN roles rol ON r.role_id = rol.role_id
-        WHERE rol.risk_level = 'HIGH'
-          AND (r.ai_risk_summary IS NULL OR r.ai_risk_summary = '')
+    """
+
+    estimated_total = None
+    if cursor is None:
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        estimated_total = _estimate_count(conn, f"{from_clause} {where}", params)
+    else:
+        clauses.append("(r.created_at, r.review_id) > (?, ?)")
+        params.extend(_decode_review_cursor(cursor, filters))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        f"""
+        SELECT r.review_id, r.campaign_id, r.user_id, u.user_name, r.role_id,
+               rol.role_name, rol.risk_level, r.status, r.priority, r.reviewer,
+               r.created_at, r.reviewed_at
+        {from_clause}
+        {where}
+        ORDER BY r.created_at, r.review_id
+        LIMIT ?
         """,
+        (*params, limit + 1),
     )
-    return cur.fetchall()
+    rows = cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_review_cursor(last[10], last[0], filters)
+    return ReviewPage(rows, next_cursor, estimated_total)
 
 
 def insert_audit_log(
     conn,
-    log_id: str,
+    log_id: str | None,
     timestamp: datetime,
     level: str,
     action: str,
@@ -228,7 +1435,9 @@ def insert_audit_log(
     entity_type: str | None = None,
     entity_id: str | None = None,
     details: dict | None = None,
-):
+) -> str:
+    """Insert one audit log row; a None log_id gets a time-ordered id. Returns the id."""
+    log_id = log_id or ids.new_id()
     db.execute(
         conn.cursor(),
         """
@@ -248,4 +1457,5 @@ def insert_audit_log(
             json.dumps(details, default=str) if details else None,
         ),
     )
+    return log_id
 
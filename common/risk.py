@@ -0,0 +1,44 @@
+import hashlib
+import json
+from typing import List
+
+from common import config
+
+# Ordered risk rules: the first rule with a case-insensitive substring of
+# the policy name wins; names matching no rule are LOW.
+DEFAULT_RISK_RULES = [
+    {"level": "HIGH", "match": ["administratoraccess", "fullaccess"]},
+    {"level": "MEDIUM", "match": ["poweruser", "write"]},
+    {"level": "LOW", "match": ["readonly"]},
+]
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+
+def load_rules(path: str | None = None) -> List[dict]:
+    """
+    Load risk rules from a JSON file (list of {"level", "match"} objects);
+    falls back to DEFAULT_RISK_RULES when no path is configured.
+    """
+    path = path or config.RISK_RULES_PATH
+    if not path:
+        return DEFAULT_RISK_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    for rule in rules:
+        if rule.get("level") not in RISK_LEVELS or not rule.get("match"):
+            raise ValueError(f"Invalid risk rule (needs level in {RISK_LEVELS} and match): {rule}")
+    return rules
+
+
+def ruleset_hash(rules: List[dict]) -> str:
+    """Stable id of a ruleset; roles record the one they were classified under."""
+    canonical = json.dumps(rules, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def classify(role_name: str, rules: List[dict]) -> str:
+    name = role_name.lower()
+    for rule in rules:
+        if any(pattern.lower() in name for pattern in rule["match"]):
+            return rule["level"]
+    return "LOW"
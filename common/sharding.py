@@ -0,0 +1,45 @@
+import zlib
+from typing import NamedTuple
+
+
+class ShardSpec(NamedTuple):
+    """
+    Slice of a handler's work, taken from event["shard"]:
+    - hash partition: {"index": i, "count": n}, where crc32(key) % n == i
+    - key range: {"start": "a", "end": "m"}, start inclusive, end exclusive,
+      either bound optional
+    """
+
+    index: int | None = None
+    count: int | None = None
+    start: str | None = None
+    end: str | None = None
+
+    def contains(self, key: str) -> bool:
+        if self.count:
+            return zlib.crc32(key.encode("utf-8")) % self.count == self.index
+        if self.start is not None and key < self.start:
+            return False
+        if self.end is not None and key >= self.end:
+            return False
+        return True
+
+    def describe(self) -> dict:
+        if self.count:
+            return {"index": self.index, "count": self.count}
+        return {"start": self.start, "end": self.end}
+
+
+def parse_shard(event: dict | None) -> ShardSpec | None:
+    """Return the ShardSpec in event["shard"], or None to process everything."""
+    spec = (event or {}).get("shard")
+    if not spec:
+        return None
+    if "count" in spec:
+        index, count = int(spec.get("index", 0)), int(spec["count"])
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid hash shard {spec}: need 0 <= index < count")
+        return ShardSpec(index=index, count=count)
+    if "start" in spec or "end" in spec:
+        return ShardSpec(start=spec.get("start"), end=spec.get("end"))
+    raise ValueError(f"Invalid shard spec {spec}: expected index/count or start/end")
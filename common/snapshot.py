@@ -0,0 +1,34 @@
+from typing import Dict, List, Tuple
+
+from common import repo
+
+
+class EntitlementSnapshot:
+    """
+    In-memory copy of roles and user->role links, shared between pipeline
+    stages running in one process so each stage does not re-query them.
+    Stages that change role risk update the snapshot alongside the DB.
+    """
+
+    def __init__(self, roles: Dict[str, List[str]], links: List[Tuple[str, str]]):
+        # role_id -> [role_name, risk_level]
+        self.roles = roles
+        self.links = links
+
+    @classmethod
+    def load(cls, conn) -> "EntitlementSnapshot":
+        roles = {role_id: [role_name, risk] for role_id, role_name, risk in repo.iter_roles(conn)}
+        links = [(user_id, role_id) for user_id, role_id, _ in repo.iter_entitlements(conn)]
+        return cls(roles, links)
+
+    def list_roles(self) -> List[Tuple[str, str, str]]:
+        """Same shape as repo.list_roles."""
+        return [(role_id, name, risk) for role_id, (name, risk) in self.roles.items()]
+
+    def list_entitlements(self) -> List[Tuple[str, str, str]]:
+        """Same shape as repo.list_entitlements."""
+        return [(user_id, role_id, self.roles[role_id][1]) for user_id, role_id in self.links]
+
+    def update_role_risk(self, role_id: str, new_risk: str):
+        if role_id in self.roles:
+            self.roles[role_id][1] = new_risk
@@ -0,0 +1,115 @@
+import json
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from common import config
+from common.graph import EntitlementGraph, _bits_to_indices
+
+# Each rule lists conflicting entitlement sets; a set is a list of
+# case-insensitive substrings matched against policy name/ARN (same heuristic
+# style as the risk rules). A user violates the rule when they hold policies
+# from at least `min_sets` distinct sets (default: all of them).
+# Write access is named explicitly: a bare "billing" would also match
+# AWSBillingReadOnlyAccess.
+_BILLING_WRITE = ["job-function/billing", "awsbillingconductorfullaccess", "awsaccountmanagementfullaccess"]
+
+DEFAULT_SOD_RULES = [
+    {
+        "rule_id": "SOD-BILLING-IAM",
+        "description": "Billing write access combined with IAM write access",
+        "sets": [_BILLING_WRITE, ["iamfullaccess", "iamwrite"]],
+    },
+    {
+        "rule_id": "SOD-ADMIN-AUDIT",
+        "description": "Administrator access combined with audit/log administration",
+        "sets": [["administratoraccess"], ["cloudtrailfullaccess", "securityaudit"]],
+    },
+    {
+        "rule_id": "SOD-PRIVILEGED-GROUP",
+        "description": "Any two broad write policies from the privileged group",
+        "sets": [["iamfullaccess"], ["poweruser"], ["organizationsfullaccess"], _BILLING_WRITE],
+        "min_sets": 2,
+    },
+]
+
+
+def load_rules(path: str | None = None) -> List[dict]:
+    """
+    Load SoD rules from a JSON file (list of rule objects); falls back to
+    DEFAULT_SOD_RULES when no path is configured.
+    """
+    path = path or config.SOD_RULES_PATH
+    if not path:
+        return DEFAULT_SOD_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    for rule in rules:
+        if not rule.get("rule_id") or len(rule.get("sets") or []) < 2:
+            raise ValueError(f"Invalid SoD rule (needs rule_id and >= 2 sets): {rule}")
+        min_sets = int(rule.get("min_sets", len(rule["sets"])))
+        if not 2 <= min_sets <= len(rule["sets"]):
+            raise ValueError(f"Invalid SoD rule (min_sets must be between 2 and {len(rule['sets'])}): {rule}")
+    return rules
+
+
+def _at_least(bitsets: Sequence[int], k: int) -> int:
+    """
+    Bitset of positions set in at least k of the given bitsets.
+    Saturating counters: level[j] holds positions seen in >= j+1 bitsets.
+    """
+    level = [0] * k
+    for bits in bitsets:
+        for j in range(k - 1, 0, -1):
+            level[j] |= level[j - 1] & bits
+        level[0] |= bits
+    return level[k - 1]
+
+
+def evaluate(
+    graph: EntitlementGraph,
+    rules: Iterable[dict],
+    role_names: Dict[str, str] | None = None,
+) -> List[Tuple[str, str, str]]:
+    """
+    Evaluate all rules against the graph. Returns (rule_id, user_id, role_id)
+    for every conflicting entitlement a violating user holds.
+
+    Per rule the cost is a few big-int ORs/ANDs over role->users bitsets,
+    independent of the user count; only violators are expanded to ids.
+    """
+    role_names = role_names or {}
+    haystacks = [
+        f"{role_id} {role_names.get(role_id, '')}".lower() for role_id in graph.role_ids
+    ]
+    pattern_roles: Dict[str, List[int]] = {}
+
+    def roles_matching(pattern: str) -> List[int]:
+        if pattern not in pattern_roles:
+            needle = pattern.lower()
+            pattern_roles[pattern] = [r for r, text in enumerate(haystacks) if needle in text]
+        return pattern_roles[pattern]
+
+    violations = []
+    for rule in rules:
+        set_roles = []
+        set_bits = []
+        for patterns in rule["sets"]:
+            roles = sorted({r for p in patterns for r in roles_matching(p)})
+            bits = 0
+            for r in roles:
+                bits |= graph.role_bits(r)
+            set_roles.append(roles)
+            set_bits.append(bits)
+
+        min_sets = int(rule.get("min_sets", len(set_bits)))
+        violators = _at_least(set_bits, min_sets)
+        if not violators:
+            continue
+
+        involved = set(r for roles in set_roles for r in roles)
+        for u in _bits_to_indices(violators):
+            start, end = graph.user_offsets[u], graph.user_offsets[u + 1]
+            user_id = graph.user_ids[u]
+            for r in graph.user_roles[start:end]:
+                if r in involved:
+                    violations.append((rule["rule_id"], user_id, graph.role_ids[r]))
+    return violations
@@ -0,0 +1,173 @@
+#lambdas/access_advisor/handler.py
+from datetime import datetime, timedelta, timezone
+import itertools
+import sys
+from pathlib import Path
+
+import boto3
+from botocore.config import Config
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import access_advisor, aws_accounts, config, logger, repo
+from common.db import db
+
+# Users whose usage rows are written per transaction
+_FLUSH_USERS = 50
+
+
+def _mock_client():
+    """Stub Access Advisor data for the mock identities in identity discovery."""
+    now = datetime.now(timezone.utc)
+
+    def managed(name):
+        return {"PolicyName": name, "PolicyType": "MANAGED", "PolicyArn": f"arn:aws:iam::aws:policy/{name}"}
+
+    read_only, power_user, admin = managed("ReadOnlyAccess"), managed("PowerUserAccess"), managed("AdministratorAccess")
+    return access_advisor.StubAccessAdvisorClient({
+        "arn:aws:iam::123456789012:user/alice": {
+            "s3": (now - timedelta(days=2), [read_only, power_user]),
+            "ec2": (None, [power_user]),
+            "lambda": (None, [power_user]),
+        },
+        "arn:aws:iam::123456789012:user/bob": {
+            "iam": (now - timedelta(days=200), [admin]),
+            "s3": (now - timedelta(days=150), [admin]),
+        },
+    })
+
+
+def _client(session=None):
+    if config.MOCK_IAM:
+        return _mock_client()
+    return (session or boto3).client(
+        "iam",
+        config=Config(retries={"mode": "adaptive", "max_attempts": config.DISCOVERY_MAX_ATTEMPTS}),
+    )
+
+
+def _out_of_time(context) -> bool:
+    remaining = getattr(context, "get_remaining_time_in_millis", None)
+    return bool(remaining) and remaining() < config.ACCESS_ADVISOR_MIN_REMAINING_MS
+
+
+def _run_all_accounts(client, principals, role_arns: dict, max_jobs: int | None, context=None):
+    """
+    Yield (client, JobResult) for every principal submitted, from one
+    run_jobs window shared by all accounts (max_jobs in flight overall).
+    Users of an account in role_arns (account_id -> role ARN) are checked
+    through that account's assumed role, with the session cache identity
+    discovery uses; everyone else through client. Accounts take turns in
+    the queue so one account's slow jobs do not hold back the others, and
+    no job is submitted once the Lambda is out of time.
+    """
+    groups = {}
+    for principal in principals:
+        account_id = aws_accounts.arn_account(principal[1])
+        groups.setdefault(account_id if account_id in role_arns else None, []).append(principal)
+    clients = {}
+    for account_id, group in list(groups.items()):
+        if account_id is None:
+            clients[account_id] = client
+            continue
+        try:
+            clients[account_id] = _client(aws_accounts.account_session(role_arns[account_id]))
+        except Exception as e:
+            for user_id, arn in groups.pop(account_id):
+                yield None, access_advisor.JobResult(user_id, arn, "FAILED", {}, f"assume_role: {e}")
+
+    jobs = [[(*principal, clients[account_id]) for principal in group] for account_id, group in groups.items()]
+    queue = (job for job in itertools.chain.from_iterable(itertools.zip_longest(*jobs)) if job)
+    job_clients = {job[0]: job[2] for group in jobs for job in group}
+    results = access_advisor.run_jobs(
+        client, queue, max_in_flight=max_jobs, should_stop=lambda: _out_of_time(context)
+    )
+    for result in results:
+        yield job_clients[result.user_id], result
+
+
+def enrich_access_usage(event, context, client=None):
+    """
+    Record when each entitlement was last used. Users not checked within
+    ACCESS_ADVISOR_REFRESH_HOURS (event["force"] checks everyone) get an
+    Access Advisor job; jobs run concurrently under one scheduler
+    (ACCESS_ADVISOR_MAX_JOBS in flight) and each finished user's services
+    are mapped to the policies granting them. Failed or timed-out users are
+    retried on the next run. Users discovered from DISCOVERY_ACCOUNTS are
+    checked in their own account, in the same job window. When the Lambda
+    nears its time limit no new jobs start, and users not reached are left
+    for the next run (status partial). Pass client to use a stub for everyone.
+    """
+    event = event or {}
+    if not config.ACCESS_ADVISOR_ENABLED and not event.get("force"):
+        logger.log("access_advisor", "skipped", "Access Advisor enrichment disabled")
+        return {"status": "SKIPPED"}
+
+    logger.log("access_advisor", "start", "Starting Access Advisor enrichment")
+    role_arns = {}
+    if client is None and not config.MOCK_IAM:
+        role_arns = dict(aws_accounts.resolve_target(target) for target in config.DISCOVERY_ACCOUNTS)
+    client = client or _client()
+    now = datetime.utcnow()
+    checked_at = now.isoformat()
+    refresh_hours = 0 if event.get("force") else int(event.get("refresh_hours", config.ACCESS_ADVISOR_REFRESH_HOURS))
+    checked_before = (now - timedelta(hours=refresh_hours)).isoformat()
+
+    counts = {"COMPLETED": 0, "FAILED": 0, "TIMED_OUT": 0}
+    entitlements = 0
+    with db.get_connection() as conn:
+        principals = repo.list_users_needing_usage(conn, checked_before)
+        buffered, users_buffered = [], 0
+        results = _run_all_accounts(client, principals, role_arns, event.get("max_jobs"), context)
+        for job_client, result in results:
+            status, error = result.status, result.error
+            if status == "COMPLETED":
+                try:
+                    grants = access_advisor.policies_granting(job_client, result.arn, list(result.services))
+                except Exception as e:
+                    status, error = "FAILED", f"list_policies_granting_service_access: {e}"
+            counts[status] += 1
+            if status != "COMPLETED":
+                logger.log(
+                    "access_advisor",
+                    "job_failed",
+                    f"Access Advisor job {status.lower()}: {error}",
+                    level="WARN",
+                    entity_type="user",
+                    entity_id=result.user_id,
+                )
+                continue
+            role_ids = repo.list_user_role_ids(conn, result.user_id)
+            buffered.extend(
+                access_advisor.usage_rows(result.user_id, result.arn, role_ids, result.services, grants, checked_at)
+            )
+            users_buffered += 1
+            if users_buffered >= _FLUSH_USERS:
+                entitlements += repo.upsert_entitlement_usage(conn, buffered)
+                conn.commit()
+                buffered, users_buffered = [], 0
+        entitlements += repo.upsert_entitlement_usage(conn, buffered)
+        conn.commit()
+
+    summary = {
+        "users_checked": counts["COMPLETED"],
+        "users_failed": counts["FAILED"],
+        "users_timed_out": counts["TIMED_OUT"],
+        "entitlements_recorded": entitlements,
+        "users_remaining": len(principals) - sum(counts.values()),
+    }
+    status = "partial" if counts["FAILED"] or counts["TIMED_OUT"] or summary["users_remaining"] else "success"
+    logger.log(
+        "access_advisor",
+        status,
+        f"Access Advisor enrichment complete for {counts['COMPLETED']} users.",
+        details=summary,
+    )
+    return {"status": status, **summary}
+
+
+# --- LOCAL TESTING ---
+if __name__ == "__main__":
+    enrich_access_usage(None, None)
@@ -1,8 +1,10 @@
 #lambdas/ai_explanation/handler.py
 import os
 import json
+import re
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from google import genai
 
@@ -10,9 +12,10 @@ ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from common import repo
+from common import config, repo
 from common.db import db
 from common import logger
+from common.sharding import parse_shard
 
 GENAI_MODEL = "gemini-3-flash-preview"
 API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -30,6 +33,28 @@ SYSTEM_PROMPT = (
     "Return plain text only.\n"
 )
 
+BATCH_SYSTEM_PROMPT = (
+    "You are an Identity Governance and Compliance Analyst.\n\n"
+    "You are given several review items. Each has an id, a user's department and role, "
+    "and an IAM policy in JSON format.\n\n"
+    "For EACH item, explain in ONE concise sentence:\n"
+    "1. Why this access is risky (if it is)\n"
+    "2. What action is recommended\n\n"
+    "Do NOT make final decisions.\n"
+    "Do NOT invent facts.\n"
+    "Use clear, non-technical language.\n"
+    'Return only a JSON array with one object per item: [{"id": "<item id>", "summary": "<sentence>"}].\n'
+)
+
+FALLBACK_SUMMARY = (
+    "High-risk access detected based on policy and role mismatch. "
+    "Manual review recommended."
+)
+# Rough chars-per-token ratio for budgeting; the reply allowance is per item
+_CHARS_PER_TOKEN = 4
+_REPLY_TOKENS_PER_ITEM = 80
+_MAX_SUMMARY_CHARS = 600
+
 
 def generate_ai_summary(user_context: dict, policy_json: dict) -> str:
     if not client:
@@ -52,51 +77,132 @@ def generate_ai_summary(user_context: dict, policy_json: dict) -> str:
     raise ValueError("Empty GenAI response")
 
 
-def _existing_ai_summary(conn, review_id: str) -> str | None:
+def _estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _batch_item(item_id: str, user_context: dict, policy_json: dict) -> str:
+    return json.dumps({"id": item_id, "user_context": user_context, "iam_policy": policy_json}, separators=(",", ":"))
+
+
+def pack_batches(items: Iterable, max_items: int, token_budget: int) -> Iterator[list]:
+    """
+    Greedily group (review_id, user_context, policy_json) items so each
+    request holds at most max_items and its estimated prompt plus reply
+    tokens stay within token_budget. An item that alone exceeds the budget
+    still gets its own batch. Batches are yielded as soon as they close.
+    """
+    current = []
+    used = _estimate_tokens(BATCH_SYSTEM_PROMPT)
+    for item in items:
+        cost = _estimate_tokens(_batch_item(str(len(current) + 1), item[1], item[2])) + _REPLY_TOKENS_PER_ITEM
+        if current and (len(current) >= max_items or used + cost > token_budget):
+            yield current
+            current, used = [], _estimate_tokens(BATCH_SYSTEM_PROMPT)
+        current.append(item)
+        used += cost
+    if current:
+        yield current
+
+
+def _parse_batch_response(text: str, expected_ids: set) -> dict:
+    """
+    Map item id -> summary for every well-formed item; anything missing,
+    unknown, duplicated or empty is left out for the caller to fall back on.
+    """
+    cleaned = text.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", cleaned, re.DOTALL)
+    if fenced:
+        cleaned = fenced.group(1)
+    data = json.loads(cleaned)
+    if isinstance(data, dict):
+        data = data.get("items") or data.get("results") or []
+    summaries = {}
+    for entry in data if isinstance(data, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.get("id", "")).strip()
+        summary = entry.get("summary")
+        if item_id not in expected_ids or item_id in summaries or not isinstance(summary, str):
+            continue
+        summary = " ".join(summary.split())
+        if summary:
+            summaries[item_id] = summary[:_MAX_SUMMARY_CHARS]
+    return summaries
+
+
+def generate_ai_summaries(batch: list) -> tuple[dict, list]:
+    """
+    One GenAI request for a batch of (review_id, user_context, policy_json).
+    Returns ({review_id: summary} for items the model answered validly,
+    [review_ids that need the fallback]).
+    """
+    if not client:
+        raise RuntimeError("GenAI client not initialized")
+
+    ids = {str(i): item[0] for i, item in enumerate(batch, start=1)}
+    lines = [_batch_item(item_id, item[1], item[2]) for item_id, item in zip(ids, batch)]
+    response = client.models.generate_content(
+        model=GENAI_MODEL,
+        contents=f"{BATCH_SYSTEM_PROMPT}\nItems (one JSON object per line):\n" + "\n".join(lines),
+        config={"temperature": 0.0, "response_mime_type": "application/json"},
+    )
+    if not (hasattr(response, "text") and response.text):
+        raise ValueError("Empty GenAI response")
+
+    parsed = _parse_batch_response(response.text, set(ids))
+    summaries = {ids[item_id]: summary for item_id, summary in parsed.items()}
+    missing = [review_id for item_id, review_id in ids.items() if item_id not in parsed]
+    return summaries, missing
+
+
+def _existing_ai_summary(conn, review_id: str) -> tuple[str | None, str] | None:
+    """(ai_risk_summary, campaign_id) of the review, or None if it does not exist."""
     cur = conn.cursor()
     db.execute(
         cur,
         """
-        SELECT ai_risk_summary
+        SELECT ai_risk_summary, campaign_id
         FROM access_reviews
         WHERE review_id = ?
         """,
         (review_id,),
     )
-    row = cur.fetchone()
-    return row[0] if row else None
+    return cur.fetchone()
 
 
-def _build_context_from_db(conn, review_id: str) -> tuple[dict, dict, str] | None:
-    row = repo.fetch_review_context(conn, review_id)
-    if not row:
-        return None
-    _, user_id, role_id, user_name, role_name, risk_level = row
+def _context_from_row(row: repo.ReviewContext) -> tuple[dict, dict, str]:
     user_context = {
-        "user_id": user_id,
-        "user_name": user_name,
+        "user_id": row.user_id,
+        "user_name": row.user_name,
         "department": "Unknown",
-        "role": role_name,
+        "role": row.role_name,
     }
-    policy_json = {"policy_arn": role_id, "policy_name": role_name}
-    return user_context, policy_json, risk_level
+    policy_json = {"policy_arn": row.role_id, "policy_name": row.role_name}
+    return user_context, policy_json, row.risk_level
+
+
+def _build_context_from_db(conn, review_id: str) -> tuple[dict, dict, str] | None:
+    row = repo.fetch_review_context(conn, review_id)
+    return _context_from_row(row) if row else None
 
 
-def _persist_summary(conn, review_id: str, summary: str):
+def _persist_summary(conn, review_id: str, campaign_id: str | None, summary: str):
+    # campaign_id narrows the Postgres update to the campaign's partition
     db.execute(
         conn.cursor(),
         """
         UPDATE access_reviews
         SET ai_risk_summary = ?
-        WHERE review_id = ?
+        WHERE review_id = ? AND campaign_id = ?
         """,
-        (summary, review_id),
+        (summary, review_id, campaign_id),
     )
 
 
 def _process_single_review(conn, review_id: str, user_context: dict | None, policy_json: dict | None):
     existing = _existing_ai_summary(conn, review_id)
-    if existing:
+    if existing and existing[0]:
         logger.log("ai_explanation", "skip", "Already present", entity_id=review_id)
         return {"status": "SKIPPED", "review_id": review_id, "reason": "already_present"}
 
@@ -116,12 +222,9 @@ def _process_single_review(conn, review_id: str, user_context: dict | None, poli
         summary = generate_ai_summary(user_context, policy_json)
     except Exception as e:
         logger.log("ai_explanation", "warn", f"AI explanation failed: {e}", level="WARN", entity_id=review_id)
-        summary = (
-            "High-risk access detected based on policy and role mismatch. "
-            "Manual review recommended."
-        )
+        summary = FALLBACK_SUMMARY
 
-    _persist_summary(conn, review_id, summary)
+    _persist_summary(conn, review_id, existing[1] if existing else None, summary)
     logger.log("ai_explanation", "success", "AI explanation stored", entity_id=review_id)
     return {"status": "SUCCESS", "review_id": review_id}
 
@@ -131,6 +234,7 @@ def handler(event, context):
     review_id = event.get("review_id")
     user_context = event.get("user_context")
     policy_json = event.get("policy_json")
+    shard = parse_shard(event)
 
     if not client:
         logger.log("ai_explanation", "skip", "GOOGLE_API_KEY not set; AI disabled")
@@ -142,11 +246,58 @@ def handler(event, context):
             return _process_single_review(conn, review_id, user_context, policy_json)
 
         logger.log("ai_explanation", "start", "Batch AI explanation for HIGH risk")
-        results = []
-        for row in repo.list_high_risk_reviews_missing_ai(conn):
-            r_id = row[0]
-            results.append(_process_single_review(conn, r_id, None, None))
-        return {"status": "SUCCESS", "processed": results}
+        # Streamed rows already carry the review context; no per-review lookup
+        rows = repo.iter_high_risk_reviews_missing_ai(conn, shard=shard)
+        batch_size = int(event.get("batch_size") or config.AI_BATCH_SIZE)
+        if batch_size <= 1:
+            results = []
+            for row in rows:
+                user_context, policy_json, _ = _context_from_row(row)
+                results.append(_process_single_review(conn, row.review_id, user_context, policy_json))
+            return {"status": "SUCCESS", "processed": results, "calls": len(results)}
+        return _process_batched(conn, rows, batch_size)
+
+
+def _process_batched(conn, rows: Iterable[repo.ReviewContext], batch_size: int) -> dict:
+    """K reviews per request; items the model misses get FALLBACK_SUMMARY."""
+    results = []
+    campaigns = {}
+
+    def items():
+        for row in rows:
+            campaigns[row.review_id] = row.campaign_id
+            yield (row.review_id, *_context_from_row(row)[:2])
+
+    calls = fallbacks = 0
+    for batch in pack_batches(items(), batch_size, config.AI_BATCH_TOKEN_BUDGET):
+        calls += 1
+        try:
+            summaries, missing = generate_ai_summaries(batch)
+        except Exception as e:
+            logger.log(
+                "ai_explanation",
+                "warn",
+                f"AI batch explanation failed: {e}",
+                level="WARN",
+                details={"batch_size": len(batch)},
+            )
+            summaries, missing = {}, [item[0] for item in batch]
+        for review_id in missing:
+            summaries[review_id] = FALLBACK_SUMMARY
+        fallbacks += len(missing)
+        for review_id, _, _ in batch:
+            _persist_summary(conn, review_id, campaigns.pop(review_id), summaries[review_id])
+            status = "FALLBACK" if review_id in missing else "SUCCESS"
+            results.append({"status": status, "review_id": review_id})
+        conn.commit()
+
+    logger.log(
+        "ai_explanation",
+        "success",
+        "Batch AI explanations stored",
+        details={"reviews": len(results), "calls": calls, "fallbacks": fallbacks, "batch_size": batch_size},
+    )
+    return {"status": "SUCCESS", "processed": results, "calls": calls, "fallbacks": fallbacks}
 
 
 if __name__ == "__main__":
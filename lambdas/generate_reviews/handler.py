@@ -1,6 +1,5 @@
 #lambdas/generate_reviews/handler.py
-import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import sys
 from pathlib import Path
@@ -9,43 +8,100 @@ ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from common import config, logger, repo
+from common import config, ids, logger, repo
 from common.db import db
+from common.sharding import parse_shard
 
 def generate_campaign(event, context):
     logger.log("generate_campaign", "start", "Starting Access Certification Campaign Generation")
 
+    event = event or {}
+    snapshot = getattr(context, "snapshot", None)
+    # Sharded runs slice by user_id and share one campaign via event["campaign_id"]
+    shard = parse_shard(event)
+
     with db.get_connection() as conn:
-        campaign_id = str(uuid.uuid4())
-        campaign_name = f"Access Campaign {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
-        created_count = 0
+        campaign_id = event.get("campaign_id") or ids.new_id()
+        campaign_name = event.get("campaign_name") or (
+            f"Access Campaign {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
+        )
 
-        repo.create_campaign(conn, campaign_id, campaign_name, datetime.utcnow().isoformat())
+        repo.ensure_campaign(conn, campaign_id, campaign_name, datetime.utcnow().isoformat())
+        conn.commit()
 
-        entitlements = repo.list_entitlements(conn)
+        if snapshot:
+            entitlements = snapshot.list_entitlements()
+            if shard:
+                entitlements = (e for e in entitlements if shard.contains(e[0]))
+        else:
+            # The shard's user_id range is applied in SQL
+            entitlements = repo.iter_entitlements(conn, shard=shard)
+        pending = repo.list_pending_review_keys(conn)
+        # Entitlements in a separation-of-duties conflict are reviewed first
+        sod_conflicts = repo.list_sod_violation_keys(conn)
+        # ...as is HIGH-risk access left unused (flagged stale by evaluate_risk)
+        stale = repo.list_stale_entitlement_keys(conn)
+        # LOW-risk grants a reviewer approved (while LOW) within the window are
+        # certified by reference to that approval instead of re-reviewed
+        carry_days = int(event.get("carry_forward_days", config.CARRY_FORWARD_DAYS))
+        approvals = {}
+        if carry_days > 0:
+            approved_since = (datetime.utcnow() - timedelta(days=carry_days)).isoformat()
+            approvals = repo.latest_low_risk_approvals(conn, approved_since)
 
+        # Reviews are written in batches while entitlements stream in
+        reviews = []
+        carried = []
+        created_count = 0
+        elevated_count = 0
+        carried_count = 0
         for user_id, role_id, risk_level in entitlements:
             # Deduplicate: skip if a pending review already exists
-            if repo.pending_review_exists(conn, user_id, role_id):
+            if (user_id, role_id) in pending:
                 continue
 
-            review_id = str(uuid.uuid4())
+            review_id = ids.new_id()
             created_at = datetime.utcnow().isoformat()
 
-            repo.create_review(conn, review_id, campaign_id, user_id, role_id, created_at)
+            priority = "ELEVATED" if (user_id, role_id) in sod_conflicts or (user_id, role_id) in stale else "NORMAL"
+
+            prior_review_id = approvals.get((user_id, role_id)) if risk_level == "LOW" and priority == "NORMAL" else None
+            if prior_review_id:
+                carried.append((campaign_id, user_id, role_id, prior_review_id, created_at))
+                if len(carried) >= config.STREAM_BATCH_SIZE:
+                    carried_count += repo.bulk_insert_carry_forwards(conn, carried)
+                    carried = []
+                continue
+
+            reviews.append((review_id, campaign_id, user_id, role_id, created_at, priority, risk_level))
+            if priority == "ELEVATED":
+                elevated_count += 1
+            if len(reviews) >= config.STREAM_BATCH_SIZE:
+                created_count += repo.bulk_create_reviews(conn, reviews)
+                reviews = []
 
-            created_count += 1
+        created_count += repo.bulk_create_reviews(conn, reviews)
+        carried_count += repo.bulk_insert_carry_forwards(conn, carried)
 
         logger.log(
             "generate_campaign",
             "success",
             f"Campaign created with {created_count} review tasks.",
-            details={"campaign_id": campaign_id, "reviews_created": created_count},
+            details={
+                "campaign_id": campaign_id,
+                "reviews_created": created_count,
+                "reviews_elevated": elevated_count,
+                "reviews_carried_forward": carried_count,
+                "carry_forward_days": carry_days,
+                "shard": shard.describe() if shard else None,
+            },
         )
         return {
             "status": "success",
             "campaign_id": campaign_id,
-            "reviews_created": created_count
+            "reviews_created": created_count,
+            "reviews_elevated": elevated_count,
+            "reviews_carried_forward": carried_count,
         }
 
 # --- LOCAL TESTING ---
@@ -1,6 +1,10 @@
 #lambdas/identity_discovery/handler.py
 import boto3
+from botocore.config import Config
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from multiprocessing import Manager
+import queue
 import sys
 from pathlib import Path
 
@@ -8,7 +12,7 @@ ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from common import config, logger
+from common import aws_accounts, config, iam_cache, logger
 from common.db import db
 from common import repo
 
@@ -38,58 +42,392 @@ def _mock_identities():
         }
     ]
 
-def _iter_identities():
-    if MOCK_IAM:
-        for entry in _mock_identities():
-            yield entry
-    else:
+def _paginate(iam_client, operation: str, key: str, **params) -> list:
+    items = []
+    for page in iam_client.get_paginator(operation).paginate(**params):
+        items.extend(page[key])
+    return items
+
+
+def _group_policies(iam_client, group: dict, cache: dict) -> list:
+    """
+    Attached + inline policies of a group, fetched once per run and reused
+    for every member. Inline policies get a synthetic id under the group ARN.
+    """
+    name = group['GroupName']
+    if name not in cache:
+        policies = [
+            {**p, "Source": "GROUP", "SourceRef": name}
+            for p in _paginate(iam_client, 'list_attached_group_policies', 'AttachedPolicies', GroupName=name)
+        ]
+        policies.extend(
+            {
+                "PolicyArn": f"{group['Arn']}#inline/{policy_name}",
+                "PolicyName": policy_name,
+                "Source": "GROUP",
+                "SourceRef": name,
+            }
+            for policy_name in _paginate(iam_client, 'list_group_policies', 'PolicyNames', GroupName=name)
+        )
+        cache[name] = policies
+    return cache[name]
+
+
+def _effective_policies(iam_client, user: dict, group_cache: dict) -> list:
+    """Direct attachments, user inline policies and group-granted policies, tagged with provenance."""
+    policies = [
+        {**p, "Source": "DIRECT", "SourceRef": ""}
+        for p in iam_client.list_attached_user_policies(UserName=user['UserName'])['AttachedPolicies']
+    ]
+    if not config.DISCOVERY_EXPAND_GROUPS:
+        return policies
+    policies.extend(
+        {
+            "PolicyArn": f"{user['Arn']}#inline/{policy_name}",
+            "PolicyName": policy_name,
+            "Source": "INLINE",
+            "SourceRef": "",
+        }
+        for policy_name in _paginate(iam_client, 'list_user_policies', 'PolicyNames', UserName=user['UserName'])
+    )
+    for group in _paginate(iam_client, 'list_groups_for_user', 'Groups', UserName=user['UserName']):
+        policies.extend(_group_policies(iam_client, group, group_cache))
+    return policies
+
+
+def _iter_pages(marker: str | None = None, iam_client=None, scope: str = "default"):
+    """
+    Yield (identities, next_marker) per IAM list_users page, starting at marker.
+    next_marker is None on the last page. Mock mode is a single page.
+    With IAM_CACHE_MODE set, IAM calls go through the response cache
+    (common/iam_cache.py) under scope; replay mode needs no client.
+    """
+    if MOCK_IAM and iam_client is None:
+        yield _mock_identities(), None
+        return
+
+    if iam_client is None and config.IAM_CACHE_MODE != "replay":
         iam_client = boto3.client('iam')
-        paginator = iam_client.get_paginator('list_users')
-        for page in paginator.paginate():
-            for user in page['Users']:
-                policies = iam_client.list_attached_user_policies(UserName=user['UserName'])['AttachedPolicies']
-                yield {**user, "Policies": policies}
+    iam_client = iam_cache.wrap(iam_client, scope)
+    group_cache = {}
+    while True:
+        params = {"MaxItems": config.DISCOVERY_PAGE_SIZE}
+        if marker:
+            params["Marker"] = marker
+        page = iam_client.list_users(**params)
+        identities = []
+        for user in page['Users']:
+            policies = _effective_policies(iam_client, user, group_cache)
+            identities.append({**user, "Policies": policies})
+        marker = page.get('Marker') if page.get('IsTruncated') else None
+        yield identities, marker
+        if not marker:
+            return
 
-def discover_identities(event, context):
-    logger.log("discover_identities", "start", "Starting Identity Discovery")
-    user_count = 0
+def _collect(identities: list, users: list, roles: dict, links: list, account_id: str | None = None) -> int:
+    """Buffer rows for one page of identities; returns how many users were accepted."""
+    count = 0
+    for user in identities:
+        try:
+            u_id = user['UserId']
+            u_name = user['UserName']
+            u_arn = user['Arn']
+            created_at = user['CreateDate'].isoformat()
+
+            user_links = []
+            for poly in user.get("Policies", []):
+                p_arn = poly['PolicyArn']
+                p_name = poly['PolicyName']
+
+                roles.setdefault(p_arn, (p_name, aws_accounts.arn_account(p_arn)))
+                # Provenance: DIRECT, INLINE or GROUP (SourceRef = group name)
+                user_links.append((u_id, p_arn, poly.get('Source', 'DIRECT'), poly.get('SourceRef', '')))
+
+            users.append((u_id, u_name, u_arn, created_at, account_id or aws_accounts.arn_account(u_arn)))
+            links.extend(user_links)
+            count += 1
+
+        except Exception as e:
+            logger.log(
+                "discover_identities",
+                "error",
+                f"Error processing user {user.get('UserName','UNKNOWN')}: {e}",
+                level="ERROR",
+                details={"user": user, "account_id": account_id},
+            )
+            continue
+    return count
+
+def _flush(conn, users: list, roles: dict, links: list):
+    """
+    Write buffered discovery rows; large buffers go through the bulk loader.
+    links carry provenance: user_roles gets the effective (user, role) set and
+    user_role_sources records every path that grants it.
+    """
+    repo.bulk_insert_users(conn, users)
+    repo.bulk_insert_roles(conn, [(arn, name, "LOW", acct) for arn, (name, acct) in roles.items()])
+    repo.bulk_link_user_roles(conn, list(dict.fromkeys((u_id, p_arn) for u_id, p_arn, _, _ in links)))
+    repo.bulk_insert_user_role_sources(conn, links)
+    users.clear()
+    roles.clear()
+    links.clear()
+
+
+def _out_of_time(context) -> bool:
+    remaining = getattr(context, "get_remaining_time_in_millis", None)
+    return bool(remaining) and remaining() < config.DISCOVERY_MIN_REMAINING_MS
+
+
+def _load_checkpoint(conn, state_id: str) -> tuple[str | None, int, str]:
+    """(marker, users_processed, started_at) to continue from; fresh unless IN_PROGRESS."""
+    now = datetime.utcnow().isoformat()
+    state = repo.get_discovery_state(conn, state_id)
+    if state and state[2] == "IN_PROGRESS" and state[0]:
+        marker, user_count, _, started_at = state
+        logger.log(
+            "discover_identities",
+            "resume",
+            "Resuming discovery from checkpoint",
+            details={"state_id": state_id, "users_processed": user_count},
+        )
+    else:
+        marker, user_count, started_at = None, 0, now
+    repo.save_discovery_state(conn, state_id, marker, user_count, "IN_PROGRESS", started_at, now)
+    conn.commit()
+    return marker, user_count, started_at
+
+
+def _checkpoint(conn, state_id: str, next_marker: str | None, user_count: int, started_at: str):
+    """Chunk boundary: buffered page data and the checkpoint commit together."""
+    status = "IN_PROGRESS" if next_marker else "COMPLETE"
+    repo.save_discovery_state(
+        conn, state_id, next_marker, user_count, status, started_at, datetime.utcnow().isoformat()
+    )
+    conn.commit()
+
+
+# --- Multi-account (AWS Organizations) discovery ---
+def _account_pages(target: str, marker: str | None):
+    """Yield (account_id, identities, next_marker) for one account."""
+    account_id, role_arn = aws_accounts.resolve_target(target)
+    client = None
+    if config.IAM_CACHE_MODE != "replay":
+        # One client per account: adaptive retry keeps a separate throttling
+        # budget per account, so one throttled account does not slow the rest.
+        client = aws_accounts.account_session(role_arn).client(
+            "iam",
+            config=Config(retries={"mode": "adaptive", "max_attempts": config.DISCOVERY_MAX_ATTEMPTS}),
+        )
+    for identities, next_marker in _iter_pages(marker, client, scope=account_id):
+        yield account_id, identities, next_marker
+
+
+def _pump_account(target: str, marker: str | None, out_queue, stop=None):
+    """
+    Process-pool worker: stream one account's pages to the writer queue.
+    Once stop is set the worker returns without reporting; the writer has
+    already stopped reading and the account resumes from its checkpoint.
+    """
+    account_id = target
+    try:
+        account_id = aws_accounts.resolve_target(target)[0]
+        for item in _account_pages(target, marker):
+            if stop is not None and stop.is_set():
+                return
+            out_queue.put(("page", *item))
+        out_queue.put(("done", account_id, None, None))
+    except Exception as e:
+        out_queue.put(("error", account_id, str(e), None))
+
+
+def _discover_accounts(event: dict, targets: list[str], context=None) -> dict:
+    """
+    Discover many accounts concurrently. Workers only call IAM; every page is
+    streamed back to this process, which is the single (batched) DB writer
+    and checkpoints each account under state_id "account:<id>".
+
+    Like single-account discovery it stops early when the Lambda is close to
+    its time limit or event["max_pages"] pages (over all accounts) have been
+    written: no further accounts are started, running workers are told to
+    stop, and the unfinished targets are returned as accounts_remaining.
+    Passing them back as event["accounts"] resumes each from its checkpoint.
+    """
+    workers = int(event.get("workers", config.DISCOVERY_WORKERS))
+    max_pages = event.get("max_pages")
+    per_account = {}
+    failed = {}
+    finished = set()
+    pages = 0
+
+    def out_of_budget() -> bool:
+        return _out_of_time(context) or bool(max_pages and pages >= max_pages)
 
     with db.get_connection() as conn:
-        for user in _iter_identities():
-            try:
-                u_id = user['UserId']
-                u_name = user['UserName']
-                u_arn = user['Arn']
-                created_at = user['CreateDate'].isoformat()
+        progress = {}
+        for target in targets:
+            account_id = aws_accounts.resolve_target(target)[0]
+            state_id = f"account:{account_id}"
+            marker, count, started_at = _load_checkpoint(conn, state_id)
+            progress[account_id] = [state_id, marker, count, started_at]
 
-                repo.insert_user(conn, u_id, u_name, u_arn, created_at)
+        def write_page(account_id, identities, next_marker):
+            nonlocal pages
+            pages += 1
+            state = progress[account_id]
+            users, roles, links = [], {}, []
+            state[2] += _collect(identities, users, roles, links, account_id)
+            _flush(conn, users, roles, links)
+            _checkpoint(conn, state[0], next_marker, state[2], state[3])
+            per_account[account_id] = state[2]
 
-                for poly in user.get("Policies", []):
-                    p_arn = poly['PolicyArn']
-                    p_name = poly['PolicyName']
+        if workers <= 0:
+            # Inline mode (tests / moto): same flow without a process pool
+            for target in targets:
+                if out_of_budget():
+                    break
+                account_id = aws_accounts.resolve_target(target)[0]
+                try:
+                    for acct, identities, next_marker in _account_pages(target, progress[account_id][1]):
+                        write_page(acct, identities, next_marker)
+                        if next_marker and out_of_budget():
+                            break
+                    else:
+                        finished.add(account_id)
+                except Exception as e:
+                    failed[account_id] = str(e)
+        else:
+            with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+                out_queue = manager.Queue()
+                stop = manager.Event()
+                pending = list(targets)
+                futures = {}
+                running = 0
+                while pending or running:
+                    if out_of_budget():
+                        stop.set()
+                        break
+                    # Accounts are started as workers free up, so a stop
+                    # leaves the rest unstarted instead of queued in the pool
+                    while pending and running < workers:
+                        target = pending.pop(0)
+                        account_id = aws_accounts.resolve_target(target)[0]
+                        future = pool.submit(_pump_account, target, progress[account_id][1], out_queue, stop)
+                        futures[future] = account_id
+                        running += 1
+                    try:
+                        kind, account_id, payload, next_marker = out_queue.get(timeout=1)
+                    except queue.Empty:
+                        if all(f.done() for f in futures) and out_queue.empty():
+                            break
+                        continue
+                    if kind == "page":
+                        write_page(account_id, payload, next_marker)
+                    else:
+                        running -= 1
+                        if kind == "error":
+                            failed[account_id] = payload
+                        else:
+                            finished.add(account_id)
+                # A worker that died (e.g. a broken pool) never reports back;
+                # its account is failed, not silently dropped
+                for future, account_id in futures.items():
+                    if future.exception() is not None:
+                        failed.setdefault(account_id, str(future.exception()))
 
-                    repo.insert_role(conn, p_arn, p_name, "LOW")
-                    repo.link_user_role(conn, u_id, p_arn)
+    for account_id, error in failed.items():
+        logger.log(
+            "discover_identities",
+            "error",
+            f"Account discovery failed: {error}",
+            level="ERROR",
+            details={"account_id": account_id},
+        )
+    remaining = [
+        target for target in targets
+        if aws_accounts.resolve_target(target)[0] not in finished | set(failed)
+    ]
+    if remaining:
+        logger.log(
+            "discover_identities",
+            "checkpoint",
+            "Stopping early; pass accounts_remaining as event[\"accounts\"] to resume from checkpoints",
+            details={"accounts_remaining": len(remaining), "pages": pages},
+        )
+    total = sum(per_account.values())
+    status = "success" if not failed and not remaining else "partial"
+    logger.log(
+        "discover_identities",
+        status,
+        f"Multi-account discovery complete ({len(finished)}/{len(targets)} accounts)",
+        details={"users_processed": total, "accounts": per_account, "failed_accounts": sorted(failed)},
+    )
+    return {
+        "status": status,
+        "users_processed": total,
+        "accounts": per_account,
+        "failed_accounts": sorted(failed),
+        "accounts_remaining": remaining,
+        "resume": bool(failed or remaining),
+    }
+
+
+def discover_identities(event, context):
+    """
+    Discovery commits after every IAM page together with a checkpoint
+    (pagination marker + processed count) in discovery_state. If the Lambda
+    is close to its time limit (or event["max_pages"] is reached) it returns
+    status "partial"; the next invocation resumes from the checkpoint.
+
+    With event["accounts"] (or DISCOVERY_ACCOUNTS) set, accounts are
+    discovered concurrently via assumed roles instead of the local account.
+    """
+    event = event or {}
+    targets = event.get("accounts") or config.DISCOVERY_ACCOUNTS
+    if targets:
+        logger.log(
+            "discover_identities",
+            "start",
+            "Starting Multi-Account Identity Discovery",
+            details={"accounts": len(targets)},
+        )
+        return _discover_accounts(event, list(targets), context)
+
+    state_id = event.get("state_id", "default")
+    max_pages = event.get("max_pages")
+    logger.log("discover_identities", "start", "Starting Identity Discovery", details={"state_id": state_id})
+
+    users, roles, links = [], {}, []
+
+    with db.get_connection() as conn:
+        marker, user_count, started_at = _load_checkpoint(conn, state_id)
 
-                user_count += 1
+        pages = 0
+        for identities, next_marker in _iter_pages(marker):
+            user_count += _collect(identities, users, roles, links)
+            _flush(conn, users, roles, links)
+            _checkpoint(conn, state_id, next_marker, user_count, started_at)
+            pages += 1
 
-            except Exception as e:
+            if next_marker and (_out_of_time(context) or (max_pages and pages >= max_pages)):
                 logger.log(
                     "discover_identities",
-                    "error",
-                    f"Error processing user {user.get('UserName','UNKNOWN')}: {e}",
-                    level="ERROR",
-                    details={"user": user},
+                    "checkpoint",
+                    "Stopping early; next invocation resumes from checkpoint",
+                    details={"state_id": state_id, "users_processed": user_count, "pages": pages},
                 )
-                continue
-        conn.commit()
+                return {
+                    "status": "partial",
+                    "state_id": state_id,
+                    "users_processed": user_count,
+                    "resume": True,
+                }
 
     mode = "MOCK" if MOCK_IAM else "AWS"
     logger.log(
         "discover_identities",
         "success",
         f"Discovery Complete ({mode})",
-        details={"users_processed": user_count},
+        details={"users_processed": user_count, "pages": pages},
     )
     return {"status": "success", "users_processed": user_count}
 
@@ -1,6 +1,7 @@
 #lambdas/remediation/handler.py
 import boto3
 from datetime import datetime, timezone
+import itertools
 import os
 import sys
 from pathlib import Path
@@ -11,6 +12,7 @@ if str(ROOT) not in sys.path:
 
 from common import config, logger, repo
 from common.db import db
+from common.sharding import parse_shard
 
 # ⚠️ SAFETY SWITCHES
 DRY_RUN = config.DRY_RUN
@@ -46,36 +48,45 @@ def remediate_access(event, context):
             "Detachments will NOT be executed unless DRY_RUN is false AND ENABLE_REMEDIATION is true.",
         )
 
+    shard = parse_shard(event)
+
     with db.get_connection() as conn:
-        revocations = repo.list_revocations(conn)
+        # Streamed: work starts on the first row and memory stays bounded
+        revocations = repo.iter_revocations(conn, shard=shard)
 
         if DRY_RUN or not ENABLE_REMEDIATION:
+            head = list(itertools.islice(revocations, 10))
+            revocations = itertools.chain(head, revocations)
             preview = [
-                {"review_id": r_id, "user": u, "role": r, "arn": arn}
-                for r_id, u, r, arn in revocations[:10]
+                {"review_id": r.review_id, "user": r.user_name, "role": r.role_name, "arn": r.role_id, "sources": r.sources}
+                for r in head
             ]
             logger.log(
                 "remediate_access",
                 "plan",
                 "Preflight only; no detachments will be executed.",
-                details={"total_pending": len(revocations), "preview": preview},
+                details={"preview": preview},
             )
 
         action_count = 0
+        pending_count = 0
+        manual_count = 0
         iam = None
 
-        for review_id, user_name, role_name, role_arn in revocations:
+        for review_id, user_name, role_name, role_arn, user_id, campaign_id, sources in revocations:
+            pending_count += 1
             logger.log(
                 "remediate_access",
                 "processing",
                 f"Processing revocation: {user_name} -> {role_name}",
                 entity_type="access_review",
                 entity_id=review_id,
-                details={"user_name": user_name, "role_name": role_name},
+                details={"user_name": user_name, "role_name": role_name, "sources": sources},
             )
 
             try:
                 allowed, reason = _should_detach(role_name)
+                groups = []
                 if not allowed:
                     logger.log(
                         "remediate_access",
@@ -84,28 +95,55 @@ def remediate_access(event, context):
                         entity_type="access_review",
                         entity_id=review_id,
                     )
-                elif DRY_RUN or not ENABLE_REMEDIATION:
-                    logger.log(
-                        "remediate_access",
-                        "dry_run",
-                        f"Would detach {role_name} from {user_name}",
-                        entity_type="access_review",
-                        entity_id=review_id,
-                    )
                 else:
-                    if iam is None:
-                        iam = _get_iam_client()
-                    iam.detach_user_policy(UserName=user_name, PolicyArn=role_arn)
+                    for source, source_ref in sources:
+                        if source == "GROUP":
+                            # Removing the user from the group would also revoke
+                            # everything else the group grants: left to an admin
+                            groups.append(source_ref)
+                            continue
+                        action = "delete inline policy" if source == "INLINE" else "detach"
+                        if DRY_RUN or not ENABLE_REMEDIATION:
+                            logger.log(
+                                "remediate_access",
+                                "dry_run",
+                                f"Would {action} {role_name} from {user_name}",
+                                entity_type="access_review",
+                                entity_id=review_id,
+                            )
+                            continue
+                        if iam is None:
+                            iam = _get_iam_client()
+                        if source == "INLINE":
+                            # Inline roles are stored under the policy's own name
+                            iam.delete_user_policy(UserName=user_name, PolicyName=role_name)
+                        else:
+                            iam.detach_user_policy(UserName=user_name, PolicyArn=role_arn)
+                        repo.delete_user_role_source(conn, user_id, role_arn, source, source_ref)
+                        logger.log(
+                            "remediate_access",
+                            "success",
+                            f"AWS policy removed ({action}).",
+                            entity_type="access_review",
+                            entity_id=review_id,
+                        )
+
+                if groups:
+                    # Not remediated while a group still grants the role
+                    manual_count += 1
                     logger.log(
                         "remediate_access",
-                        "success",
-                        "AWS policy detached.",
+                        "manual_action",
+                        f"{role_name} is still granted to {user_name} through group(s) {', '.join(groups)}",
+                        level="WARN",
                         entity_type="access_review",
                         entity_id=review_id,
+                        details={"user_name": user_name, "role_id": role_arn, "groups": groups},
                     )
+                    continue
 
                 # Mark remediation as completed
-                repo.mark_remediated(conn, review_id, datetime.now(timezone.utc).isoformat())
+                repo.mark_remediated(conn, review_id, campaign_id, datetime.now(timezone.utc).isoformat())
 
                 action_count += 1
 
@@ -124,11 +162,18 @@ def remediate_access(event, context):
             "remediate_access",
             "complete",
             f"Remediation Complete. Processed {action_count} access revocations.",
-            details={"remediated": action_count, "dry_run": DRY_RUN},
+            details={
+                "remediated": action_count,
+                "manual_action": manual_count,
+                "total_pending": pending_count,
+                "dry_run": DRY_RUN,
+                "shard": shard.describe() if shard else None,
+            },
         )
         return {
             "status": "success",
             "remediated": action_count,
+            "manual_action": manual_count,
             "dry_run": DRY_RUN,
         }
 
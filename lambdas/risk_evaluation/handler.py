@@ -1,50 +1,44 @@
 #lambdas/risk_evaluation/handler.py
 import os
 import sys
+from datetime import datetime, timedelta
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
-from common import config, logger, repo
+from common import config, logger, repo, risk
 from common.db import db
+from common.sharding import parse_shard
 
 def evaluate_risk(event, context):
     logger.log("evaluate_risk", "start", "Starting Entitlement Risk Evaluation")
 
+    # In-process pipeline runs pass a shared entitlement snapshot on the
+    # context; it is kept in step with the roles reclassified here.
+    snapshot = getattr(context, "snapshot", None)
+    # Optional fan-out slice: only roles whose role_id falls in the shard
+    shard = parse_shard(event)
+
+    # Incremental: only roles never classified or classified under another
+    # ruleset; event["full"] re-evaluates everything
+    rules = risk.load_rules()
+    ruleset = risk.ruleset_hash(rules)
+    full = bool((event or {}).get("full"))
+
     with db.get_connection() as conn:
-        roles = repo.list_roles(conn)
+        # The shard's role_id range is applied in SQL
+        roles = repo.iter_roles(conn, shard=shard) if full else repo.iter_roles_to_evaluate(conn, ruleset, shard=shard)
+        evaluated_at = datetime.utcnow().isoformat()
 
         updated_count = 0
+        evaluated_count = 0
+        batch = []
 
         for role_id, role_name, current_risk in roles:
+            evaluated_count += 1
             try:
-                name = role_name.lower()
-                new_risk = "LOW"
-
-                # --- DETERMINISTIC RISK RULES ---
-                if "administratoraccess" in name or "fullaccess" in name:
-                    new_risk = "HIGH"
-                elif "poweruser" in name or "write" in name:
-                    new_risk = "MEDIUM"
-                elif "readonly" in name:
-                    new_risk = "LOW"
-                # --------------------------------
-
-                # Update only if risk level changed
-                if new_risk != current_risk:
-                    repo.update_role_risk(conn, role_id, new_risk)
-
-                    updated_count += 1
-
-                    if new_risk != "LOW":
-                        logger.log(
-                            "evaluate_risk",
-                            "info",
-                            f"{role_name} classified as {new_risk}",
-                            details={"role_id": role_id, "new_risk": new_risk},
-                        )
-
+                new_risk = risk.classify(role_name, rules)
             except Exception as e:
                 logger.log(
                     "evaluate_risk",
@@ -55,15 +49,54 @@ def evaluate_risk(event, context):
                 )
                 continue
 
+            # Every evaluated role is stamped with the ruleset, changed or not
+            batch.append((new_risk, ruleset, evaluated_at, role_id))
+            if new_risk != current_risk:
+                if snapshot:
+                    snapshot.update_role_risk(role_id, new_risk)
+                updated_count += 1
+                if new_risk != "LOW":
+                    logger.log(
+                        "evaluate_risk",
+                        "info",
+                        f"{role_name} classified as {new_risk}",
+                        details={"role_id": role_id, "new_risk": new_risk},
+                    )
+            if len(batch) >= config.STREAM_BATCH_SIZE:
+                repo.record_role_evaluations(conn, batch)
+                conn.commit()
+                batch = []
+        repo.record_role_evaluations(conn, batch)
+
+        # Usage (Access Advisor): HIGH-risk entitlements unused for
+        # STALE_ACCESS_DAYS are flagged stale; campaigns review them first
+        unused_since = (datetime.utcnow() - timedelta(days=config.STALE_ACCESS_DAYS)).isoformat()
+        stale_count = 0
+        changed = []
+        for user_id, role_id, stale, stored in repo.iter_usage_staleness(conn, unused_since, shard):
+            stale_count += stale
+            if stale != stored:
+                changed.append((stale, user_id, role_id))
+        repo.set_usage_stale(conn, changed)
+
         logger.log(
             "evaluate_risk",
             "success",
             f"Risk Evaluation Complete. Updated {updated_count} entitlements.",
-            details={"roles_updated": updated_count},
+            details={
+                "roles_updated": updated_count,
+                "roles_evaluated": evaluated_count,
+                "ruleset": ruleset,
+                "full": full,
+                "stale_high_entitlements": stale_count,
+                "shard": shard.describe() if shard else None,
+            },
         )
         return {
             "status": "success",
-            "roles_updated": updated_count
+            "roles_updated": updated_count,
+            "roles_evaluated": evaluated_count,
+            "stale_high_entitlements": stale_count,
         }
 
 # --- LOCAL TESTING ---
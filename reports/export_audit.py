@@ -1,7 +1,9 @@
+import argparse
 import csv
 import json
 import os
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import sys
 from pathlib import Path
@@ -12,136 +14,347 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from common import config, logger, repo
+from common import artifacts, config, logger, repo
 from common.db import db
 
+ARTIFACT_FORMATS = ("files", "chunked", "both", "star")
+
+# (export field name, CSV header, index in a repo.fetch_reviews_for_export row),
+# in artifact column order
+EXPORT_FIELDS = [
+    ("review_id", "Review ID", 0),
+    ("campaign_id", "Campaign ID", 1),
+    ("user", "User", 2),
+    ("role", "Role", 3),
+    ("risk_level", "Risk Level", 4),
+    ("status", "Decision Status", 5),
+    ("reviewer_comment", "Reviewer Comment", 6),
+    ("ai_risk_summary", "AI Risk Summary", 10),
+    ("created_at", "Created At", 7),
+    ("reviewed_at", "Reviewed At", 8),
+    ("remediated_at", "Remediated At", 9),
+]
+
+
+# Star layout: (table, fields). reviews is the fact table; user_key,
+# role_key and summary_key are dense integers assigned in fact order and
+# resolved through the dimension tables.
+STAR_TABLES = [
+    ("reviews", ("review_id", "campaign_id", "user_key", "role_key", "status", "reviewer_comment",
+                 "summary_key", "created_at", "reviewed_at", "remediated_at")),
+    ("users", ("user_key", "user_id", "user_name", "arn")),
+    ("roles", ("role_key", "role_id", "role_name", "risk_level")),
+    ("summaries", ("summary_key", "ai_risk_summary")),
+]
+
 
 def _sha256_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
-def export_audit_report():
+def export_record(row) -> dict:
+    """Map a repo.fetch_reviews_for_export row to its export field names."""
+    return {field: artifacts.jsonable(row[index]) for field, _, index in EXPORT_FIELDS}
+
+
+def star_tables(conn) -> list:
+    """
+    (name, fields, rows) for artifacts.write_star. The fact rows stream
+    first and assign keys; each dimension then holds only the users, roles
+    and distinct summary texts the facts reference, in key order.
+    """
+    users: dict = {}
+    roles: dict = {}
+    summaries: dict = {}
+
+    def facts():
+        for (review_id, campaign_id, user_id, role_id, status, comment, summary,
+             created_at, reviewed_at, remediated_at) in repo.iter_review_facts(conn):
+            yield [
+                review_id,
+                campaign_id,
+                users.setdefault(user_id, len(users)),
+                roles.setdefault(role_id, len(roles)),
+                status,
+                comment,
+                None if summary is None else summaries.setdefault(summary, len(summaries)),
+                artifacts.jsonable(created_at),
+                artifacts.jsonable(reviewed_at),
+                artifacts.jsonable(remediated_at),
+            ]
+
+    def dimension(keys: dict, rows):
+        for key, row in sorted((keys[row[0]], row) for row in rows if row[0] in keys):
+            yield [key, *row]
+
+    def summary_rows():
+        for text, key in summaries.items():
+            yield [key, text]
+
+    tables = dict(STAR_TABLES)
+    return [
+        ("reviews", tables["reviews"], facts()),
+        ("users", tables["users"], dimension(users, repo.iter_users(conn))),
+        ("roles", tables["roles"], dimension(roles, repo.iter_roles(conn))),
+        ("summaries", tables["summaries"], summary_rows()),
+    ]
+
+
+def star_record(fact, dims: dict) -> dict:
+    """
+    Rebuild the flat export record (EXPORT_FIELDS names) from a fact row;
+    dims maps each dimension table name to {key: row without the key}.
+    """
+    (review_id, campaign_id, user_key, role_key, status, comment,
+     summary_key, created_at, reviewed_at, remediated_at) = fact
+    _, user_name, _ = dims["users"][user_key]
+    _, role_name, risk_level = dims["roles"][role_key]
+    return {
+        "review_id": review_id,
+        "campaign_id": campaign_id,
+        "user": user_name,
+        "role": role_name,
+        "risk_level": risk_level,
+        "status": status,
+        "reviewer_comment": comment,
+        "ai_risk_summary": None if summary_key is None else dims["summaries"][summary_key][0],
+        "created_at": created_at,
+        "reviewed_at": reviewed_at,
+        "remediated_at": remediated_at,
+    }
+
+
+def _write_files(records: list, filename_csv: str, filename_json: str) -> dict:
+    with open(filename_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([header for _, header, _ in EXPORT_FIELDS])
+        writer.writerows([record[field] for field, _, _ in EXPORT_FIELDS] for record in records)
+
+    with open(filename_json, "w", encoding="utf-8") as jf:
+        json.dump(records, jf, ensure_ascii=False, indent=2)
+
+    with open(filename_csv, "rb") as f:
+        csv_hash = _sha256_bytes(f.read())
+    with open(filename_json, "rb") as f:
+        json_hash = _sha256_bytes(f.read())
+    return {"csv_sha256": csv_hash, "json_sha256": json_hash}
+
+
+def _upload_files(s3, base_path: str, meta: dict, filename_csv: str, filename_json: str):
+    s3.upload_file(
+        filename_csv,
+        config.AUDIT_S3_BUCKET,
+        f"{base_path}/access_certification.csv",
+        ExtraArgs={"Metadata": meta, "ContentType": "text/csv"},
+    )
+    s3.upload_file(
+        filename_json,
+        config.AUDIT_S3_BUCKET,
+        f"{base_path}/access_certification.json",
+        ExtraArgs={"Metadata": meta, "ContentType": "application/json"},
+    )
+
+
+def _upload_chunked(s3, key_prefix: str, meta: dict, chunk_dir: str, manifest: dict):
+    """Chunks upload in parallel; the manifest goes last so it never names a missing chunk."""
+    def put(chunk):
+        s3.upload_file(
+            os.path.join(chunk_dir, chunk["path"]),
+            config.AUDIT_S3_BUCKET,
+            f"{key_prefix}/{chunk['path']}",
+            ExtraArgs={"Metadata": {"sha256": chunk["sha256"]}, "ContentType": "application/octet-stream"},
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, config.AUDIT_WORKERS)) as pool:
+        list(pool.map(put, manifest["chunks"]))
+    s3.upload_file(
+        os.path.join(chunk_dir, artifacts.MANIFEST_NAME),
+        config.AUDIT_S3_BUCKET,
+        f"{key_prefix}/{artifacts.MANIFEST_NAME}",
+        ExtraArgs={"Metadata": meta, "ContentType": "application/json"},
+    )
+
+
+def _upload_star(s3, key_prefix: str, meta: dict, star_dir: str, manifest: dict):
+    """Each table as a chunked artifact, then the top-level manifest last."""
+    for table in manifest["tables"]:
+        table_dir = os.path.join(star_dir, table["path"])
+        _upload_chunked(s3, f"{key_prefix}/{table['path']}", meta, table_dir, artifacts.load_manifest(table_dir))
+    s3.upload_file(
+        os.path.join(star_dir, artifacts.MANIFEST_NAME),
+        config.AUDIT_S3_BUCKET,
+        f"{key_prefix}/{artifacts.MANIFEST_NAME}",
+        ExtraArgs={"Metadata": meta, "ContentType": "application/json"},
+    )
+
+
+def export_audit_report(artifact_format: str | None = None):
+    artifact_format = (artifact_format or config.AUDIT_ARTIFACT_FORMAT).lower()
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(f"AUDIT_ARTIFACT_FORMAT must be one of {', '.join(ARTIFACT_FORMATS)}")
+    write_files = artifact_format in ("files", "both")
+    write_chunks = artifact_format in ("chunked", "both")
+    write_star = artifact_format == "star"
+
     ts = datetime.now(timezone.utc)
     date_part = ts.strftime("%Y-%m-%d")
     report_dir = "reports"
     os.makedirs(report_dir, exist_ok=True)
     filename_csv = f"{report_dir}/access_certification_{date_part}.csv"
     filename_json = f"{report_dir}/access_certification_{date_part}.json"
+    chunk_dir = f"{report_dir}/access_certification_{date_part}"
+    star_dir = f"{report_dir}/access_certification_{date_part}_star"
 
     logger.log(
         "export_audit",
         "start",
-        f"Generating Audit Artifacts ({filename_csv}, {filename_json})",
-        details={"db_url": config.DB_URL},
+        f"Generating Audit Artifacts ({artifact_format})",
+        details={"db_url": config.DB_URL, "format": artifact_format},
     )
 
     try:
         with db.get_connection() as conn:
-            rows = repo.fetch_reviews_for_export(conn)
-
-        if not rows:
-            raise RuntimeError("No access review records to export (blocking empty artifact).")
-
-        # Integrity: counts by status
-        status_counts = {}
-        for row in rows:
-            status = row[5]
-            status_counts[status] = status_counts.get(status, 0) + 1
-
-        # Write CSV
-        with open(filename_csv, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                "Review ID",
-                "Campaign ID",
-                "User",
-                "Role",
-                "Risk Level",
-                "Decision Status",
-                "Reviewer Comment",
-                "AI Risk Summary",
-                "Created At",
-                "Reviewed At",
-                "Remediated At"
-            ])
-            writer.writerows(rows)
-
-        # Write JSON canonical
-        json_records = [
-            {
-                "review_id": r[0],
-                "campaign_id": r[1],
-                "user": r[2],
-                "role": r[3],
-                "risk_level": r[4],
-                "status": r[5],
-                "reviewer_comment": r[6],
-                "ai_risk_summary": r[7],
-                "created_at": r[8],
-                "reviewed_at": r[9],
-                "remediated_at": r[10],
-            }
-            for r in rows
-        ]
-        with open(filename_json, "w", encoding="utf-8") as jf:
-            json.dump(json_records, jf, ensure_ascii=False, indent=2)
+            carried_forward = repo.count_carry_forwards(conn)
+            # Integrity: counts by status, from the campaign rollup
+            status_counts = repo.rollup_status_counts(conn)
+            if write_star:
+                # Streams straight from the database; no flat rows are built
+                if not status_counts:
+                    raise RuntimeError("No access review records to export (blocking empty artifact).")
+                star = artifacts.write_star(
+                    star_tables(conn),
+                    star_dir,
+                    metadata={
+                        "dataset": "access_reviews",
+                        "generated_at": ts.isoformat(),
+                        "fact_table": "reviews",
+                        "export_fields": [field for field, _, _ in EXPORT_FIELDS],
+                        "status_counts": status_counts,
+                        "carried_forward": carried_forward,
+                    },
+                )
+                rows = None
+            else:
+                rows = repo.fetch_reviews_for_export(conn)
+
+        if rows is None:
+            record_count = star["tables"][0]["record_count"]
+            if sum(status_counts.values()) != record_count:
+                # Already in the manifest; verify_export flags the mismatch
+                logger.log(
+                    "export_audit",
+                    "rollup_drift",
+                    "Review rollup disagrees with the exported facts (run scripts/review_rollups.py repair)",
+                    level="WARN",
+                    details={"rollup_total": sum(status_counts.values()), "records": record_count},
+                )
+        else:
+            if not rows:
+                raise RuntimeError("No access review records to export (blocking empty artifact).")
+            record_count = len(rows)
+            if sum(status_counts.values()) != record_count:
+                logger.log(
+                    "export_audit",
+                    "rollup_drift",
+                    "Review rollup disagrees with the exported rows; counting rows instead "
+                    "(run scripts/review_rollups.py repair)",
+                    level="WARN",
+                    details={"rollup_total": sum(status_counts.values()), "records": record_count},
+                )
+                status_counts = {}
+                for row in rows:
+                    status = row[5]
+                    status_counts[status] = status_counts.get(status, 0) + 1
+
+        records = [export_record(r) for r in rows] if rows is not None else []
+        details = {"records": record_count, "status_counts": status_counts, "carried_forward": carried_forward}
+
+        if write_files:
+            details.update(_write_files(records, filename_csv, filename_json))
+            details["csv_path"] = os.path.abspath(filename_csv)
+            details["json_path"] = os.path.abspath(filename_json)
 
-        # Hashes
-        with open(filename_csv, "rb") as f:
-            csv_hash = _sha256_bytes(f.read())
-        with open(filename_json, "rb") as f:
-            json_hash = _sha256_bytes(f.read())
+        if write_chunks:
+            manifest = artifacts.write_chunked(
+                records,
+                chunk_dir,
+                metadata={
+                    "dataset": "access_reviews",
+                    "generated_at": ts.isoformat(),
+                    "fields": [field for field, _, _ in EXPORT_FIELDS],
+                    "status_counts": status_counts,
+                    "carried_forward": carried_forward,
+                },
+            )
+            manifest_path = os.path.join(chunk_dir, artifacts.MANIFEST_NAME)
+            details.update({
+                "chunk_dir": os.path.abspath(chunk_dir),
+                "chunks": len(manifest["chunks"]),
+                "compression": manifest["compression"],
+                "raw_bytes": manifest["raw_bytes"],
+                "compressed_bytes": manifest["bytes"],
+                "merkle_root": manifest["merkle_root"],
+                "manifest_sha256": artifacts.manifest_digest(manifest_path),
+            })
+
+        if write_star:
+            star_manifest_path = os.path.join(star_dir, artifacts.MANIFEST_NAME)
+            details.update({
+                "star_dir": os.path.abspath(star_dir),
+                "tables": {t["name"]: t["record_count"] for t in star["tables"]},
+                "compression": star["compression"],
+                "raw_bytes": star["raw_bytes"],
+                "compressed_bytes": star["bytes"],
+                "merkle_root": star["merkle_root"],
+                "manifest_sha256": artifacts.manifest_digest(star_manifest_path),
+            })
 
         # Optional S3 upload
         if config.AUDIT_S3_BUCKET and not config.LOCAL_ONLY:
             s3 = boto3.client("s3")
             prefix = config.AUDIT_S3_PREFIX.rstrip("/")
             base_path = f"{prefix}/access_reviews/{date_part}" if prefix else f"access_reviews/{date_part}"
-            s3_csv_key = f"{base_path}/access_certification.csv"
-            s3_json_key = f"{base_path}/access_certification.json"
 
             common_meta = {
                 "generated_at": ts.isoformat(),
-                "record_count": str(len(rows)),
-                "csv_sha256": csv_hash,
-                "json_sha256": json_hash,
+                "record_count": str(record_count),
+                "carried_forward": str(carried_forward),
             }
+            for key in ("csv_sha256", "json_sha256", "merkle_root", "manifest_sha256"):
+                if key in details:
+                    common_meta[key] = details[key]
 
-            s3.upload_file(
-                filename_csv,
-                config.AUDIT_S3_BUCKET,
-                s3_csv_key,
-                ExtraArgs={"Metadata": common_meta, "ContentType": "text/csv"},
-            )
-            s3.upload_file(
-                filename_json,
-                config.AUDIT_S3_BUCKET,
-                s3_json_key,
-                ExtraArgs={"Metadata": common_meta, "ContentType": "application/json"},
-            )
+            if write_files:
+                _upload_files(s3, base_path, common_meta, filename_csv, filename_json)
+            if write_chunks:
+                _upload_chunked(s3, f"{base_path}/chunks", common_meta, chunk_dir, manifest)
+            if write_star:
+                _upload_star(s3, f"{base_path}/star", common_meta, star_dir, star)
             s3_location = f"s3://{config.AUDIT_S3_BUCKET}/{base_path}"
         else:
             s3_location = None
+        details["s3_location"] = s3_location
 
-        logger.log(
-            "export_audit",
-            "success",
-            "Audit artifacts generated.",
-            details={
-                "records": len(rows),
-                "status_counts": status_counts,
-                "csv_path": os.path.abspath(filename_csv),
-                "json_path": os.path.abspath(filename_json),
-                "csv_sha256": csv_hash,
-                "json_sha256": json_hash,
-                "s3_location": s3_location,
-            },
-        )
+        logger.log("export_audit", "success", "Audit artifacts generated.", details=details)
+        return details
 
     except Exception as e:
         logger.log("export_audit", "error", f"Error generating audit report: {e}", level="ERROR")
         raise
 
 
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Export access review audit artifacts.")
+    parser.add_argument(
+        "--format",
+        choices=ARTIFACT_FORMATS,
+        default=config.AUDIT_ARTIFACT_FORMAT,
+        help="files: CSV + JSON; chunked: compressed chunks with a Merkle manifest; "
+        "star: chunked dimension tables plus a compact reviews fact table",
+    )
+    args = parser.parse_args(argv)
+    return export_audit_report(args.format)
+
+
 if __name__ == "__main__":
-    export_audit_report()
+    main()
@@ -0,0 +1,418 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import artifacts, config, logger, repo
+from common.db import db
+from common.sharding import ShardSpec
+from reports.export_audit import EXPORT_FIELDS, star_record
+
+# Target rows per diff bucket; each worker holds one artifact bucket in a dict
+BUCKET_ROWS = 250000
+_FIELDS = [field for field, _, _ in EXPORT_FIELDS]
+_ROW_INDEX = [index for _, _, index in EXPORT_FIELDS]
+_HEADERS = {header: field for field, header, _ in EXPORT_FIELDS}
+_WS = re.compile(r"[\s,]*")
+# Worker-side cache of star artifact dimensions, loaded once per process
+_STAR_DIMS: Dict[str, Dict[str, Dict[int, list]]] = {}
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if type(value) is str:
+        return value
+    return str(artifacts.jsonable(value))
+
+
+def _digest(values: List[Any]) -> str:
+    """
+    Content digest of one export record, values in EXPORT_FIELDS order.
+    None and "" compare equal because CSV cannot tell them apart;
+    datetimes are compared in ISO form, as exported.
+    """
+    return hashlib.blake2b("\x1f".join([_text(v) for v in values]).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def record_digest(record: Dict[str, Any]) -> str:
+    return _digest([record.get(field) for field in _FIELDS])
+
+
+def row_digest(row) -> str:
+    """Digest of a repo export row without building the record dict."""
+    return _digest([row[index] for index in _ROW_INDEX])
+
+
+def _bucket(review_id: str, buckets: int) -> int:
+    return zlib.crc32(review_id.encode("utf-8")) % buckets
+
+
+class _HashingReader(io.RawIOBase):
+    """Raw file wrapper that SHA-256s every byte as it is read."""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        if n:
+            self.sha256.update(memoryview(b)[:n])
+        return n
+
+
+def _iter_csv(text) -> Iterator[Dict[str, Any]]:
+    reader = csv.reader(text)
+    header = next(reader, None) or []
+    fields = [_HEADERS.get(h, h) for h in header]
+    if "review_id" not in fields:
+        raise ValueError("CSV header has no Review ID column")
+    for row in reader:
+        yield dict(zip(fields, row))
+
+
+def _iter_json_array(text, block: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Decode a top-level JSON array one element at a time."""
+    decoder = json.JSONDecoder()
+    buf = text.read(block).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("Expected a JSON array")
+    pos = 1
+    while True:
+        pos = _WS.match(buf, pos).end()
+        if buf.startswith("]", pos):
+            return
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = text.read(block)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield record
+        pos = end
+
+
+class _Spill:
+    """Per-bucket "review_id<TAB>digest" files for one side of the diff."""
+
+    def __init__(self, workdir: str, side: str, buckets: int):
+        self.buckets = buckets
+        self.files = [open(os.path.join(workdir, f"{side}-{b:05d}.tsv"), "wb", buffering=1 << 16) for b in range(buckets)]
+
+    def add(self, review_id: str, digest: str):
+        self.files[_bucket(review_id, self.buckets)].write(f"{review_id}\t{digest}\n".encode("utf-8"))
+
+    def add_blobs(self, blobs: Dict[int, bytes]):
+        for b, blob in blobs.items():
+            self.files[b].write(blob)
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def _spill_db(workdir: str, side: str, buckets: int, batch_size: int, shard: ShardSpec | None) -> int:
+    """Worker: stream one review_id range of the export query into db-side buckets."""
+    spill = _Spill(workdir, side, buckets)
+    rows = 0
+    try:
+        with db.get_connection() as conn:
+            for row in repo.iter_reviews_for_export(conn, batch_size, shard):
+                spill.add(row[0], row_digest(row))
+                rows += 1
+    finally:
+        spill.close()
+    return rows
+
+
+def _star_dims(star_dir: str) -> Dict[str, Dict[int, list]]:
+    dims = _STAR_DIMS.get(star_dir)
+    if dims is None:
+        manifest = artifacts.load_manifest(star_dir)
+        dims = {
+            table["name"]: {row[0]: row[1:] for row in artifacts.iter_chunked_records(os.path.join(star_dir, table["path"]))}
+            for table in manifest["tables"]
+            if table["name"] != manifest["fact_table"]
+        }
+        _STAR_DIMS[star_dir] = dims
+    return dims
+
+
+def _scan_chunk(
+    chunk_dir: str, chunk: Dict[str, Any], compression: str, buckets: int, star_dir: str | None = None
+) -> Dict[str, Any]:
+    """
+    Worker: check one chunk's hashes and bucket its records. With star_dir,
+    the chunk holds fact rows, resolved through the dimensions into flat
+    export records before digesting.
+    """
+    with open(os.path.join(chunk_dir, chunk["path"]), "rb") as f:
+        data = f.read()
+    result = {"index": chunk["index"], "problems": [], "records": 0, "status_counts": {}, "blobs": {}}
+    if hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+        result["problems"].append("sha256 mismatch")
+    try:
+        raw = artifacts.decompress(data, compression)
+    except Exception as exc:
+        # Its rows then surface as missing from the artifact
+        result["problems"].append(f"unreadable: {exc}")
+        return result
+    if hashlib.sha256(raw).hexdigest() != chunk["raw_sha256"]:
+        result["problems"].append("raw_sha256 mismatch")
+    dims = None
+    if star_dir:
+        try:
+            dims = _star_dims(star_dir)
+        except Exception as exc:
+            # A corrupt dimension is already reported by check_star; the
+            # fact rows it would resolve surface as missing, as above
+            result["problems"].append(f"dimensions unreadable: {exc}")
+            return result
+    lines: Dict[int, List[str]] = {}
+    counts = result["status_counts"]
+    for line in raw.splitlines():
+        if not line:
+            continue
+        record = json.loads(line)
+        if dims is not None:
+            try:
+                record = star_record(record, dims)
+            except (KeyError, TypeError, ValueError) as exc:
+                result["problems"].append(f"unresolvable fact row: {exc!r}")
+                continue
+        review_id = str(record.get("review_id"))
+        lines.setdefault(_bucket(review_id, buckets), []).append(f"{review_id}\t{record_digest(record)}\n")
+        counts[record.get("status")] = counts.get(record.get("status"), 0) + 1
+        result["records"] += 1
+    if result["records"] != chunk["records"]:
+        result["problems"].append(f"{result['records']} records, manifest says {chunk['records']}")
+    result["blobs"] = {b: "".join(ls).encode("utf-8") for b, ls in lines.items()}
+    return result
+
+
+def _diff_bucket(workdir: str, bucket: int, db_sides: List[str], sample: int) -> Dict[str, Any]:
+    """Worker: compare one bucket pair. Artifact side in a dict, DB side streamed."""
+    artifact: Dict[str, str] = {}
+    duplicates: List[str] = []
+    with open(os.path.join(workdir, f"artifact-{bucket:05d}.tsv"), "rb") as f:
+        for line in f:
+            review_id, digest = line.decode("utf-8").rstrip("\n").split("\t")
+            if review_id in artifact:
+                duplicates.append(review_id)
+            artifact[review_id] = digest
+    missing, mismatched = [], []
+    for side in db_sides:
+        with open(os.path.join(workdir, f"{side}-{bucket:05d}.tsv"), "rb") as f:
+            for line in f:
+                review_id, digest = line.decode("utf-8").rstrip("\n").split("\t")
+                found = artifact.pop(review_id, None)
+                if found is None:
+                    missing.append(review_id)
+                elif found != digest:
+                    mismatched.append(review_id)
+    # Whatever is left was exported but is no longer in the database
+    extra = list(artifact)
+    return {
+        "missing_from_artifact": (len(missing), sorted(missing)[:sample]),
+        "missing_from_db": (len(extra), sorted(extra)[:sample]),
+        "mismatched": (len(mismatched), sorted(mismatched)[:sample]),
+        "duplicates": (len(duplicates), sorted(duplicates)[:sample]),
+    }
+
+
+def _artifact_kind(path: str) -> str:
+    if os.path.isdir(path) or os.path.basename(path) == artifacts.MANIFEST_NAME:
+        return "star" if artifacts.load_manifest(path).get("format") == artifacts.STAR_FORMAT else "chunked"
+    if path.lower().endswith(".csv"):
+        return "csv"
+    if path.lower().endswith(".json"):
+        return "json"
+    raise ValueError(f"Cannot tell artifact type of {path}; expected .csv, .json or a chunk directory")
+
+
+def _scan_file(path: str, kind: str, spill: _Spill) -> Tuple[int, Dict[str, int], str]:
+    """Single streaming pass over a CSV/JSON artifact: hash, count and bucket."""
+    records = 0
+    counts: Dict[str, int] = {}
+    with open(path, "rb", buffering=0) as f:
+        hashing = _HashingReader(f)
+        text = io.TextIOWrapper(io.BufferedReader(hashing, 1 << 20), encoding="utf-8", newline="")
+        for record in (_iter_csv(text) if kind == "csv" else _iter_json_array(text)):
+            spill.add(str(record.get("review_id")), record_digest(record))
+            counts[record.get("status")] = counts.get(record.get("status"), 0) + 1
+            records += 1
+        # Hash whatever trails the last record too
+        while text.read(1 << 20):
+            pass
+    return records, counts, hashing.sha256.hexdigest()
+
+
+def verify_export(
+    path: str,
+    expected_sha256: str | None = None,
+    workers: int | None = None,
+    sample: int = 20,
+    batch_size: int = 10000,
+) -> dict:
+    """
+    Reconcile an export artifact (CSV, JSON, chunk or star directory) with
+    access_reviews: artifact hashes, total and per-status counts against a
+    grouped query, and a row diff by review_id. Both sides are spilled to
+    crc32(review_id) buckets on disk and the buckets are diffed on a
+    process pool, so memory is bounded by one bucket per worker.
+    """
+    t0 = time.perf_counter()
+    kind = _artifact_kind(path)
+    workers = max(2, workers or os.cpu_count() or 2)
+    problems: List[str] = []
+
+    with db.get_connection() as conn:
+        db_counts = repo.count_reviews_by_status(conn)
+        # Half the pool streams review_id ranges of the table, the rest reads the artifact
+        splits = repo.review_id_split_points(conn, workers // 2)
+    db_total = sum(db_counts.values())
+    bounds = [None] + splits + [None]
+    shards = [ShardSpec(start=bounds[i], end=bounds[i + 1]) for i in range(len(bounds) - 1)]
+    db_sides = [f"db{i:03d}" for i in range(len(shards))]
+
+    manifest = top = star_dir = None
+    if kind in ("chunked", "star"):
+        top = artifacts.load_manifest(path)
+        root = path if os.path.isdir(path) else os.path.dirname(path)
+        artifact_sha256 = artifacts.manifest_digest(os.path.join(root, artifacts.MANIFEST_NAME))
+        if kind == "star":
+            # Dimension chunks are checked here, fact chunks by the scan below
+            star_dir = root
+            problems.extend(artifacts.check_star(star_dir, top, skip=(top["fact_table"],)))
+            chunk_dir = os.path.join(star_dir, top["fact_table"])
+            manifest = artifacts.load_manifest(chunk_dir)
+        else:
+            chunk_dir, manifest = root, top
+        expected_rows = manifest["record_count"]
+        if artifacts.merkle_root([c["sha256"] for c in manifest["chunks"]]) != manifest["merkle_root"]:
+            problems.append("merkle_root does not match the chunk hashes")
+    else:
+        expected_rows = db_total
+    buckets = max(workers * 4, math.ceil(max(expected_rows, db_total) / BUCKET_ROWS))
+
+    with tempfile.TemporaryDirectory(prefix="verify_export_") as workdir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        db_futures = [
+            pool.submit(_spill_db, workdir, side, buckets, batch_size, shard)
+            for side, shard in zip(db_sides, shards)
+        ]
+        spill = _Spill(workdir, "artifact", buckets)
+        try:
+            if manifest is not None:
+                records = 0
+                counts: Dict[str, int] = {}
+                pending = list(manifest["chunks"])
+                futures = []
+                while pending or futures:
+                    # Keep a bounded window in flight so returned buckets do not pile up
+                    while pending and len(futures) < 2 * workers:
+                        chunk = pending.pop(0)
+                        futures.append(
+                            pool.submit(_scan_chunk, chunk_dir, chunk, manifest["compression"], buckets, star_dir)
+                        )
+                    result = futures.pop(0).result()
+                    spill.add_blobs(result.pop("blobs"))
+                    records += result["records"]
+                    for status, n in result["status_counts"].items():
+                        counts[status] = counts.get(status, 0) + n
+                    problems.extend(f"chunk {result['index']}: {p}" for p in result["problems"])
+                if records != manifest["record_count"]:
+                    problems.append(f"artifact has {records} records, manifest says {manifest['record_count']}")
+                if top.get("status_counts") not in (None, counts):
+                    problems.append("manifest status_counts do not match the chunks")
+            else:
+                records, counts, artifact_sha256 = _scan_file(path, kind, spill)
+        finally:
+            spill.close()
+        db_rows = sum(future.result() for future in db_futures)
+
+        diff: Dict[str, Any] = {key: [0, []] for key in ("missing_from_artifact", "missing_from_db", "mismatched", "duplicates")}
+        for result in pool.map(_diff_bucket, [workdir] * buckets, range(buckets), [db_sides] * buckets, [sample] * buckets):
+            for key, (n, ids) in result.items():
+                diff[key][0] += n
+                diff[key][1].extend(ids)
+
+    if expected_sha256 and expected_sha256.lower() != artifact_sha256:
+        problems.append("artifact sha256 does not match the expected value")
+    if records != db_total:
+        problems.append(f"artifact has {records} records, database has {db_total}")
+    if db_rows != db_total:
+        problems.append(f"database changed during verification ({db_total} counted, {db_rows} streamed)")
+    if counts != db_counts:
+        problems.append("per-status counts differ from the database")
+    for key, (n, _) in diff.items():
+        if n:
+            problems.append(f"{n} {key.replace('_', ' ')}")
+
+    report = {
+        "artifact": path,
+        "kind": kind,
+        "sha256": artifact_sha256,
+        "records": {"artifact": records, "db": db_total},
+        "status_counts": {"artifact": counts, "db": db_counts},
+        "diff": {key: {"count": n, "sample": sorted(ids)[:sample]} for key, (n, ids) in diff.items()},
+        "buckets": buckets,
+        "db_slices": len(shards),
+        "workers": workers,
+        "ok": not problems,
+        "problems": problems,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    if top is not None:
+        report["merkle_root"] = top["merkle_root"]
+    logger.log(
+        "verify_export",
+        "success" if report["ok"] else "mismatch",
+        "Export matches the database" if report["ok"] else f"Export verification found {len(problems)} problem(s)",
+        level="INFO" if report["ok"] else "WARN",
+        details=report,
+    )
+    return report
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Verify an audit export against access_reviews.")
+    parser.add_argument("path", help="Exported .csv, .json, or chunked / star artifact directory / manifest.json")
+    parser.add_argument(
+        "--expected-sha256",
+        help="Pinned SHA-256 of the file (CSV/JSON) or of the top-level manifest.json (chunked/star), e.g. from the export log",
+    )
+    parser.add_argument("--workers", type=int, default=config.AUDIT_WORKERS, help="Worker processes")
+    parser.add_argument("--sample", type=int, default=20, help="review_ids listed per kind of difference")
+    args = parser.parse_args(argv)
+    report = verify_export(args.path, args.expected_sha256, args.workers, args.sample)
+    return 0 if report["ok"] else 2
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:  # pragma: no cover
+        logger.log("verify_export", "error", f"Export verification failed: {exc}", level="ERROR")
+        sys.exit(1)
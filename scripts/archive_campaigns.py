@@ -0,0 +1,95 @@
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import config, logger, repo
+from common.db import db
+
+
+def archive(after_days: int = config.ARCHIVE_AFTER_DAYS, dry_run: bool = False) -> dict:
+    """
+    Close finished campaigns, then move campaigns closed more than
+    `after_days` ago out of the hot access_reviews table. Also keeps the
+    monthly audit_logs partitions pre-created on Postgres, and moves
+    campaigns still in the default reviews partition (rows from before
+    0002_partitioning) into their own partitions.
+    """
+    now = datetime.utcnow()
+    closed_before = (now - timedelta(days=after_days)).isoformat()
+    archived = []
+    partitioned = []
+    with db.get_connection() as conn:
+        repo.ensure_audit_log_partitions(conn)
+        closed = repo.close_completed_campaigns(conn, now.isoformat())
+        candidates = repo.list_archivable_campaigns(conn, closed_before)
+        legacy = repo.list_default_partition_campaigns(conn)
+        conn.commit()
+
+        for campaign_id in [] if dry_run else legacy:
+            # One campaign per transaction keeps each row move and lock short
+            repo.partition_campaign_reviews(conn, campaign_id)
+            conn.commit()
+            partitioned.append(campaign_id)
+        if partitioned:
+            logger.log(
+                "archive_campaigns",
+                "partitioned",
+                f"Moved {len(partitioned)} campaign(s) out of the default reviews partition",
+                details={"campaigns": partitioned},
+            )
+
+        for campaign_id in candidates:
+            if dry_run:
+                archived.append({"campaign_id": campaign_id, "archived": False})
+                continue
+            # One transaction per campaign so a failure leaves the rest hot
+            moved = repo.archive_campaign(conn, campaign_id, now.isoformat())
+            conn.commit()
+            logger.log(
+                "archive_campaigns",
+                "archived",
+                f"Archived campaign {campaign_id}",
+                entity_type="campaign",
+                entity_id=campaign_id,
+                details={"moved": moved},
+            )
+            archived.append({"campaign_id": campaign_id, "archived": True, "moved": moved})
+
+    result = {
+        "campaigns_closed": closed,
+        "campaigns_archived": len([a for a in archived if a["archived"]]),
+        "campaigns_partitioned": len(partitioned),
+        "default_partition_campaigns": legacy,
+        "candidates": archived,
+        "closed_before": closed_before,
+        "dry_run": dry_run,
+    }
+    logger.log("archive_campaigns", "success", "Campaign archiving complete", details=result)
+    return result
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Close finished campaigns and archive old ones.")
+    parser.add_argument(
+        "--after-days",
+        type=int,
+        default=config.ARCHIVE_AFTER_DAYS,
+        help="Archive campaigns closed more than this many days ago",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="List candidates without archiving")
+    args = parser.parse_args(argv)
+    return archive(args.after_days, args.dry_run)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:  # pragma: no cover
+        logger.log("archive_campaigns", "error", f"Archiving failed: {exc}", level="ERROR")
+        sys.exit(1)
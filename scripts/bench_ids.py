@@ -0,0 +1,140 @@
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import config, ids, logger, repo
+from common.db import db
+
+COLUMNS = ("review_id", "campaign_id", "user_id", "role_id", "created_at")
+
+
+def _table(scheme: str) -> str:
+    return f"bench_ids_{scheme}"
+
+
+def _create_table(conn, table: str):
+    cur = conn.cursor()
+    db.execute(cur, f"DROP TABLE IF EXISTS {table}")
+    # Same key shape as access_reviews, without the foreign keys
+    db.execute(
+        cur,
+        f"""
+        CREATE TABLE {table} (
+            review_id TEXT PRIMARY KEY,
+            campaign_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            role_id TEXT NOT NULL,
+            created_at TIMESTAMP
+        )
+        """,
+    )
+    conn.commit()
+
+
+def _sizes(conn, table: str) -> dict:
+    """Bytes used by the primary key index and the table (None if unavailable)."""
+    cur = conn.cursor()
+    if not db.is_sqlite:
+        db.execute(cur, "SELECT pg_relation_size(?), pg_relation_size(?)", (f"{table}_pkey", table))
+        index_bytes, table_bytes = cur.fetchone()
+        return {"index_bytes": index_bytes, "table_bytes": table_bytes}
+    try:
+        db.execute(
+            cur,
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN (?, ?) GROUP BY name",
+            (table, f"sqlite_autoindex_{table}_1"),
+        )
+        sizes = dict(cur.fetchall())
+    except Exception:  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+        return {"index_bytes": None, "table_bytes": None}
+    return {"index_bytes": sizes.get(f"sqlite_autoindex_{table}_1"), "table_bytes": sizes.get(table)}
+
+
+def bench_scheme(conn, scheme: str, rows: int, batch_size: int, keep: bool = False) -> dict:
+    table = _table(scheme)
+    _create_table(conn, table)
+
+    t0 = time.perf_counter()
+    keys = [ids.new_id(scheme) for _ in range(rows)]
+    generate_s = time.perf_counter() - t0
+
+    start = datetime(2026, 1, 1)
+    inserted = 0
+    batch_seconds = []
+    t0 = time.perf_counter()
+    for offset in range(0, rows, batch_size):
+        batch = [
+            (key, "bench-ids", f"bench-user-{i % 2000}", f"bench-role-{i % 20}", (start + timedelta(seconds=i)).isoformat())
+            for i, key in enumerate(keys[offset:offset + batch_size], offset)
+        ]
+        b0 = time.perf_counter()
+        inserted += repo.bulk_insert(conn, table, COLUMNS, batch, ("review_id",))
+        conn.commit()
+        batch_seconds.append(time.perf_counter() - b0)
+    insert_s = time.perf_counter() - t0
+
+    # Throughput over the last tenth of the load, when the index is largest
+    tail = batch_seconds[-max(1, len(batch_seconds) // 10):]
+    tail_rows = min(rows, len(tail) * batch_size)
+    result = {
+        "scheme": scheme,
+        "rows": inserted,
+        "generate_ids_per_s": round(rows / generate_s) if generate_s else None,
+        "insert_seconds": round(insert_s, 3),
+        "insert_rows_per_s": round(inserted / insert_s) if insert_s else None,
+        "tail_rows_per_s": round(tail_rows / sum(tail)) if sum(tail) else None,
+        **_sizes(conn, table),
+    }
+    if not keep:
+        db.execute(conn.cursor(), f"DROP TABLE {table}")
+        conn.commit()
+    return result
+
+
+def run(rows: int, batch_size: int, schemes: list[str], keep: bool = False) -> dict:
+    with db.get_connection() as conn:
+        results = [bench_scheme(conn, scheme, rows, batch_size, keep) for scheme in schemes]
+    by_scheme = {r["scheme"]: r for r in results}
+    summary = {"engine": "sqlite" if db.is_sqlite else "postgres", "results": results}
+    if "uuid4" in by_scheme and "uuid7" in by_scheme:
+        v4, v7 = by_scheme["uuid4"], by_scheme["uuid7"]
+        summary["uuid7_vs_uuid4"] = {
+            "insert_speedup": round(v7["insert_rows_per_s"] / v4["insert_rows_per_s"], 2),
+            "index_size_ratio": (
+                round(v7["index_bytes"] / v4["index_bytes"], 2) if v4["index_bytes"] and v7["index_bytes"] else None
+            ),
+        }
+    logger.log("bench_ids", "success", "ID scheme insert benchmark complete", details=summary)
+    return summary
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Compare insert throughput and primary key index size for uuid4 vs uuid7 review ids "
+        "(creates and drops bench_ids_* tables; use a scratch DB)."
+    )
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=config.STREAM_BATCH_SIZE)
+    parser.add_argument("--schemes", default=",".join(ids.ID_SCHEMES), help="Comma-separated subset of uuid7,uuid4")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench tables for inspection")
+    args = parser.parse_args(argv)
+    schemes = [s.strip() for s in args.schemes.split(",") if s.strip()]
+    for scheme in schemes:
+        if scheme not in ids.ID_SCHEMES:
+            parser.error(f"unknown scheme {scheme}")
+    return run(args.rows, args.batch_size, schemes, args.keep)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:  # pragma: no cover
+        logger.log("bench_ids", "error", f"Benchmark failed: {exc}", level="ERROR")
+        sys.exit(1)
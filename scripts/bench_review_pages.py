@@ -0,0 +1,155 @@
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import logger, repo
+from common.db import db
+
+BENCH_CAMPAIGN = "bench-review-pages"
+STATUSES = ("PENDING", "APPROVED", "REVOKED")
+
+
+def seed(conn, reviews: int, users: int = 2000, roles: int = 20):
+    """Insert a synthetic campaign with `reviews` reviews (idempotent ids)."""
+    start = datetime(2026, 1, 1)
+    repo.bulk_insert_users(
+        conn,
+        [(f"bench-user-{i}", f"bench-user-{i}", f"arn:aws:iam::000000000000:user/bench-{i}", start.isoformat(), None)
+         for i in range(users)],
+    )
+    repo.bulk_insert_roles(
+        conn,
+        [(f"bench-role-{i}", f"bench-role-{i}", ("LOW", "MEDIUM", "HIGH")[i % 3], None) for i in range(roles)],
+    )
+    repo.ensure_campaign(conn, BENCH_CAMPAIGN, "Review paging benchmark", start.isoformat())
+    batch = []
+    for i in range(reviews):
+        # Several reviews share each timestamp so the review_id tie-break matters
+        created_at = (start + timedelta(seconds=i // 4)).isoformat()
+        batch.append((f"bench-review-{i:08d}", BENCH_CAMPAIGN, f"bench-user-{i % users}",
+                      f"bench-role-{i % roles}", created_at, "NORMAL", None))
+        if len(batch) == 50000:
+            repo.bulk_create_reviews(conn, batch)
+            batch = []
+    repo.bulk_create_reviews(conn, batch)
+    # Spread statuses so the status filter is selective
+    db.execute(
+        conn.cursor(),
+        """
+        UPDATE access_reviews
+        SET status = 'APPROVED', reviewer = 'bench-reviewer', reviewed_at = created_at
+        WHERE campaign_id = ? AND review_id LIKE ?
+        """,
+        (BENCH_CAMPAIGN, "%1"),
+    )
+    # Raw status update above: recount the campaign's rollup
+    repo.rebuild_review_rollups(conn, BENCH_CAMPAIGN)
+    conn.commit()
+    # Fresh statistics so the planner (and count estimates) see the new rows
+    conn.cursor().execute("ANALYZE")
+    conn.commit()
+
+
+def _timed(fn, repeat: int) -> float:
+    """Median wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def _offset_page(conn, filters: dict, offset: int, limit: int):
+    clauses = ["r.campaign_id = ?"] + (["r.status = ?"] if "status" in filters else [])
+    cur = conn.cursor()
+    db.execute(
+        cur,
+        f"""
+        SELECT r.review_id FROM access_reviews r
+        JOIN users u ON r.user_id = u.user_id
+        JOIN roles rol ON r.role_id = rol.role_id
+        WHERE {' AND '.join(clauses)}
+        ORDER BY r.created_at, r.review_id
+        LIMIT ? OFFSET ?
+        """,
+        (*filters.values(), limit, offset),
+    )
+    return cur.fetchall()
+
+
+def _campaign_size(conn) -> int:
+    cur = conn.cursor()
+    db.execute(cur, "SELECT COUNT(*) FROM access_reviews WHERE campaign_id = ?", (BENCH_CAMPAIGN,))
+    return cur.fetchone()[0]
+
+
+def run(reviews: int, page_size: int, depths: list[int], repeat: int, status: str | None) -> dict:
+    filters = {"campaign_id": BENCH_CAMPAIGN}
+    if status:
+        filters["status"] = status
+    targets = sorted(set(d for d in depths if d >= 1))
+    results = []
+    with db.get_connection() as conn:
+        if _campaign_size(conn) < reviews:
+            logger.log("bench_review_pages", "start", f"Seeding {reviews} reviews")
+            seed(conn, reviews)
+
+        # Walk pages with cursors; at each target depth time the keyset page
+        # and the equivalent OFFSET query.
+        cursor, page = None, 1
+        first = None
+        while targets:
+            at = cursor
+            if page == targets[0]:
+                keyset_ms = _timed(lambda: repo.query_reviews(conn, cursor=at, limit=page_size, **filters), repeat)
+                offset_ms = _timed(lambda: _offset_page(conn, filters, (page - 1) * page_size, page_size), repeat)
+                results.append({"page": page, "keyset_ms": keyset_ms, "offset_ms": offset_ms})
+                targets.pop(0)
+            result = repo.query_reviews(conn, cursor=at, limit=page_size, **filters)
+            first = first or result
+            cursor = result.next_cursor
+            if cursor is None:
+                break
+            page += 1
+
+    summary = {
+        "engine": "sqlite" if db.is_sqlite else "postgres",
+        "filters": filters,
+        "page_size": page_size,
+        "estimated_total": first.estimated_total if first else None,
+        "pages_walked": page,
+        "pages": results,
+    }
+    logger.log("bench_review_pages", "success", "Review paging benchmark complete", details=summary)
+    return summary
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Measure keyset vs OFFSET page latency by depth (seeds a synthetic campaign; use a scratch DB)."
+    )
+    parser.add_argument("--reviews", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--depths", default="1,10,100,1000,3000", help="Comma-separated page numbers to time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--status", choices=STATUSES, help="Also filter by status")
+    args = parser.parse_args(argv)
+    depths = [int(d) for d in args.depths.split(",") if d.strip()]
+    return run(args.reviews, args.page_size, depths, args.repeat, args.status)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:  # pragma: no cover
+        logger.log("bench_review_pages", "error", f"Benchmark failed: {exc}", level="ERROR")
+        sys.exit(1)
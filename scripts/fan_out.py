@@ -0,0 +1,120 @@
+import argparse
+import importlib.util
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import ids, logger, repo
+from common.db import db
+
+# Handlers that accept event["shard"]: name -> (module path relative to ROOT,
+# callable, table and column whose key ranges the shards split)
+SHARDABLE = {
+    "risk": ("lambdas/risk_evaluation/handler.py", "evaluate_risk", "roles", "role_id"),
+    "campaign": ("lambdas/generate_reviews/handler.py", "generate_campaign", "users", "user_id"),
+    "ai": ("lambdas/ai_explanation/handler.py", "handler", "access_reviews", "review_id"),
+    "remediation": ("lambdas/remediation/handler.py", "remediate_access", "access_reviews", "review_id"),
+}
+
+
+def _run_shard(module_path: str, attr: str, event: dict) -> dict:
+    """Worker entry point: import the handler in this process and run one shard."""
+    spec = importlib.util.spec_from_file_location("fan_out_handler", ROOT / module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, attr)(event, None)
+
+
+def merge_results(results: list[dict]) -> dict:
+    """
+    Combine per-shard summaries: numbers are summed, lists concatenated, and
+    other values kept once if all shards agree, else listed per distinct value.
+    """
+    merged: dict = {}
+    scalars: dict = {}
+    for result in results:
+        for key, value in (result or {}).items():
+            if key == "status":
+                continue
+            if isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] = merged.get(key, 0) + value
+            else:
+                values = scalars.setdefault(key, [])
+                if value not in values:
+                    values.append(value)
+    for key, values in scalars.items():
+        merged[key] = values[0] if len(values) == 1 else values
+
+    statuses = sorted({str((r or {}).get("status", "unknown")).lower() for r in results})
+    merged["status"] = statuses[0] if len(statuses) == 1 else "mixed"
+    merged["shards"] = len(results)
+    return merged
+
+
+def fan_out(handler: str, shards: int, event: dict | None = None, workers: int | None = None) -> dict:
+    """
+    Run up to `shards` key-range slices of a handler in a process pool and
+    merge their summaries. The ranges come from repo.key_split_points, so
+    each shard's queries read only its own rows (a hash shard would read
+    the whole table in every worker). Campaign shards share one
+    pre-assigned campaign_id; the campaign (and its Postgres partition) is
+    created here first so the shards never race to attach it.
+    """
+    if handler not in SHARDABLE:
+        raise ValueError(f"Handler {handler} is not shardable; choose from {', '.join(SHARDABLE)}")
+    if shards < 1:
+        raise ValueError("shards must be >= 1")
+    module_path, attr, table, column = SHARDABLE[handler]
+    base_event = dict(event or {})
+    with db.get_connection() as conn:
+        splits = repo.key_split_points(conn, table, column, shards)
+        if handler == "campaign":
+            base_event.setdefault("campaign_id", ids.new_id())
+            base_event.setdefault(
+                "campaign_name", f"Access Campaign {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
+            )
+            repo.ensure_campaign(
+                conn, base_event["campaign_id"], base_event["campaign_name"], datetime.utcnow().isoformat()
+            )
+            conn.commit()
+
+    # Fewer distinct keys than requested shards gives fewer ranges
+    bounds = [None] + splits + [None]
+    events = [{**base_event, "shard": {"start": bounds[i], "end": bounds[i + 1]}} for i in range(len(bounds) - 1)]
+    shards = len(events)
+    logger.log("fan_out", "start", f"Running {handler} across {shards} shards", details={"workers": workers or shards})
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or shards) as pool:
+        results = list(pool.map(_run_shard, [module_path] * shards, [attr] * shards, events))
+    merged = merge_results(results)
+    merged["seconds"] = round(time.perf_counter() - t0, 3)
+    logger.log("fan_out", "success", f"{handler} fan-out complete", details=merged)
+    return merged
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run a handler as N parallel shards locally.")
+    parser.add_argument("handler", choices=sorted(SHARDABLE))
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--workers", type=int, help="Process pool size (default: one per shard)")
+    parser.add_argument("--event", default="{}", help="Base event JSON merged into every shard event")
+    args = parser.parse_args(argv)
+    return fan_out(args.handler, args.shards, json.loads(args.event), args.workers)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:  # pragma: no cover
+        logger.log("fan_out", "error", f"Fan-out failed: {exc}", level="ERROR")
+        sys.exit(1)
@@ -0,0 +1,30 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import config, iam_cache, logger
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Inspect or prune the on-disk IAM response cache.")
+    parser.add_argument("command", choices=("stats", "purge", "clear"), help="purge drops entries older than the TTL")
+    parser.add_argument("--path", default=config.IAM_CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    store = iam_cache.get_store(args.path)
+    if args.command == "purge":
+        logger.log("iam_cache", "purged", f"Removed {store.purge_expired()} expired responses", details={"path": args.path})
+    elif args.command == "clear":
+        logger.log("iam_cache", "cleared", f"Removed {store.clear()} responses", details={"path": args.path})
+    print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
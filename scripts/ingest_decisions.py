@@ -0,0 +1,54 @@
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import config, decisions, logger
+from common.db import db
+
+
+def run(path: str, fmt: str | None = None, chunk_size: int | None = None, rejects_out: str | None = None) -> dict:
+    with db.get_connection() as conn:
+        summary, rejects = decisions.ingest(conn, path, fmt, chunk_size)
+    if rejects_out:
+        with open(rejects_out, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "review_id", "reason"])
+            writer.writerows(rejects)
+        summary["rejects_path"] = rejects_out
+    for reject in rejects[:20]:
+        logger.log(
+            "ingest_decisions",
+            "rejected",
+            f"Line {reject.line}: {reject.reason}",
+            level="WARN",
+            entity_type="review",
+            entity_id=reject.review_id,
+        )
+    return summary
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Apply reviewer decisions (review_id, status, comment, reviewer, timestamp) from CSV or JSON lines."
+    )
+    parser.add_argument("path", help="Decision file (.csv, .jsonl)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Override format detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=config.DECISION_CHUNK_SIZE, help="Rows per transaction")
+    parser.add_argument("--rejects-out", help="Write rejected lines (line, review_id, reason) to this CSV")
+    args = parser.parse_args(argv)
+    summary = run(args.path, args.format, args.chunk_size, args.rejects_out)
+    return 0 if summary["rejected"] == 0 else 2
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:  # pragma: no cover
+        logger.log("ingest_decisions", "error", f"Decision ingestion failed: {exc}", level="ERROR")
+        sys.exit(1)
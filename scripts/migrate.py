@@ -1,7 +1,11 @@
 #scripts/migrate.py
-import os
+import argparse
+import hashlib
+import re
 import sys
+import time
 from pathlib import Path
+from typing import Dict, List, NamedTuple
 
 # Ensure repository root is on sys.path for module imports
 ROOT = Path(__file__).resolve().parent.parent
@@ -22,110 +26,353 @@ except ImportError:
     psycopg2 = None  # type: ignore
 
 
-SQL_DIR = ROOT / "sql"
+MIGRATIONS_DIR = ROOT / "sql" / "migrations"
+# NNNN_name.sql runs on every engine; NNNN_name.sqlite.sql / .postgres.sql on one
+_FILE_RE = re.compile(r"^(\d{4})_(\w+?)(?:\.(sqlite|postgres))?\.sql$")
+_CONCURRENT_RE = re.compile(r"\bCONCURRENTLY\b", re.IGNORECASE)
+_CREATE_INDEX_RE = re.compile(
+    r"^CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+ON\s+(\w+)\s*(.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ADD_COLUMN_RE = re.compile(r"^ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+(\w+)\s", re.IGNORECASE)
+# SQLite trigger bodies (BEGIN ... END) contain semicolons of their own
+_TRIGGER_BODY_RE = re.compile(r"^CREATE\s+(?:TEMP(?:ORARY)?\s+)?TRIGGER\b.*\bBEGIN\b", re.IGNORECASE | re.DOTALL)
+_TRIGGER_END_RE = re.compile(r"\bEND\s*$", re.IGNORECASE)
+# Session-level lock so two migrators never interleave on one Postgres DB
+_PG_LOCK_KEY = 727_346_001
 
 
-def load_sql(name: str) -> str:
-    path = SQL_DIR / name
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+class Migration(NamedTuple):
+    version: str
+    files: List[Path]
+    checksum: str
 
 
-def _execute_statements(cur, sql_blob: str):
+def split_sql(blob: str) -> List[str]:
     """
-    Execute multiple statements separated by semicolons (simple splitter).
+    Split a script into statements on top-level semicolons. Quoted strings,
+    quoted identifiers, dollar-quoted bodies ($$ ... $$, $tag$ ... $tag$),
+    SQLite trigger bodies (BEGIN ... END) and comments are respected;
+    comment-only statements are dropped.
     """
-    for statement in sql_blob.split(";"):
-        stmt = statement.strip()
-        if not stmt:
+    statements: List[str] = []
+    buf: List[str] = []
+    i, n = 0, len(blob)
+    while i < n:
+        ch = blob[i]
+        if blob.startswith("--", i):
+            end = blob.find("\n", i)
+            i = n if end < 0 else end
             continue
-        cur.execute(stmt)
+        if blob.startswith("/*", i):
+            end = blob.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if ch in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if blob[j] == ch:
+                    if j + 1 < n and blob[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            buf.append(blob[i:j + 1])
+            i = j + 1
+            continue
+        if ch == "$":
+            tag = re.match(r"\$(?:[A-Za-z_]\w*)?\$", blob[i:])
+            if tag:
+                close = blob.find(tag.group(0), i + len(tag.group(0)))
+                end = n if close < 0 else close + len(tag.group(0))
+                buf.append(blob[i:end])
+                i = end
+                continue
+        if ch == ";":
+            statement = "".join(buf).strip()
+            if _TRIGGER_BODY_RE.match(statement) and not _TRIGGER_END_RE.search(statement):
+                buf.append(ch)
+                i += 1
+                continue
+            if statement:
+                statements.append(statement)
+            buf = []
+            i += 1
+            continue
+        buf.append(ch)
+        i += 1
+    statement = "".join(buf).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def discover_migrations(dialect: str, directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Ordered migrations for a dialect ("sqlite" or "postgres"). A version may
+    have a shared file and a dialect file; the shared one runs first and the
+    checksum covers both (line endings normalized).
+    """
+    by_number: Dict[str, Dict[str, Path]] = {}
+    names: Dict[str, str] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILE_RE.match(path.name)
+        if not match:
+            raise ValueError(f"Unexpected migration file name: {path.name}")
+        number, name, file_dialect = match.groups()
+        if names.setdefault(number, name) != name:
+            raise ValueError(f"Migration {number} has conflicting names: {names[number]}, {name}")
+        by_number.setdefault(number, {})[file_dialect or ""] = path
+
+    migrations = []
+    for number in sorted(by_number):
+        files = [by_number[number][key] for key in ("", dialect) if key in by_number[number]]
+        if not files:
+            continue
+        digest = hashlib.sha256()
+        for path in files:
+            digest.update(path.name.encode("utf-8") + b"\n")
+            digest.update(path.read_bytes().replace(b"\r\n", b"\n"))
+        migrations.append(Migration(f"{number}_{names[number]}", files, digest.hexdigest()))
+    return migrations
+
+
+def _statements(migration: Migration) -> List[str]:
+    statements = []
+    for path in migration.files:
+        statements.extend(split_sql(path.read_text(encoding="utf-8")))
+    return statements
 
 
-def apply_sqlite():
+# --- SQLite -----------------------------------------------------------------
+def _sqlite_columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _apply_sqlite_step(conn, migration: Migration):
+    conn.execute("BEGIN")
+    try:
+        for statement in _statements(migration):
+            add_column = _ADD_COLUMN_RE.match(statement)
+            if add_column and add_column.group(2) in _sqlite_columns(conn, add_column.group(1)):
+                continue
+            # SQLite has no concurrent builds; its writers are blocked either way
+            conn.execute(_CONCURRENT_RE.sub("", statement, count=1))
+        conn.execute(
+            "INSERT OR REPLACE INTO schema_version (version, applied_at, checksum) VALUES (?, CURRENT_TIMESTAMP, ?)",
+            (migration.version, migration.checksum),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _connect_sqlite():
     if sqlite3 is None:
         raise RuntimeError("sqlite3 module not available")
+    # Autocommit mode: each step manages its own BEGIN/COMMIT
+    return sqlite3.connect(config.require_sqlite_path(), isolation_level=None)
+
+
+# --- Postgres ---------------------------------------------------------------
+def _index_is_invalid(cur, name: str) -> bool:
+    cur.execute("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def _index_exists(cur, name: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cur.fetchone()[0]
 
-    db_path = config.require_sqlite_path()
-    base_sql = load_sql("schema_base.sql")
-    sqlite_sql = load_sql("schema_sqlite.sql")
 
-    conn = sqlite3.connect(db_path)
+def _create_index_concurrently(conn, statement: str):
+    """
+    Run a CONCURRENTLY statement in autocommit mode. Postgres cannot build a
+    partitioned index concurrently, so for partitioned tables the parent
+    index is created ON ONLY the parent, each partition's index is built
+    concurrently and attached. An invalid index left by an interrupted build
+    is dropped and rebuilt.
+    """
+    cur = conn.cursor()
+    match = _CREATE_INDEX_RE.match(statement)
+    if not match:
+        cur.execute(statement)
+        return
+    unique, name, table, rest = match.groups()
+    unique = unique or ""
+    cur.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (table,),
+    )
+    if not cur.fetchone()[0]:
+        if _index_is_invalid(cur, name):
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cur.execute(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {rest}")
+        return
+
+    if _index_exists(cur, name) and not _index_is_invalid(cur, name):
+        return
+    cur.execute(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON ONLY {table} {rest}")
+    # Partitions without a child of this index yet
+    cur.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_inherits ii
+              JOIN pg_index x ON x.indexrelid = ii.inhrelid
+              WHERE ii.inhparent = to_regclass(%s) AND x.indrelid = c.oid
+          )
+        ORDER BY c.relname
+        """,
+        (table, name),
+    )
+    for (partition,) in cur.fetchall():
+        child = f"{name[:50]}_{hashlib.md5(partition.encode('utf-8')).hexdigest()[:8]}"
+        if _index_is_invalid(cur, child):
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {child}")
+        cur.execute(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {rest}")
+        cur.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def _apply_postgres_step(conn, migration: Migration):
+    """
+    Statements run in one transaction, except CONCURRENTLY ones, which
+    commit what came before and run in autocommit. Steps containing them
+    must therefore be safe to re-run (IF NOT EXISTS).
+    """
+    cur = conn.cursor()
     try:
-        cursor = conn.cursor()
-        cursor.executescript(base_sql)
-        cursor.executescript(sqlite_sql)
-        _ensure_sqlite_column(
-            conn,
-            table="access_reviews",
-            column="ai_risk_summary",
-            column_def="TEXT",
-        )
-        cursor.execute(
-            "INSERT OR REPLACE INTO schema_version (version) VALUES (?)",
-            (config.SCHEMA_VERSION,),
+        for statement in _statements(migration):
+            if _CONCURRENT_RE.search(statement):
+                conn.commit()
+                conn.autocommit = True
+                try:
+                    _create_index_concurrently(conn, statement)
+                finally:
+                    conn.autocommit = False
+            else:
+                cur.execute(statement)
+        cur.execute(
+            """
+            INSERT INTO schema_version (version, applied_at, checksum)
+            VALUES (%s, NOW(), %s)
+            ON CONFLICT (version) DO UPDATE
+            SET applied_at = EXCLUDED.applied_at, checksum = EXCLUDED.checksum
+            """,
+            (migration.version, migration.checksum),
         )
         conn.commit()
-        logger.log(
-            action="migrate",
-            status="success",
-            message=f"Applied schema version {config.SCHEMA_VERSION} to SQLite at {db_path}",
-            details={"db_path": db_path},
-        )
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
 
 
-def apply_postgres():
+def _connect_postgres():
     if psycopg2 is None:
         raise RuntimeError("psycopg2 is required for Postgres migrations")
+    conn = psycopg2.connect(config.DB_URL, connect_timeout=10)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        # Poll rather than block: a session waiting inside pg_advisory_lock
+        # would stall the holder's CREATE INDEX CONCURRENTLY (deadlock).
+        waited = False
+        while True:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (_PG_LOCK_KEY,))
+            if cur.fetchone()[0]:
+                break
+            if not waited:
+                logger.log("migrate", "waiting", "Another migration is running; waiting for it to finish")
+                waited = True
+            time.sleep(1)
+        # Fail fast instead of queueing behind (and blocking) live traffic
+        cur.execute(f"SET lock_timeout = {int(config.MIGRATION_LOCK_TIMEOUT_MS)}")
+    conn.autocommit = False
+    return conn
 
-    base_sql = load_sql("schema_base.sql")
-    pg_sql = load_sql("schema_postgres.sql")
 
-    conn = psycopg2.connect(
-        config.DB_URL,
-        connect_timeout=10,  # Phase 1 default safety
+# --- runner -----------------------------------------------------------------
+def _applied(conn, sqlite: bool) -> Dict[str, str | None]:
+    """version -> checksum; bootstraps schema_version (and its checksum column)."""
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version TEXT PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, checksum TEXT)"
     )
+    if sqlite:
+        if "checksum" not in _sqlite_columns(conn, "schema_version"):
+            cur.execute("ALTER TABLE schema_version ADD COLUMN checksum TEXT")
+    else:
+        cur.execute("ALTER TABLE schema_version ADD COLUMN IF NOT EXISTS checksum TEXT")
+        conn.commit()
+    cur.execute("SELECT version, checksum FROM schema_version")
+    return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def run_migrations(status_only: bool = False) -> dict:
+    """
+    Apply pending migrations in order. Already-applied versions are skipped
+    after verifying their checksum; a mismatch means an applied file was
+    edited and stops the run.
+    """
+    sqlite = config.db_is_sqlite()
+    migrations = discover_migrations("sqlite" if sqlite else "postgres")
+    conn = _connect_sqlite() if sqlite else _connect_postgres()
     try:
-        with conn:
-            with conn.cursor() as cur:
-                _execute_statements(cur, base_sql)
-                if pg_sql.strip():
-                    _execute_statements(cur, pg_sql)
-                cur.execute(
-                    """
-                    INSERT INTO schema_version (version, applied_at)
-                    VALUES (%s, NOW())
-                    ON CONFLICT (version) DO UPDATE SET applied_at = EXCLUDED.applied_at
-                    """,
-                    (config.SCHEMA_VERSION,),
+        applied = _applied(conn, sqlite)
+        pending = []
+        for migration in migrations:
+            recorded = applied.get(migration.version)
+            if recorded is None:
+                pending.append(migration)
+            elif recorded != migration.checksum:
+                raise RuntimeError(
+                    f"Migration {migration.version} changed after it was applied "
+                    f"(checksum {recorded[:12]} != {migration.checksum[:12]}); add a new migration instead"
+                )
+
+        done = []
+        if not status_only:
+            for migration in pending:
+                t0 = time.perf_counter()
+                (_apply_sqlite_step if sqlite else _apply_postgres_step)(conn, migration)
+                seconds = round(time.perf_counter() - t0, 3)
+                done.append(migration.version)
+                logger.log(
+                    "migrate",
+                    "applied",
+                    f"Applied migration {migration.version}",
+                    details={"version": migration.version, "checksum": migration.checksum, "seconds": seconds},
                 )
-        logger.log(
-            action="migrate",
-            status="success",
-            message=f"Applied schema version {config.SCHEMA_VERSION} to Postgres",
-        )
     finally:
         conn.close()
 
-
-def _ensure_sqlite_column(conn, table: str, column: str, column_def: str):
-    """
-    Add a column if it does not exist (SQLite has no IF NOT EXISTS for columns).
-    """
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({table})")
-    existing = {row[1] for row in cur.fetchall()}
-    if column not in existing:
-        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_def}")
+    result = {
+        "engine": "sqlite" if sqlite else "postgres",
+        "applied": done,
+        "pending": [m.version for m in pending] if status_only else [],
+        "version": next(
+            (m.version for m in reversed(migrations) if m.version in applied or m.version in done),
+            None,
+        ),
+    }
+    logger.log(
+        action="migrate",
+        status="success",
+        message=f"Schema at {result['version']} ({len(done)} migration(s) applied)",
+        details=result,
+    )
+    return result
 
 
-def main():
-    if config.db_is_sqlite():
-        apply_sqlite()
-    else:
-        apply_postgres()
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations from sql/migrations.")
+    parser.add_argument("--status", action="store_true", help="List pending migrations without applying them")
+    args = parser.parse_args(argv)
+    return run_migrations(status_only=args.status)
 
 
 if __name__ == "__main__":
@@ -134,4 +381,3 @@ if __name__ == "__main__":
     except Exception as exc:  # pragma: no cover
         logger.log("migrate", "error", f"Migration failed: {exc}", level="ERROR")
         sys.exit(1)
-
@@ -0,0 +1,76 @@
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import config, logger, outbox, repo
+from common.db import db
+
+
+def run(
+    sink_name: str = "jsonl",
+    out_dir: str = config.OUTBOX_DIR,
+    batch_size: int = config.OUTBOX_BATCH_SIZE,
+    purge_days: int | None = None,
+    follow: bool = False,
+    interval: float = 5.0,
+) -> dict:
+    sink = outbox.JsonlSink(out_dir) if sink_name == "jsonl" else outbox.QueueSink()
+    totals = {"relayed": 0, "batches": 0, "last_seq": None, "remaining": 0, "purged": 0}
+    with db.get_connection() as conn:
+        while True:
+            result = outbox.relay(conn, sink, batch_size)
+            totals["relayed"] += result["relayed"]
+            totals["batches"] += result["batches"]
+            totals["last_seq"] = result["last_seq"] or totals["last_seq"]
+            totals["remaining"] = result["remaining"]
+            if not follow:
+                break
+            time.sleep(interval)
+        if purge_days is not None:
+            # Aware UTC, as ack_outbox stamps relayed_at (TIMESTAMPTZ on Postgres)
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=purge_days)).isoformat()
+            totals["purged"] = repo.purge_relayed_outbox(conn, cutoff)
+    if sink_name == "jsonl":
+        totals["out_dir"] = out_dir
+    logger.log("outbox_relay", "success", f"Relayed {totals['relayed']} outbox events", details=totals)
+    return totals
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Publish pending entitlement change events from the outbox.")
+    parser.add_argument(
+        "--sink",
+        choices=("jsonl", "queue"),
+        default="jsonl",
+        help="jsonl: append to events-YYYY-MM-DD.jsonl under --out-dir; queue: in-process queue (dry run)",
+    )
+    parser.add_argument("--out-dir", default=config.OUTBOX_DIR)
+    parser.add_argument("--batch-size", type=int, default=config.OUTBOX_BATCH_SIZE)
+    parser.add_argument(
+        "--purge",
+        action="store_true",
+        help=f"Delete events relayed more than --purge-days (default {config.OUTBOX_RETENTION_DAYS}) days ago",
+    )
+    parser.add_argument("--purge-days", type=int, default=config.OUTBOX_RETENTION_DAYS)
+    parser.add_argument("--follow", action="store_true", help="Keep polling until interrupted")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --follow")
+    args = parser.parse_args(argv)
+    return run(
+        args.sink,
+        args.out_dir,
+        args.batch_size,
+        args.purge_days if args.purge else None,
+        args.follow,
+        args.interval,
+    )
+
+
+if __name__ == "__main__":
+    main()
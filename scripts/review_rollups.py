@@ -0,0 +1,82 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import logger, repo
+from common.db import db
+
+
+def progress(rows) -> dict:
+    """campaign_id -> totals, per-status counts and a risk x status breakdown."""
+    campaigns = {}
+    for row in rows:
+        if not row.review_count:
+            continue
+        c = campaigns.setdefault(
+            row.campaign_id, {"reviews": 0, "pending": 0, "remediated": 0, "by_status": {}, "by_risk": {}}
+        )
+        c["reviews"] += row.review_count
+        c["remediated"] += row.remediated_count
+        if row.status == "PENDING":
+            c["pending"] += row.review_count
+        c["by_status"][row.status] = c["by_status"].get(row.status, 0) + row.review_count
+        c["by_risk"].setdefault(row.risk_level, {})[row.status] = row.review_count
+    for c in campaigns.values():
+        c["decided_pct"] = round(100.0 * (c["reviews"] - c["pending"]) / c["reviews"], 1) if c["reviews"] else None
+    return campaigns
+
+
+def _drift_json(drift) -> list:
+    return [
+        {
+            "campaign_id": stored.campaign_id,
+            "risk_level": stored.risk_level,
+            "status": stored.status,
+            "stored": [stored.review_count, stored.remediated_count],
+            "actual": [actual.review_count, actual.remediated_count],
+        }
+        for stored, actual in drift
+    ]
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Campaign progress from the review rollup: show it, check it against access_reviews, or rebuild it."
+    )
+    parser.add_argument("command", choices=("show", "check", "repair"), help="check exits 2 when the rollup has drifted")
+    parser.add_argument("--campaign", help="Limit to one campaign_id")
+    args = parser.parse_args(argv)
+
+    with db.get_connection() as conn:
+        if args.command == "show":
+            print(json.dumps(progress(repo.list_review_rollups(conn, args.campaign)), indent=2))
+            return 0
+        if args.command == "check":
+            drift = repo.diff_review_rollups(conn, args.campaign)
+            logger.log(
+                "review_rollups",
+                "drift" if drift else "consistent",
+                f"{len(drift)} rollup buckets disagree with access_reviews",
+                level="WARN" if drift else "INFO",
+                details={"campaign_id": args.campaign, "drift": _drift_json(drift)},
+            )
+            return 2 if drift else 0
+        drift = repo.rebuild_review_rollups(conn, args.campaign)
+        conn.commit()
+        logger.log(
+            "review_rollups",
+            "repaired",
+            f"Rebuilt review rollup, corrected {len(drift)} buckets",
+            details={"campaign_id": args.campaign, "drift": _drift_json(drift)},
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
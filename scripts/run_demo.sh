@@ -39,98 +39,17 @@ if [ -f "$DB_FILE" ]; then
 fi
 
 # --------------------------------------------------
-# 2. Initialize Database Schema
+# 2. Full governance cycle in one process
+#    migrate -> discovery -> risk -> SoD -> campaign -> AI (if GOOGLE_API_KEY)
+#    -> simulated review -> remediation (DRY RUN) -> audit export
 # --------------------------------------------------
-echo -e "\n[1/7] Initializing Database Schema..."
-DB_URL="$DB_URL" python3 scripts/migrate.py
-echo "      Schema initialized."
-
-# --------------------------------------------------
-# 3. Identity Discovery
-# --------------------------------------------------
-echo -e "\n[2/7] Running Identity Discovery (AWS IAM)..."
+echo -e "\nRunning governance pipeline (single process, shared DB connection)..."
 export AWS_DEFAULT_REGION=us-east-1
 export DB_URL
 export MOCK_IAM
-python3 lambdas/identity_discovery/handler.py
-
-# --------------------------------------------------
-# 4. Risk Evaluation
-# --------------------------------------------------
-echo -e "\n[3/7] Evaluating Entitlement Risk..."
-python3 lambdas/risk_evaluation/handler.py
-
-# --------------------------------------------------
-# 5. Certification Campaign Generation
-# --------------------------------------------------
-echo -e "\n[4/7] Generating Access Certification Campaign..."
-python3 lambdas/generate_reviews/handler.py
-
-# --------------------------------------------------
-# 6. AI Risk Explanation (High Risk Only, optional)
-# --------------------------------------------------
-if [ -n "$GOOGLE_API_KEY" ]; then
-  echo -e "\n[5/7] Generating AI risk explanations (HIGH only)..."
-  python3 lambdas/ai_explanation/handler.py
-else
-  echo -e "\n[5/7] Skipping AI risk explanations (GOOGLE_API_KEY not set)..."
-fi
-
-# --------------------------------------------------
-# INTERMISSION: Simulate Human Review
-# --------------------------------------------------
-echo -e "\nSimulating human access review..."
-echo "      Rejecting Administrator-level access..."
-
-if [[ "$DB_URL" == sqlite* ]]; then
-sqlite3 "$DB_FILE" <<EOF
-UPDATE access_reviews
-SET status = 'REVOKED',
-    reviewer_comment = 'Violation of Least Privilege',
-    reviewed_at = CURRENT_TIMESTAMP
-WHERE role_id IN (
-    SELECT role_id FROM roles
-    WHERE role_name LIKE '%AdministratorAccess%'
-);
-EOF
-else
-python3 - <<'PY'
-from common.db import db
-from common import logger
-
-with db.get_connection() as conn:
-    cur = conn.cursor()
-    db.execute(
-        cur,
-        """
-        UPDATE access_reviews
-        SET status = 'REVOKED',
-            reviewer_comment = 'Violation of Least Privilege',
-            reviewed_at = CURRENT_TIMESTAMP
-        WHERE role_id IN (
-            SELECT role_id FROM roles
-            WHERE role_name LIKE '%AdministratorAccess%'
-        )
-        """
-    )
-logger.log("demo_intermission", "info", "Marked AdministratorAccess reviews as REVOKED")
-PY
-fi
-
-echo " Review decisions recorded."
-
-# --------------------------------------------------
-# 7. Remediation (Dry Run)
-# --------------------------------------------------
-echo -e "\n[6/7] Executing Remediation Engine (DRY RUN)..."
 export DRY_RUN=True
-python3 lambdas/remediation/handler.py
-
-# --------------------------------------------------
-# 8. Audit Report Export
-# --------------------------------------------------
-echo -e "\n[7/7] Exporting Audit Report..."
-python3 reports/export_audit.py
+python3 scripts/run_pipeline.py \
+    --stages migrate,discovery,risk,sod,campaign,ai,simulate_review,remediation,export
 
 # --------------------------------------------------
 # Done
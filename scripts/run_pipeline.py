@@ -0,0 +1,187 @@
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common import logger, repo
+from common.db import db
+from common.snapshot import EntitlementSnapshot
+
+
+# (stage name, module path relative to ROOT, callable name, takes (event, context))
+STAGES = [
+    ("migrate", "scripts/migrate.py", "run_migrations", False),
+    ("discovery", "lambdas/identity_discovery/handler.py", "discover_identities", True),
+    ("access_advisor", "lambdas/access_advisor/handler.py", "enrich_access_usage", True),
+    ("risk", "lambdas/risk_evaluation/handler.py", "evaluate_risk", True),
+    ("sod", "lambdas/sod_detection/handler.py", "detect_sod_violations", True),
+    ("campaign", "lambdas/generate_reviews/handler.py", "generate_campaign", True),
+    ("ai", "lambdas/ai_explanation/handler.py", "handler", True),
+    ("simulate_review", None, "simulate_review", False),
+    ("remediation", "lambdas/remediation/handler.py", "remediate_access", True),
+    ("export", "reports/export_audit.py", "export_audit_report", False),
+]
+STAGE_NAMES = [name for name, *_ in STAGES]
+# simulate_review rewrites review decisions; it only runs when selected explicitly.
+DEFAULT_STAGES = [name for name in STAGE_NAMES if name != "simulate_review"]
+
+
+class PipelineContext:
+    """
+    Context object handed to every handler in place of the Lambda context.
+    The entitlement snapshot is loaded once, on first use, over the shared
+    connection and then reused (and updated) by later stages.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+
+    @property
+    def snapshot(self) -> EntitlementSnapshot:
+        if self._snapshot is None:
+            with db.get_connection() as conn:
+                self._snapshot = EntitlementSnapshot.load(conn)
+        return self._snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+def simulate_review():
+    """Demo-only reviewer decisions: revoke AdministratorAccess reviews."""
+    reviewed_at = datetime.now(timezone.utc).isoformat()
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        db.execute(
+            cur,
+            """
+            SELECT r.review_id, r.campaign_id FROM access_reviews r
+            JOIN roles rol ON r.role_id = rol.role_id
+            WHERE rol.role_name LIKE ?
+            """,
+            ("%AdministratorAccess%",),
+        )
+        decisions = [
+            (review_id, campaign_id, "REVOKED", "Violation of Least Privilege", "pipeline-simulation", reviewed_at)
+            for review_id, campaign_id in cur.fetchall()
+        ]
+        repo.apply_review_decisions(conn, decisions)
+    return {"status": "success", "decisions": len(decisions)}
+
+
+def _load_callable(module_path: str | None, attr: str):
+    if module_path is None:
+        return globals()[attr]
+    path = ROOT / module_path
+    name = "pipeline_" + module_path.replace("/", "_").removesuffix(".py")
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return getattr(module, attr)
+
+
+def select_stages(stages: list[str] | None = None, start_from: str | None = None) -> list[str]:
+    selected = list(stages) if stages else list(DEFAULT_STAGES)
+    unknown = [s for s in selected if s not in STAGE_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    if start_from:
+        if start_from not in STAGE_NAMES:
+            raise ValueError(f"Unknown stage: {start_from}")
+        cutoff = STAGE_NAMES.index(start_from)
+        selected = [s for s in selected if STAGE_NAMES.index(s) >= cutoff]
+    # Always run in pipeline order regardless of how they were listed
+    return sorted(selected, key=STAGE_NAMES.index)
+
+
+def run_pipeline(stages: list[str] | None = None, start_from: str | None = None, event: dict | None = None) -> dict:
+    """
+    Run the selected stages in one process over one shared DB connection.
+    Returns per-stage results and timings (seconds).
+    """
+    selected = select_stages(stages, start_from)
+    context = PipelineContext()
+    results = {}
+    timings = {}
+
+    logger.log("pipeline", "start", "Starting pipeline", details={"stages": selected})
+    started = time.perf_counter()
+
+    # Migrations manage their own connection/DDL transaction; run them first.
+    if "migrate" in selected:
+        t0 = time.perf_counter()
+        results["migrate"] = _load_callable("scripts/migrate.py", "run_migrations")()
+        timings["migrate"] = round(time.perf_counter() - t0, 3)
+        logger.log(
+            "pipeline",
+            "stage_complete",
+            f"Stage migrate finished in {timings['migrate']}s",
+            details={"stage": "migrate", "seconds": timings["migrate"]},
+        )
+
+    with db.shared_connection():
+        for name, module_path, attr, is_handler in STAGES:
+            if name not in selected or name == "migrate":
+                continue
+            if name == "ai" and not os.getenv("GOOGLE_API_KEY"):
+                logger.log("pipeline", "skip", "Skipping AI stage (GOOGLE_API_KEY not set)")
+                results[name] = {"status": "SKIPPED"}
+                timings[name] = 0.0
+                continue
+
+            t0 = time.perf_counter()
+            func = _load_callable(module_path, attr)
+            results[name] = func(dict(event or {}), context) if is_handler else func()
+            timings[name] = round(time.perf_counter() - t0, 3)
+            logger.log(
+                "pipeline",
+                "stage_complete",
+                f"Stage {name} finished in {timings[name]}s",
+                details={"stage": name, "seconds": timings[name]},
+            )
+
+            if name == "discovery":
+                # Discovery changed users/roles; reload the snapshot lazily.
+                context.invalidate()
+
+    total = round(time.perf_counter() - started, 3)
+    logger.log(
+        "pipeline",
+        "success",
+        f"Pipeline complete in {total}s",
+        details={"timings": timings, "total_seconds": total},
+    )
+    return {"status": "success", "results": results, "timings": timings, "total_seconds": total}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run the certification pipeline in a single process.")
+    parser.add_argument(
+        "--stages",
+        help=f"Comma-separated stages to run (default: {','.join(DEFAULT_STAGES)}). "
+        f"Available: {','.join(STAGE_NAMES)}",
+    )
+    parser.add_argument("--from", dest="start_from", help="Resume from this stage (inclusive)")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()] if args.stages else None
+    return run_pipeline(stages, args.start_from)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:  # pragma: no cover
+        logger.log("pipeline", "error", f"Pipeline failed: {exc}", level="ERROR")
+        sys.exit(1)
@@ -0,0 +1,34 @@
+-- sql/migrations/0001_baseline.postgres.sql
+-- Postgres-specific statements layered on top of 0001_baseline.sql.
+-- Normalize timestamps to TIMESTAMPTZ and audit details to JSONB. These
+-- rewrite the tables, so they run once, when the baseline is applied.
+
+ALTER TABLE users ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at;
+ALTER TABLE roles ALTER COLUMN risk_level SET NOT NULL;
+ALTER TABLE campaigns ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at;
+ALTER TABLE access_reviews
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at,
+    ALTER COLUMN reviewed_at TYPE TIMESTAMPTZ USING reviewed_at,
+    ALTER COLUMN remediated_at TYPE TIMESTAMPTZ USING remediated_at;
+ALTER TABLE access_reviews
+    ADD COLUMN IF NOT EXISTS ai_risk_summary TEXT;
+ALTER TABLE access_reviews
+    ADD COLUMN IF NOT EXISTS priority TEXT DEFAULT 'NORMAL';
+ALTER TABLE access_reviews ADD COLUMN IF NOT EXISTS reviewer TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS account_id TEXT;
+ALTER TABLE roles ADD COLUMN IF NOT EXISTS account_id TEXT;
+ALTER TABLE sod_violations ALTER COLUMN detected_at TYPE TIMESTAMPTZ USING detected_at;
+ALTER TABLE discovery_state
+    ALTER COLUMN started_at TYPE TIMESTAMPTZ USING started_at,
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at;
+ALTER TABLE campaigns
+    ADD COLUMN IF NOT EXISTS closed_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ;
+-- audit_logs.timestamp becomes TIMESTAMPTZ during partitioning (0002)
+ALTER TABLE audit_logs
+    ALTER COLUMN details TYPE JSONB USING details::jsonb;
+
+-- Indexes (idempotent). access_reviews / audit_logs indexes are created in 0002+
+CREATE INDEX IF NOT EXISTS idx_users_account ON users(account_id);
+CREATE INDEX IF NOT EXISTS idx_roles_name ON roles(role_name);
+
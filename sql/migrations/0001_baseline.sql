@@ -1,28 +1,35 @@
-#sql/schema_base.sql
--- Portable base schema (SQLite/Postgres compatible types)
+-- sql/migrations/0001_baseline.sql
+-- Portable base schema (SQLite/Postgres compatible types).
+-- Applied migrations are immutable: change the schema by adding a new
+-- numbered file, never by editing an applied one (checksums are verified).
 
 CREATE TABLE IF NOT EXISTS schema_version (
     version TEXT PRIMARY KEY,
-    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    checksum TEXT
 );
 
 CREATE TABLE IF NOT EXISTS users (
     user_id TEXT PRIMARY KEY,
     user_name TEXT NOT NULL,
     arn TEXT UNIQUE,
+    account_id TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS roles (
     role_id TEXT PRIMARY KEY,
     role_name TEXT NOT NULL,
-    risk_level TEXT CHECK (risk_level IN ('LOW','MEDIUM','HIGH')) DEFAULT 'LOW'
+    risk_level TEXT CHECK (risk_level IN ('LOW','MEDIUM','HIGH')) DEFAULT 'LOW',
+    account_id TEXT
 );
 
 CREATE TABLE IF NOT EXISTS campaigns (
     campaign_id TEXT PRIMARY KEY,
     name TEXT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    closed_at TIMESTAMP,
+    archived_at TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS user_roles (
@@ -33,14 +40,26 @@ CREATE TABLE IF NOT EXISTS user_roles (
     FOREIGN KEY(role_id) REFERENCES roles(role_id)
 );
 
+-- Provenance of each effective entitlement in user_roles
+CREATE TABLE IF NOT EXISTS user_role_sources (
+    user_id TEXT NOT NULL,
+    role_id TEXT NOT NULL,
+    source TEXT CHECK (source IN ('DIRECT','INLINE','GROUP')) NOT NULL,
+    source_ref TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, role_id, source, source_ref),
+    FOREIGN KEY(user_id, role_id) REFERENCES user_roles(user_id, role_id)
+);
+
 CREATE TABLE IF NOT EXISTS access_reviews (
     review_id TEXT PRIMARY KEY,
     campaign_id TEXT NOT NULL,
     user_id TEXT NOT NULL,
     role_id TEXT NOT NULL,
     status TEXT CHECK (status IN ('PENDING','APPROVED','REVOKED')) DEFAULT 'PENDING',
+    reviewer TEXT,
     reviewer_comment TEXT,
     ai_risk_summary TEXT,
+    priority TEXT CHECK (priority IN ('NORMAL','ELEVATED')) DEFAULT 'NORMAL',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     reviewed_at TIMESTAMP,
     remediated_at TIMESTAMP,
@@ -54,6 +73,25 @@ CREATE TABLE IF NOT EXISTS access_reviews (
     FOREIGN KEY(role_id) REFERENCES roles(role_id)
 );
 
+CREATE TABLE IF NOT EXISTS sod_violations (
+    rule_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    role_id TEXT NOT NULL,
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (rule_id, user_id, role_id),
+    FOREIGN KEY(user_id) REFERENCES users(user_id),
+    FOREIGN KEY(role_id) REFERENCES roles(role_id)
+);
+
+CREATE TABLE IF NOT EXISTS discovery_state (
+    state_id TEXT PRIMARY KEY,
+    marker TEXT,
+    users_processed INTEGER NOT NULL DEFAULT 0,
+    status TEXT CHECK (status IN ('IN_PROGRESS','COMPLETE')) DEFAULT 'IN_PROGRESS',
+    started_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS audit_logs (
     id TEXT PRIMARY KEY,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -0,0 +1,15 @@
+-- sql/migrations/0001_baseline.sqlite.sql
+-- SQLite-specific statements layered on top of 0001_baseline.sql.
+-- SQLite has no ADD COLUMN IF NOT EXISTS; the migration runner skips an
+-- ADD COLUMN whose column already exists, which brings databases created
+-- before versioned migrations up to the baseline.
+
+ALTER TABLE access_reviews ADD COLUMN ai_risk_summary TEXT;
+ALTER TABLE access_reviews ADD COLUMN priority TEXT CHECK (priority IN ('NORMAL','ELEVATED')) DEFAULT 'NORMAL';
+ALTER TABLE access_reviews ADD COLUMN reviewer TEXT;
+ALTER TABLE users ADD COLUMN account_id TEXT;
+ALTER TABLE roles ADD COLUMN account_id TEXT;
+ALTER TABLE campaigns ADD COLUMN closed_at TIMESTAMP;
+ALTER TABLE campaigns ADD COLUMN archived_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_users_account ON users(account_id);
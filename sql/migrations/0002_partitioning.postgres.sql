@@ -0,0 +1,139 @@
+-- sql/migrations/0002_partitioning.postgres.sql
+-- Declarative partitioning (Postgres only).
+--   access_reviews: LIST by campaign_id, one partition per campaign; closed
+--                   campaigns are archived by detaching their partition.
+--   audit_logs:     RANGE by timestamp, one partition per month.
+-- Existing unpartitioned tables are converted in place (idempotent).
+-- access_reviews is not copied: the old table becomes the DEFAULT partition
+-- and its campaigns move into their own partitions one transaction at a
+-- time (scripts/archive_campaigns.py), so the hot table is never rewritten
+-- in one long transaction.
+
+-- The partition key must be in the new primary key; build its index on the
+-- old table without blocking writers (no-op once partitioned)
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS access_reviews_default_pkey ON access_reviews(review_id, campaign_id);
+
+CREATE OR REPLACE FUNCTION ensure_review_partition(p_campaign_id TEXT) RETURNS TEXT AS $$
+DECLARE
+    part_name TEXT := 'access_reviews_c_' || substr(md5(p_campaign_id), 1, 16);
+BEGIN
+    -- Serialize concurrent shards creating the same campaign partition
+    PERFORM pg_advisory_xact_lock(hashtext(part_name));
+    IF to_regclass(part_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE access_reviews INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+        -- Rows that landed in the default partition move with the campaign
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM access_reviews_default WHERE campaign_id = %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved', p_campaign_id, part_name);
+        EXECUTE format(
+            'ALTER TABLE access_reviews ATTACH PARTITION %I FOR VALUES IN (%L)', part_name, p_campaign_id);
+    END IF;
+    RETURN part_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION archive_review_partition(p_campaign_id TEXT) RETURNS TEXT AS $$
+DECLARE
+    suffix TEXT := substr(md5(p_campaign_id), 1, 16);
+    part_name TEXT := 'access_reviews_c_' || suffix;
+    cold_name TEXT := 'access_reviews_archived_' || suffix;
+BEGIN
+    IF to_regclass(part_name) IS NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('ALTER TABLE access_reviews DETACH PARTITION %I', part_name);
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', part_name, cold_name);
+    RETURN cold_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(p_from DATE, p_months INT) RETURNS VOID AS $$
+DECLARE
+    month_start DATE;
+    part_name TEXT;
+BEGIN
+    FOR i IN 0..p_months - 1 LOOP
+        month_start := (date_trunc('month', p_from) + make_interval(months => i))::date;
+        part_name := 'audit_logs_' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(part_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE audit_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM audit_logs_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, (month_start + interval '1 month')::date, part_name);
+            EXECUTE format(
+                'ALTER TABLE audit_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                part_name, month_start, (month_start + interval '1 month')::date);
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    oldest DATE;
+BEGIN
+    -- access_reviews -> LIST (campaign_id)
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'access_reviews'
+    ) THEN
+        -- Catalog-only steps: rename, swap the primary key for the
+        -- prebuilt index, and attach the old table as the DEFAULT partition.
+        -- Its existing indexes, checks and foreign keys are adopted by the
+        -- parent's instead of being rebuilt or revalidated.
+        ALTER TABLE access_reviews RENAME TO access_reviews_default;
+        ALTER TABLE access_reviews_default DROP CONSTRAINT IF EXISTS access_reviews_pkey;
+        ALTER TABLE access_reviews_default
+            ADD CONSTRAINT access_reviews_default_pkey PRIMARY KEY USING INDEX access_reviews_default_pkey;
+        ALTER INDEX IF EXISTS idx_reviews_status RENAME TO access_reviews_default_status_idx;
+        CREATE TABLE access_reviews (
+            LIKE access_reviews_default INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+            PRIMARY KEY (review_id, campaign_id),
+            FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (role_id) REFERENCES roles(role_id)
+        ) PARTITION BY LIST (campaign_id);
+        ALTER TABLE access_reviews ATTACH PARTITION access_reviews_default DEFAULT;
+    END IF;
+
+    -- audit_logs -> RANGE (timestamp), monthly
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'audit_logs'
+    ) THEN
+        ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned;
+        ALTER TABLE audit_logs_unpartitioned DROP CONSTRAINT IF EXISTS audit_logs_pkey;
+        DROP INDEX IF EXISTS idx_logs_ts;
+        DROP INDEX IF EXISTS idx_logs_action_ts;
+        ALTER TABLE audit_logs_unpartitioned
+            ALTER COLUMN timestamp TYPE TIMESTAMPTZ USING timestamp;
+        UPDATE audit_logs_unpartitioned SET timestamp = NOW() WHERE timestamp IS NULL;
+        CREATE TABLE audit_logs (
+            LIKE audit_logs_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+        CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+        SELECT COALESCE(MIN(timestamp)::date, CURRENT_DATE) INTO oldest FROM audit_logs_unpartitioned;
+        PERFORM ensure_audit_log_partitions(
+            oldest,
+            ((date_part('year', age(date_trunc('month', CURRENT_DATE), date_trunc('month', oldest))) * 12)
+              + date_part('month', age(date_trunc('month', CURRENT_DATE), date_trunc('month', oldest))))::int + 1
+        );
+        INSERT INTO audit_logs SELECT * FROM audit_logs_unpartitioned;
+        DROP TABLE audit_logs_unpartitioned;
+    END IF;
+END;
+$$;
+
+-- Keep upcoming months pre-created (also run by scripts/archive_campaigns.py)
+SELECT ensure_audit_log_partitions(CURRENT_DATE, 4);
+
+-- Indexes on partitioned parents cascade to every partition
+CREATE INDEX IF NOT EXISTS idx_reviews_status ON access_reviews(status);
+CREATE INDEX IF NOT EXISTS idx_logs_ts ON audit_logs(timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_action_ts ON audit_logs(action, timestamp);
@@ -0,0 +1,11 @@
+-- sql/migrations/0003_review_page_indexes.sql
+-- Keyset pagination indexes for repo.query_reviews, ordered on
+-- (created_at, review_id). On Postgres these build CONCURRENTLY outside the
+-- migration transaction (partition by partition for access_reviews), so
+-- reviews stay writable while they build. SQLite builds them normally.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_page ON access_reviews(created_at, review_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_campaign_page ON access_reviews(campaign_id, created_at, review_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_status_page ON access_reviews(status, created_at, review_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_reviewer_page ON access_reviews(reviewer, created_at, review_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_roles_risk ON roles(risk_level);
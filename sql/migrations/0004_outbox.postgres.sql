@@ -0,0 +1,95 @@
+-- sql/migrations/0004_outbox.postgres.sql
+-- Transactional outbox: entitlement change events are appended by triggers
+-- in the same transaction as the change, and only for rows that actually
+-- changed (ON CONFLICT DO NOTHING skips are silent). The triggers are
+-- statement-level over transition tables, so a COPY-staged bulk insert
+-- writes its events in one set-based INSERT rather than once per row.
+-- On access_reviews they sit on the partitioned parent and see every
+-- partition. scripts/relay_outbox.py drains unrelayed events in seq order.
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    seq BIGSERIAL PRIMARY KEY,
+    event_type TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    payload TEXT,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    relayed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox_events(seq) WHERE relayed_at IS NULL;
+
+CREATE OR REPLACE FUNCTION outbox_user_created() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    SELECT 'user.created', n.user_id, json_build_object('user_name', n.user_name, 'account_id', n.account_id)::text
+    FROM new_rows n;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION outbox_entitlement_granted() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    SELECT 'entitlement.granted', n.user_id, json_build_object('role_id', n.role_id)::text
+    FROM new_rows n;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION outbox_role_risk_changed() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    SELECT 'role.risk_changed', n.role_id, json_build_object('from', o.risk_level, 'to', n.risk_level)::text
+    FROM new_rows n
+    JOIN old_rows o ON o.role_id = n.role_id
+    WHERE o.risk_level IS DISTINCT FROM n.risk_level;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION outbox_review_created() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    SELECT 'review.created', n.review_id, json_build_object(
+        'campaign_id', n.campaign_id, 'user_id', n.user_id, 'role_id', n.role_id, 'priority', n.priority)::text
+    FROM new_rows n;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION outbox_review_remediated() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    SELECT 'review.remediated', n.review_id, json_build_object(
+        'campaign_id', n.campaign_id, 'user_id', n.user_id, 'role_id', n.role_id)::text
+    FROM new_rows n
+    JOIN old_rows o ON o.review_id = n.review_id AND o.campaign_id = n.campaign_id
+    WHERE o.remediated_at IS NULL AND n.remediated_at IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_outbox_user_created ON users;
+CREATE TRIGGER trg_outbox_user_created AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION outbox_user_created();
+
+DROP TRIGGER IF EXISTS trg_outbox_entitlement_granted ON user_roles;
+CREATE TRIGGER trg_outbox_entitlement_granted AFTER INSERT ON user_roles
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION outbox_entitlement_granted();
+
+DROP TRIGGER IF EXISTS trg_outbox_role_risk_changed ON roles;
+CREATE TRIGGER trg_outbox_role_risk_changed AFTER UPDATE ON roles
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION outbox_role_risk_changed();
+
+DROP TRIGGER IF EXISTS trg_outbox_review_created ON access_reviews;
+CREATE TRIGGER trg_outbox_review_created AFTER INSERT ON access_reviews
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION outbox_review_created();
+
+DROP TRIGGER IF EXISTS trg_outbox_review_remediated ON access_reviews;
+CREATE TRIGGER trg_outbox_review_remediated AFTER UPDATE ON access_reviews
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION outbox_review_remediated();
@@ -0,0 +1,50 @@
+-- sql/migrations/0004_outbox.sqlite.sql
+-- Transactional outbox: entitlement change events are appended by triggers
+-- in the same transaction as the change, and only for rows that actually
+-- changed (ON CONFLICT DO NOTHING skips are silent). scripts/relay_outbox.py
+-- drains unrelayed events in seq order.
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    payload TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    relayed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox_events(seq) WHERE relayed_at IS NULL;
+
+CREATE TRIGGER IF NOT EXISTS trg_outbox_user_created AFTER INSERT ON users
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    VALUES ('user.created', NEW.user_id, json_object('user_name', NEW.user_name, 'account_id', NEW.account_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_outbox_entitlement_granted AFTER INSERT ON user_roles
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    VALUES ('entitlement.granted', NEW.user_id, json_object('role_id', NEW.role_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_outbox_role_risk_changed AFTER UPDATE OF risk_level ON roles
+WHEN OLD.risk_level IS NOT NEW.risk_level
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    VALUES ('role.risk_changed', NEW.role_id, json_object('from', OLD.risk_level, 'to', NEW.risk_level));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_outbox_review_created AFTER INSERT ON access_reviews
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    VALUES ('review.created', NEW.review_id, json_object(
+        'campaign_id', NEW.campaign_id, 'user_id', NEW.user_id, 'role_id', NEW.role_id, 'priority', NEW.priority));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_outbox_review_remediated AFTER UPDATE OF remediated_at ON access_reviews
+WHEN OLD.remediated_at IS NULL AND NEW.remediated_at IS NOT NULL
+BEGIN
+    INSERT INTO outbox_events (event_type, entity_id, payload)
+    VALUES ('review.remediated', NEW.review_id, json_object(
+        'campaign_id', NEW.campaign_id, 'user_id', NEW.user_id, 'role_id', NEW.role_id));
+END;
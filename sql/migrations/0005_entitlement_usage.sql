@@ -0,0 +1,20 @@
+-- sql/migrations/0005_entitlement_usage.sql
+-- Last-used data per effective entitlement, from IAM Access Advisor
+-- (lambdas/access_advisor). last_used_at is the latest authentication to
+-- any service the policy grants the user (NULL: granted but never used);
+-- evaluate_risk sets stale on HIGH-risk entitlements unused for
+-- STALE_ACCESS_DAYS, and campaigns review those first.
+
+CREATE TABLE IF NOT EXISTS entitlement_usage (
+    user_id TEXT NOT NULL,
+    role_id TEXT NOT NULL,
+    last_used_at TIMESTAMP,
+    last_used_service TEXT,
+    services_granted INTEGER NOT NULL DEFAULT 0,
+    services_used INTEGER NOT NULL DEFAULT 0,
+    checked_at TIMESTAMP NOT NULL,
+    stale INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, role_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_checked ON entitlement_usage(checked_at);
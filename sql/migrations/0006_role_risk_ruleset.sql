@@ -0,0 +1,8 @@
+-- sql/migrations/0006_role_risk_ruleset.sql
+-- Incremental risk evaluation: each role records the hash of the ruleset
+-- it was classified under and when. evaluate_risk only reclassifies roles
+-- with no hash (new) or another hash (rules changed since). No index: the
+-- predicate is an inequality and roles is one row per policy.
+
+ALTER TABLE roles ADD COLUMN risk_ruleset TEXT;
+ALTER TABLE roles ADD COLUMN risk_evaluated_at TIMESTAMP;
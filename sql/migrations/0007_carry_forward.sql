@@ -0,0 +1,20 @@
+-- sql/migrations/0007_carry_forward.sql
+-- Carry-forward certification. access_reviews.risk_snapshot records the
+-- role's risk level when the review was created, so a later campaign can
+-- tell an approval of a LOW-risk grant from one made at another level.
+-- review_carry_forwards holds the entitlements a campaign certified by
+-- reference to an earlier human approval instead of creating a review.
+-- The partial index serves the one window scan over recent approvals.
+
+ALTER TABLE access_reviews ADD COLUMN risk_snapshot TEXT;
+
+CREATE TABLE IF NOT EXISTS review_carry_forwards (
+    campaign_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    role_id TEXT NOT NULL,
+    carried_from_review_id TEXT NOT NULL,
+    certified_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (campaign_id, user_id, role_id)
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_approved ON access_reviews(reviewed_at) WHERE status = 'APPROVED';
@@ -0,0 +1,24 @@
+-- sql/migrations/0008_review_rollups.sql
+-- Campaign progress rollup: review counts per campaign, risk level (the
+-- review's risk_snapshot, UNKNOWN for reviews created before 0007) and
+-- status, plus how many of them were remediated. The repo functions that
+-- create, decide, remediate and archive reviews keep it current in the
+-- same transaction; scripts/review_rollups.py repair rebuilds it from
+-- access_reviews. Covers the hot table only, like the export.
+
+CREATE TABLE IF NOT EXISTS review_rollups (
+    campaign_id TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    status TEXT NOT NULL,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    remediated_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (campaign_id, risk_level, status)
+);
+
+INSERT INTO review_rollups (campaign_id, risk_level, status, review_count, remediated_count)
+SELECT campaign_id, COALESCE(risk_snapshot, 'UNKNOWN'), status, COUNT(*), COUNT(remediated_at)
+FROM access_reviews
+WHERE true
+GROUP BY campaign_id, COALESCE(risk_snapshot, 'UNKNOWN'), status
+ON CONFLICT (campaign_id, risk_level, status) DO NOTHING;
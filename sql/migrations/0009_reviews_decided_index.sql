@@ -0,0 +1,7 @@
+-- sql/migrations/0009_reviews_decided_index.sql
+-- Carry-forward looks at the latest decision of any kind per grant, not
+-- only approvals, so the approvals-only index from 0007 is replaced.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_decided ON access_reviews(reviewed_at) WHERE status <> 'PENDING';
+
+DROP INDEX IF EXISTS idx_reviews_approved;
@@ -1,4 +0,0 @@
-#sql/schema_sqlite.sql
--- SQLite-specific statements layered on top of schema_base.sql
-PRAGMA foreign_keys = ON;
-
@@ -0,0 +1,90 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import boto3
+import pytest
+from moto import mock_aws
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+from common import aws_accounts, config, repo  # noqa: E402
+from common.db import db  # noqa: E402
+from lambdas.identity_discovery import handler  # noqa: E402
+
+ACCOUNTS = {"111111111111": ["alice", "bob"], "222222222222": ["carol"]}
+POLICY = '{"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "s3:Get*", "Resource": "*"}]}'
+
+
+def _migrate():
+    spec = importlib.util.spec_from_file_location("migrate", ROOT / "scripts" / "migrate.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.run_migrations()
+
+
+@pytest.fixture
+def org(tmp_path, monkeypatch):
+    """Fresh SQLite schema plus two moto accounts with IAM users, reached through assumed roles."""
+    monkeypatch.setattr(config, "DB_URL", f"sqlite:///{tmp_path / 'discovery.db'}")
+    monkeypatch.setattr(db, "is_sqlite", True)
+    monkeypatch.setattr(handler, "MOCK_IAM", False)
+    monkeypatch.setattr(config, "IAM_CACHE_MODE", "off")
+    monkeypatch.setattr(aws_accounts, "_SESSIONS", {})
+    with mock_aws():
+        _migrate()
+        for account_id, user_names in ACCOUNTS.items():
+            role_arn = aws_accounts.resolve_target(account_id)[1]
+            iam = aws_accounts.account_session(role_arn).client("iam")
+            policy_arn = iam.create_policy(PolicyName="ReadOnly", PolicyDocument=POLICY)["Policy"]["Arn"]
+            for name in user_names:
+                iam.create_user(UserName=name)
+                iam.attach_user_policy(UserName=name, PolicyArn=policy_arn)
+        aws_accounts._SESSIONS.clear()
+        yield
+
+
+def _users_by_account():
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        db.execute(cur, "SELECT account_id, user_name FROM users ORDER BY user_name")
+        rows = cur.fetchall()
+    found = {}
+    for account_id, name in rows:
+        found.setdefault(account_id, []).append(name)
+    return found
+
+
+def test_inline_multi_account_discovery_tags_accounts(org):
+    result = handler.discover_identities({"accounts": list(ACCOUNTS), "workers": 0}, None)
+
+    assert result["status"] == "success"
+    assert result["accounts"] == {"111111111111": 2, "222222222222": 1}
+    assert result["failed_accounts"] == [] and result["accounts_remaining"] == []
+    assert _users_by_account() == ACCOUNTS
+    with db.get_connection() as conn:
+        assert {(s[0], s[2]) for s in [repo.get_discovery_state(conn, f"account:{a}") for a in ACCOUNTS]} == {
+            (None, "COMPLETE")
+        }
+
+
+def test_max_pages_stops_before_the_next_account_and_resumes(org):
+    # moto returns each account's users as a single page
+    first = handler.discover_identities({"accounts": list(ACCOUNTS), "workers": 0, "max_pages": 1}, None)
+
+    assert first["status"] == "partial" and first["resume"]
+    assert first["accounts"] == {"111111111111": 2}
+    assert first["accounts_remaining"] == ["222222222222"]
+
+    second = handler.discover_identities({"accounts": first["accounts_remaining"], "workers": 0}, None)
+
+    assert second["status"] == "success"
+    assert second["accounts"] == {"222222222222": 1}
+    assert _users_by_account() == ACCOUNTS